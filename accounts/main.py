@@ -0,0 +1,331 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import Engine, delete, func, or_, update
+from sqlmodel import Session, select
+
+from api.v1.models.models import (
+    AccountDeletion,
+    Quote,
+    QuoteComment,
+    QuoteReaction,
+    SavedQuote,
+    User,
+    UserRole,
+    Webhook,
+    WebhookDelivery,
+)
+from api.v1.tasks.quotes import _delete_quote_rows, _detach_comments, _remove_reaction_counts
+from cache.identity import identity_cache
+from cache.responses import response_cache
+from cache.roles import role_cache
+from config.main import parser
+from leaderboard.main import leaderboard
+from search.main import search_backend
+from search.suggest import user_suggestions
+
+# Deletion order, rows of every phase may reference rows of the later ones
+PHASES = (
+    "reactions",
+    "saved_quotes",
+    "comments",
+    "quote_deliveries",
+    "quote_reactions",
+    "quote_saves",
+    "quote_comments",
+    "quotes",
+    "account",
+)
+
+
+def _quote_ids(user_id: int):
+    return select(Quote.quote_id).where(Quote.user_id == user_id)
+
+
+class AccountDeleter:
+    """
+    Deletes user accounts with set-based DELETE statements instead of loading the ORM cascades.
+
+    Rows are deleted phase by phase in dependency order, see PHASES, in chunks of at most `chunk_size`
+    rows that are committed one by one, so locks stay short and an interrupted deletion resumes where it
+    stopped. The rows other users attached to the account's quotes are deleted in chunks of their own
+    before the quotes, however many a single quote has. Cached responses are invalidated after every
+    commit, so they are not rebuilt from rows about to be deleted. Accounts with more than
+    `background_threshold` rows are deleted by jobs in the account_deletions table, which the API
+    workers claim and run in the background, see :meth:`run`.
+    """
+
+    def __init__(self, chunk_size: int, background_threshold: int, poll_interval: float, lease: float):
+        self.chunk_size = chunk_size
+        self.background_threshold = background_threshold
+        self.poll_interval = poll_interval
+        self.lease = lease
+
+    def count_rows(self, session: Session, user_id: int) -> int:
+        """
+        Estimate the rows deleted with an account from indexed counts and the reaction counters
+        """
+        return session.exec(select(
+            select(func.count()).where(Quote.user_id == user_id).scalar_subquery()
+            + select(func.coalesce(func.sum(Quote.total_reactions()), 0)).where(Quote.user_id == user_id)
+            .scalar_subquery()
+            + select(func.count()).where(QuoteReaction.user_id == user_id).scalar_subquery()
+            + select(func.count()).where(SavedQuote.user_id == user_id).scalar_subquery()
+            + select(func.count()).where(QuoteComment.user_id == user_id).scalar_subquery()
+        )).one()
+
+    def mark_deleted(self, session: Session, user: User):
+        """
+        Flag the user as deleted, so the account can no longer be used while its rows are deleted
+        """
+        user.deleted_at = datetime.now()
+        session.add(user)
+        session.commit()
+        identity_cache.invalidate(user.discord_id)
+        user_suggestions.remove(user.user_id)
+
+    def enqueue(self, session: Session, user: User, total_rows: int) -> dict:
+        """
+        Queue the deletion of a large account for the background workers
+
+        :return: The queued job
+        """
+        now = datetime.now()
+        job = AccountDeletion(
+            job_id=uuid.uuid4().hex,
+            user_id=user.user_id,
+            total_rows=total_rows,
+            created_at=now,
+            updated_at=now,
+        )
+        job_dump = job.model_dump()
+        session.add(job)
+        self.mark_deleted(session, user)
+        return job_dump
+
+    def delete(self, session: Session, user_id: int, job_id: Optional[str] = None) -> int:
+        """
+        Delete the account and everything belonging to it, committing after every chunk
+
+        :return: The number of deleted rows
+        """
+        discord_id = session.exec(select(User.discord_id).where(User.user_id == user_id)).first()
+        had_roles = bool(role_cache.user_roles(user_id))
+
+        total = 0
+        # Cache tags of the responses showing rows of the current chunk
+        tags: set[str] = set()
+        for phase in PHASES:
+            delete_chunk = getattr(self, f"_delete_{phase}")
+            while (deleted := delete_chunk(session, user_id, tags)) is not None:
+                total += deleted
+                if job_id:
+                    session.exec(update(AccountDeletion).where(AccountDeletion.job_id == job_id).values(
+                        status="running",
+                        phase=phase,
+                        deleted_rows=AccountDeletion.deleted_rows + deleted,
+                        updated_at=datetime.now(),
+                    ))
+                session.commit()
+                if tags:
+                    response_cache.invalidate(*tags)
+                    tags.clear()
+
+        if job_id:
+            session.exec(update(AccountDeletion).where(AccountDeletion.job_id == job_id).values(
+                status="done", phase=None, finished_at=datetime.now(), updated_at=datetime.now()
+            ))
+            session.commit()
+
+        leaderboard.invalidate()
+        response_cache.invalidate("listing", f"user:{user_id}")
+        if had_roles:
+            role_cache.invalidate()
+        if discord_id:
+            identity_cache.invalidate(discord_id)
+        return total
+
+    def _delete_reactions(self, session: Session, user_id: int, tags: set[str]) -> Optional[int]:
+        reactions = session.exec(
+            select(QuoteReaction.reaction_id, QuoteReaction.quote_id, QuoteReaction.reaction_name)
+            .where(QuoteReaction.user_id == user_id)
+            .limit(self.chunk_size)
+        ).all()
+        if not reactions:
+            return None
+
+        quote_ids = [quote_id for _, quote_id, _ in reactions]
+        _remove_reaction_counts([(quote_id, name) for _, quote_id, name in reactions], session)
+        leaderboard.remove_reactions(session, quote_ids)
+        session.exec(delete(QuoteReaction).where(QuoteReaction.reaction_id.in_([id for id, _, _ in reactions])))
+        tags.update(f"quote:{quote_id}" for quote_id in quote_ids)
+        return len(reactions)
+
+    def _delete_saved_quotes(self, session: Session, user_id: int, tags: set[str]) -> Optional[int]:
+        saved_ids = session.exec(
+            select(SavedQuote.saved_id).where(SavedQuote.user_id == user_id).limit(self.chunk_size)
+        ).all()
+        if not saved_ids:
+            return None
+
+        return session.exec(delete(SavedQuote).where(SavedQuote.saved_id.in_(saved_ids))).rowcount
+
+    def _delete_comments(self, session: Session, user_id: int, tags: set[str]) -> Optional[int]:
+        comments = session.exec(
+            select(QuoteComment.comment_id, QuoteComment.parent)
+            .where(QuoteComment.user_id == user_id)
+            .limit(self.chunk_size)
+        ).all()
+        if not comments:
+            return None
+
+        _detach_comments(comments, session)
+        return session.exec(
+            delete(QuoteComment).where(QuoteComment.comment_id.in_([comment_id for comment_id, _ in comments]))
+        ).rowcount
+
+    def _delete_quote_deliveries(self, session: Session, user_id: int, tags: set[str]) -> Optional[int]:
+        delivery_ids = session.exec(
+            select(WebhookDelivery.id)
+            .where(WebhookDelivery.quote_id.in_(_quote_ids(user_id)))
+            .limit(self.chunk_size)
+        ).all()
+        if not delivery_ids:
+            return None
+
+        return session.exec(delete(WebhookDelivery).where(WebhookDelivery.id.in_(delivery_ids))).rowcount
+
+    def _delete_quote_reactions(self, session: Session, user_id: int, tags: set[str]) -> Optional[int]:
+        # The counters and leaderboard entries of the quotes are deleted with them
+        reactions = session.exec(
+            select(QuoteReaction.reaction_id, QuoteReaction.quote_id)
+            .where(QuoteReaction.quote_id.in_(_quote_ids(user_id)))
+            .limit(self.chunk_size)
+        ).all()
+        if not reactions:
+            return None
+
+        session.exec(delete(QuoteReaction).where(QuoteReaction.reaction_id.in_([id for id, _ in reactions])))
+        tags.update(f"quote:{quote_id}" for _, quote_id in reactions)
+        return len(reactions)
+
+    def _delete_quote_saves(self, session: Session, user_id: int, tags: set[str]) -> Optional[int]:
+        saved_ids = session.exec(
+            select(SavedQuote.saved_id)
+            .where(SavedQuote.quote_id.in_(_quote_ids(user_id)))
+            .limit(self.chunk_size)
+        ).all()
+        if not saved_ids:
+            return None
+
+        return session.exec(delete(SavedQuote).where(SavedQuote.saved_id.in_(saved_ids))).rowcount
+
+    def _delete_quote_comments(self, session: Session, user_id: int, tags: set[str]) -> Optional[int]:
+        comments = session.exec(
+            select(QuoteComment.comment_id, QuoteComment.parent)
+            .where(QuoteComment.quote_id.in_(_quote_ids(user_id)))
+            .limit(self.chunk_size)
+        ).all()
+        if not comments:
+            return None
+
+        _detach_comments(comments, session)
+        return session.exec(
+            delete(QuoteComment).where(QuoteComment.comment_id.in_([comment_id for comment_id, _ in comments]))
+        ).rowcount
+
+    def _delete_quotes(self, session: Session, user_id: int, tags: set[str]) -> Optional[int]:
+        # The earlier phases deleted the rows of the quotes, only rows added since are left for _delete_quote_rows
+        quote_ids = session.exec(_quote_ids(user_id).limit(self.chunk_size)).all()
+        if not quote_ids:
+            return None
+
+        deleted = _delete_quote_rows(quote_ids, session)
+        tags.add("listing")
+        tags.update(f"quote:{quote_id}" for quote_id in quote_ids)
+        return deleted
+
+    def _delete_account(self, session: Session, user_id: int, tags: set[str]) -> Optional[int]:
+        if not session.get(User, user_id):
+            return None
+
+        webhook_ids = select(Webhook.id).where(Webhook.user_id == user_id)
+        deleted = session.exec(delete(WebhookDelivery).where(WebhookDelivery.webhook_id.in_(webhook_ids))).rowcount
+        deleted += session.exec(delete(Webhook).where(Webhook.user_id == user_id)).rowcount
+        deleted += session.exec(delete(UserRole).where(UserRole.user_id == user_id)).rowcount
+        search_backend.remove_user(session, user_id)
+        deleted += session.exec(delete(User).where(User.user_id == user_id)).rowcount
+        return deleted
+
+    async def run(self, engine: Engine):
+        """
+        Run pending deletion jobs, and jobs of workers that stopped making progress, until cancelled
+        """
+        while True:
+            try:
+                if await asyncio.to_thread(self.run_once, engine):
+                    continue
+            except Exception as error:
+                logger.warning(f"Deleting an account failed: {error}")
+            await asyncio.sleep(self.poll_interval)
+
+    def run_once(self, engine: Engine) -> bool:
+        """
+        Claim and run one deletion job
+
+        :return: Whether there was a job to run
+        """
+        with Session(engine) as session:
+            job = self._claim(session)
+            if not job:
+                return False
+
+            job_id, user_id = job
+            try:
+                deleted = self.delete(session, user_id, job_id)
+            except Exception as error:
+                # The job is resumed once its lease expired
+                session.rollback()
+                session.exec(update(AccountDeletion).where(AccountDeletion.job_id == job_id).values(
+                    error=str(error)[:255]
+                ))
+                session.commit()
+                raise
+
+        logger.info(f"Deleted account {user_id} with {deleted} rows")
+        return True
+
+    def _claim(self, session: Session) -> Optional[tuple[str, int]]:
+        now = datetime.now()
+        job = session.exec(
+            select(AccountDeletion.job_id, AccountDeletion.user_id, AccountDeletion.updated_at)
+            .where(or_(
+                AccountDeletion.status == "pending",
+                (AccountDeletion.status == "running")
+                & (AccountDeletion.updated_at < now - timedelta(seconds=self.lease)),
+            ))
+            .order_by(AccountDeletion.created_at)
+            .limit(1)
+        ).first()
+        if not job:
+            return None
+
+        # Only one worker moves updated_at from the value it read
+        claimed = session.exec(
+            update(AccountDeletion)
+            .where(AccountDeletion.job_id == job.job_id, AccountDeletion.updated_at == job.updated_at)
+            .values(status="running", updated_at=now)
+        ).rowcount
+        session.commit()
+        return (job.job_id, job.user_id) if claimed else None
+
+
+account_deleter = AccountDeleter(
+    chunk_size=parser.getint("Accounts", "deletion_chunk_size", fallback=500),
+    background_threshold=parser.getint("Accounts", "background_deletion_threshold", fallback=5000),
+    poll_interval=parser.getfloat("Accounts", "deletion_poll_interval", fallback=5),
+    lease=parser.getfloat("Accounts", "deletion_lease", fallback=60),
+)
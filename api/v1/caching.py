@@ -0,0 +1,119 @@
+import hashlib
+from typing import Any, Callable, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from api.v1.schemas.quotes import QuoteSchema
+from cache.responses import response_cache
+from config.main import parser
+from database.main import db
+
+# Seconds shared caches like a CDN may serve anonymous responses without revalidating
+CACHE_MAX_AGE = parser.getint("API", "cache_max_age", fallback=10)
+
+_adapters: dict[Any, TypeAdapter] = {}
+
+
+def cached_response(
+    request: Request,
+    params: dict[str, Any],
+    response_model: Any,
+    build: Callable[[], Any],
+    tags: Callable[[Any], list[str]],
+    headers: Optional[dict[str, str]] = None,
+) -> Response:
+    """
+    Serve an anonymous response from the response cache or build, serialize and cache it
+
+    Responses are public, so shared caches may store them as well.
+
+    :param params: The parsed query parameters the response depends on
+    :param build: Builds the response content, only called on a cache miss
+    :param tags: Returns the cache tags of the validated response content
+    """
+    key = response_cache.key(request.url.path, params)
+
+    body = response_cache.get(key)
+    if body is None:
+        sequence = response_cache.sequence()
+        content = _adapter(response_model).validate_python(build())
+        body = serialize(response_model, content)
+        # Invalidations may not have reached a replica yet, so its responses expire after the tolerated lag
+        ttl = db.max_lag if getattr(request.state, "replica", False) else None
+        response_cache.set(key, body, tags(content), sequence, ttl)
+
+    return Response(content=body, media_type="application/json", headers=headers or cache_headers(None, public=True))
+
+
+def json_response(
+    response_model: Any,
+    content: Any,
+    headers: Optional[dict[str, str]] = None,
+    status_code: int = 200,
+) -> Response:
+    """
+    Validate and serialize content with a precompiled adapter, skipping FastAPI's own response
+    preparation, validation and JSON encoding of return values
+    """
+    return Response(
+        content=serialize(response_model, _adapter(response_model).validate_python(content)),
+        media_type="application/json",
+        headers=headers,
+        status_code=status_code,
+    )
+
+
+def serialize(response_model: Any, content: Any) -> bytes:
+    return _adapter(response_model).dump_json(content, by_alias=True)
+
+
+def _adapter(response_model: Any) -> TypeAdapter:
+    adapter = _adapters.get(response_model)
+    if adapter is None:
+        adapter = _adapters[response_model] = TypeAdapter(response_model)
+    return adapter
+
+
+def quote_tags(quotes: list[QuoteSchema]) -> list[str]:
+    """
+    Cache tags of the quotes and their authors in a response
+    """
+    tags = {f"quote:{quote.quote_id}" for quote in quotes}
+    tags.update(f"user:{quote.user_id}" for quote in quotes)
+    return list(tags)
+
+
+def make_etag(*versions: Any) -> str:
+    """
+    Strong ETag from the row versions a response is built from, without serializing the response
+    """
+    return '"' + hashlib.sha256(repr(versions).encode()).hexdigest()[:32] + '"'
+
+
+def cache_headers(etag: Optional[str], public: bool) -> dict[str, str]:
+    """
+    :param public: The response is the same for every viewer and may be stored by shared caches
+    """
+    headers = {
+        "Cache-Control": f"public, max-age={CACHE_MAX_AGE}" if public else "private, no-cache",
+        # Tokens may be sent in the Authorization header instead of the URL
+        "Vary": "Authorization",
+    }
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+
+def not_modified(request: Request, headers: dict[str, str]) -> Optional[Response]:
+    """
+    :return: An empty 304 response if the If-None-Match header matches the ETag
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+
+    etags = {etag.strip().removeprefix("W/") for etag in if_none_match.split(",")}
+    if "*" in etags or headers["ETag"] in etags:
+        return Response(status_code=304, headers=headers)
+    return None
@@ -0,0 +1,97 @@
+from typing import Optional
+
+import jwt
+from fastapi import Depends, Header, HTTPException, Query
+from sqlmodel import Session, select
+
+from api.v1.models.models import User
+from auth.main import session_handler
+from config.main import parser
+from database.main import db
+from discord.main import dc_handler
+
+MAX_BATCH_SIZE = parser.getint("API", "max_batch_size", fallback=200)
+
+
+def authenticate(
+    token: Optional[str],
+    session: Session,
+) -> User:
+    """
+    Resolve the user of a session token with a single primary key lookup
+
+    Legacy tokens that still carry a Discord access response are resolved through Discord.
+
+    :return: The authenticated user
+    """
+    if not token:
+        raise HTTPException(401, "Required token is empty!")
+
+    try:
+        claims = session_handler.decode(token)
+    except jwt.PyJWTError:
+        raise HTTPException(401, "Invalid or expired token!")
+
+    if claims:
+        user = session.get(User, claims["user_id"])
+    else:
+        user_info = dc_handler.identify(token)
+        if not "id" in user_info:
+            raise HTTPException(401, "Invalid or expired token!")
+        user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
+
+    if not user or user.deleted_at:
+        raise HTTPException(404, "User is not registered!")
+
+    db.track_writes(session, token)
+    return user
+
+
+def get_token(
+    token: Optional[str] = Query(
+        default=None,
+        description="The JWT token from the current user"
+    ),
+    authorization: Optional[str] = Header(
+        default=None,
+        description="Bearer JWT token, alternative to the token query parameter"
+    ),
+) -> Optional[str]:
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return token
+
+
+def get_current_user(
+    token: Optional[str] = Depends(get_token),
+    session: Session = Depends(db.get_session),
+) -> User:
+    return authenticate(token, session)
+
+
+def get_optional_user(
+    token: Optional[str] = Depends(get_token),
+    session: Session = Depends(db.get_session),
+) -> Optional[User]:
+    if not token:
+        return None
+    return authenticate(token, session)
+
+
+def get_ids(
+    ids: str = Query(
+        default=...,
+        description=f"Comma separated identifiers, at most {MAX_BATCH_SIZE}"
+    ),
+) -> list[int]:
+    """
+    :return: The identifiers without duplicates, in the requested order
+    """
+    try:
+        parsed = list(dict.fromkeys(int(id) for id in ids.split(",") if id.strip()))
+    except ValueError:
+        raise HTTPException(400, "Invalid identifiers!")
+
+    if len(parsed) > MAX_BATCH_SIZE:
+        raise HTTPException(400, f"At most {MAX_BATCH_SIZE} identifiers are allowed!")
+    return parsed
@@ -1,22 +1,43 @@
-from fastapi import APIRouter, Depends, FastAPI, Form
+import asyncio
+import math
+from contextlib import asynccontextmanager
+
+import anyio
+from fastapi import APIRouter, Depends, FastAPI, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlmodel import Session
 
 from __init__ import VERSION, API_NAME
+from accounts.main import account_deleter
 from api.v1.routers import quotes, roles, users
-from api.v1.schemas.discord import AuthorizeBody
-from api.v1.tasks.main import _authorize
+from api.v1.schemas.discord import AuthorizeBody, RefreshBody, SessionTokensSchema
+from api.v1.tasks.main import _authorize, _get_metrics, _refresh
 from config.main import tags_metadata
-from database.main import DatabaseHandler
-from discord.main import DiscordOAuthHandler
+from database.main import THREADPOOL_SIZE, db
+from discord.client import DiscordUnavailableError, RateLimitedError
+from discord.main import dc_handler
+from leaderboard.main import leaderboard
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Synchronous endpoints run in this threadpool, the connection pools are sized after it
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    expiry = asyncio.create_task(leaderboard.run_expiry(db.engine))
+    deletions = asyncio.create_task(account_deleter.run(db.engine))
+    yield
+    expiry.cancel()
+    deletions.cancel()
+    dc_handler.client.close()
+
 
 app = FastAPI(
     title=API_NAME,
     version=VERSION,
-    openapi_tags=tags_metadata
+    openapi_tags=tags_metadata,
+    lifespan=lifespan,
 )
-db = DatabaseHandler()
-dc_handler = DiscordOAuthHandler()
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -24,13 +45,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(RateLimitedError)
+def rate_limited_handler(request: Request, error: RateLimitedError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Discord rate limit reached, try again later"},
+        headers={"Retry-After": str(math.ceil(error.retry_after))},
+    )
+
+
+@app.exception_handler(DiscordUnavailableError)
+def discord_unavailable_handler(request: Request, error: DiscordUnavailableError):
+    return JSONResponse(status_code=503, content={"detail": "Discord is currently unavailable"})
+
+
 router = APIRouter(prefix="/v1")
 
 
 # Root endpoints
 @router.post(
     "/authorize",
-    response_model=str,
+    response_model=SessionTokensSchema,
 )
 def authorize(
     payload: AuthorizeBody,
@@ -39,11 +75,41 @@ def authorize(
     """
     Authorize user with Discord
 
-    :return: JWT token
+    :return: Session and refresh JWT tokens
     """
     return _authorize(payload.code, session)
 
 
+@router.post(
+    "/refresh",
+    response_model=SessionTokensSchema,
+)
+def refresh(
+    payload: RefreshBody,
+    session: Session = Depends(db.get_session),
+):
+    """
+    Exchange a refresh token for a new session
+
+    :return: Session and refresh JWT tokens
+    """
+    return _refresh(payload.refresh_token, session)
+
+
+@router.get(
+    "/metrics",
+    response_model=dict[str, int],
+)
+def get_metrics():
+    """
+    Get the counters shared by all workers, e.g. identity cache hits and misses or connection pool checkouts
+    and wait time, and the connection pool gauges of the worker answering
+
+    :return: Counter values by name
+    """
+    return _get_metrics()
+
+
 # Include routers
 router.include_router(quotes.router)
 router.include_router(users.router)
@@ -2,9 +2,12 @@ from datetime import datetime
 from typing import Literal, Optional
 
 from humps import camel
-from sqlmodel import Field, Relationship, SQLModel
+from sqlalchemy import Index, UniqueConstraint
+from sqlmodel import Field, Relationship, Session, SQLModel, select
 
-from discord.main import UserObject
+REACTION_TYPES = ["red-heart", "thumbs-up", "face-with-tears-of-joy", "melting-face", "skull"]
+# Counter column on the quotes table for each reaction type
+REACTION_COUNT_COLUMNS = {name: f"{name.replace('-', '_')}_count" for name in REACTION_TYPES}
 
 
 def to_camel(string):
@@ -47,63 +50,85 @@ class Quote(Base, table=True):
         description="The quote deletion date",
     )
 
+    # Reaction counters, maintained by _quote_toggle_react
+    red_heart_count: int = Field(default=0, exclude=True)
+    thumbs_up_count: int = Field(default=0, exclude=True)
+    face_with_tears_of_joy_count: int = Field(default=0, exclude=True)
+    melting_face_count: int = Field(default=0, exclude=True)
+    skull_count: int = Field(default=0, exclude=True)
+
     user: "User" = Relationship(back_populates="quotes")
     reactions: list["QuoteReaction"] = Relationship(back_populates="quote", cascade_delete=True)
     saved_quotes: list["SavedQuote"] = Relationship(back_populates="quote", cascade_delete=True)
     comments: list["QuoteComment"] = Relationship(back_populates="quote", cascade_delete=True)
 
-    def formatted_quote(self, user_info: Optional[UserObject] = None):
-        if not user_info:
-            return {
-                **self.model_dump(),
-                "user": self.user,
-                "reactions": self._format_reactions()
-            }
-
+    def formatted_quote(self):
         return {
             **self.model_dump(),
             "user": self.user,
-            "reactions": self._format_reactions(),
-            "is_saved": self._is_saved(user_info),
-            "reaction": self._reaction(user_info)
+            "reactions": self._format_reactions()
         }
 
-    def _format_reactions(self) -> list[dict]:
-
-        reaction_types = ["red-heart", "thumbs-up", "face-with-tears-of-joy", "melting-face", "skull"]
-        reaction_counts = {reaction: 0 for reaction in reaction_types}  # Initialize with zero
-
-        if self.reactions:
-            for reaction in self.reactions:
-                reaction_counts[reaction.reaction_name] = reaction_counts.get(reaction.reaction_name, 0) + 1
-
-        # Convert to expected format
-        return [{"reaction_name": name, "count": reaction_counts[name]} for name in reaction_types]
-
-    def _is_saved(self, user_info: UserObject):
-        if not user_info:
-            return False
-
-        for saved in self.saved_quotes:
-            if saved.user.discord_id == user_info["id"]:
-                return True
-
-        return False
-
-    def _reaction(self, user_info: UserObject):
-
-        if not user_info:
-            return None
-
-        for reaction in self.reactions:
-            if reaction.user.discord_id == user_info["id"]:
-                return reaction.reaction_name
+    @classmethod
+    def formatted_quotes(cls, quotes: list["Quote"], session: Session, viewer: Optional["User"] = None) -> list[dict]:
+        """
+        Format a page of quotes with a constant number of queries
+
+        Authors are loaded as plain rows with one IN query, reaction counts come from the counter columns and the
+        viewer's saves and reactions are loaded with one IN query each. Rows are built with
+        :meth:`QuoteSchema.row`.
+        """
+        from api.v1.schemas.quotes import QuoteSchema
+
+        quote_ids = [quote.quote_id for quote in quotes]
+        if not quote_ids:
+            return []
+
+        users = User.response_rows({quote.user_id for quote in quotes}, session)
+
+        if not viewer:
+            return [QuoteSchema.row(quote, users.get(quote.user_id)) for quote in quotes]
+
+        saved_ids = set(session.exec(
+            select(SavedQuote.quote_id).where(
+                SavedQuote.user_id == viewer.user_id, SavedQuote.quote_id.in_(quote_ids)
+            )
+        ).all())
+        reactions = dict(session.exec(
+            select(QuoteReaction.quote_id, QuoteReaction.reaction_name).where(
+                QuoteReaction.user_id == viewer.user_id, QuoteReaction.quote_id.in_(quote_ids)
+            )
+        ).all())
+
+        return [
+            QuoteSchema.row(
+                quote, users.get(quote.user_id), quote.quote_id in saved_ids, reactions.get(quote.quote_id)
+            )
+            for quote in quotes
+        ]
+
+    @classmethod
+    def reaction_count_column(cls, reaction_name: str):
+        return getattr(cls, REACTION_COUNT_COLUMNS[reaction_name])
+
+    @classmethod
+    def total_reactions(cls):
+        """SQL expression summing up all reaction counters"""
+        total = cls.reaction_count_column(REACTION_TYPES[0])
+        for name in REACTION_TYPES[1:]:
+            total = total + cls.reaction_count_column(name)
+        return total
 
-        return None
+    def _format_reactions(self) -> list[dict]:
+        return [
+            {"reaction_name": name, "count": getattr(self, REACTION_COUNT_COLUMNS[name])}
+            for name in REACTION_TYPES
+        ]
 
 
 class QuoteReaction(Base, table=True):
     __tablename__ = "quote_reactions"
+    __table_args__ = (UniqueConstraint("quote_id", "user_id", name="uq_quote_reactions_quote_id_user_id"),)
 
     reaction_id: int = Field(
         default=...,
@@ -115,7 +140,7 @@ class QuoteReaction(Base, table=True):
         description="The user's identifier",
         foreign_key="users.user_id"
     )
-    quote_id: str = Field(
+    quote_id: int = Field(
         default=...,
         description="The quote identifier",
         foreign_key="quotes.quote_id",
@@ -134,6 +159,7 @@ class QuoteReaction(Base, table=True):
 
 class SavedQuote(Base, table=True):
     __tablename__ = "saved_quotes"
+    __table_args__ = (UniqueConstraint("quote_id", "user_id", name="uq_saved_quotes_quote_id_user_id"),)
 
     saved_id: int = Field(
         default=...,
@@ -150,6 +176,10 @@ class SavedQuote(Base, table=True):
         description="The quote identifier",
         foreign_key="quotes.quote_id",
     )
+    created_at: datetime = Field(
+        default=...,
+        description="The date the quote was saved",
+    )
     quote: Quote = Relationship(back_populates="saved_quotes")
     user: "User" = Relationship(back_populates="saved_quotes")
 
@@ -181,6 +211,10 @@ class QuoteComment(Base, table=True):
         default=...,
         description="The comment text",
     )
+    reply_count: int = Field(
+        default=0,
+        description="The number of direct replies, maintained by _create_quote_comment",
+    )
     created_at: datetime = Field(
         default=datetime.now(),
         description="The user's creation date",
@@ -262,6 +296,25 @@ class User(Base, table=True):
     roles: list["UserRole"] = Relationship(back_populates="user", cascade_delete=True)
     webhooks: list["Webhook"] = Relationship(back_populates="user", cascade_delete=True)
 
+    @classmethod
+    def response_rows(cls, user_ids: set[int], session: Session) -> dict[int, dict]:
+        """
+        Load users embedded in responses as plain rows with one IN query
+
+        :return: Rows for UserSchema by user identifier
+        """
+        if not user_ids:
+            return {}
+
+        return {
+            row.user_id: dict(row._mapping)
+            for row in session.exec(
+                select(
+                    cls.user_id, cls.discord_id, cls.display_name, cls.avatar_url, cls.created_at, cls.deleted_at
+                ).where(cls.user_id.in_(user_ids))
+            )
+        }
+
 
 class UserRole(Base, table=True):
     __tablename__ = "user_roles"
@@ -285,6 +338,7 @@ class UserRole(Base, table=True):
     role: Role = Relationship(back_populates="user_roles")
     user: User = Relationship(back_populates="roles")
 
+
 class Webhook(Base, table=True):
     __tablename__ = "webhooks"
 
@@ -306,4 +360,132 @@ class Webhook(Base, table=True):
         default=...,
         description="The webhook token",
     )
-    user: User = Relationship(back_populates="webhooks")
\ No newline at end of file
+    disabled_at: datetime | None = Field(
+        default=None,
+        description="The date Discord rejected the webhook as unknown or unauthorized",
+    )
+    user: User = Relationship(back_populates="webhooks")
+
+
+class WebhookDelivery(Base, table=True):
+    __tablename__ = "webhook_outbox"
+
+    id: int = Field(
+        default=None,
+        description="The delivery identifier",
+        primary_key=True
+    )
+    webhook_id: int = Field(
+        default=...,
+        description="The webhook db identifier",
+        foreign_key="webhooks.id",
+        ondelete="CASCADE",
+    )
+    quote_id: int = Field(
+        default=...,
+        description="The quote identifier",
+        foreign_key="quotes.quote_id",
+        ondelete="CASCADE",
+    )
+    payload: str = Field(
+        default=...,
+        description="The JSON message to execute the webhook with",
+    )
+    attempts: int = Field(
+        default=0,
+        description="The number of failed delivery attempts",
+    )
+    last_error: str | None = Field(
+        default=None,
+        description="The error of the last failed attempt",
+    )
+    created_at: datetime = Field(
+        default=...,
+        description="The delivery creation date",
+    )
+    next_attempt_at: datetime = Field(
+        default=...,
+        description="The earliest date of the next delivery attempt",
+        index=True,
+    )
+    delivered_at: datetime | None = Field(
+        default=None,
+        description="The successful delivery date",
+    )
+    failed_at: datetime | None = Field(
+        default=None,
+        description="The date the delivery was given up",
+    )
+
+
+class LeaderboardEntry(Base, table=True):
+    __tablename__ = "quote_leaderboard"
+    __table_args__ = (Index("ix_quote_leaderboard_period_score", "period", "score", "quote_id"),)
+
+    period: str = Field(
+        default=...,
+        description="The leaderboard window, see leaderboard.main.WINDOWS",
+        primary_key=True
+    )
+    quote_id: int = Field(
+        default=...,
+        description="The quote identifier",
+        foreign_key="quotes.quote_id",
+        ondelete="CASCADE",
+        primary_key=True
+    )
+    score: int = Field(
+        default=0,
+        description="The total number of reactions on the quote",
+    )
+    created_at: datetime = Field(
+        default=...,
+        description="The quote creation date, the entry expires when it leaves the window",
+    )
+
+
+class AccountDeletion(Base, table=True):
+    __tablename__ = "account_deletions"
+
+    job_id: str = Field(
+        default=...,
+        description="The random deletion job identifier",
+        primary_key=True
+    )
+    user_id: int = Field(
+        default=...,
+        description="The identifier of the deleted user",
+        index=True,
+    )
+    status: Literal["pending", "running", "done"] = Field(
+        default="pending",
+        description="The job status",
+    )
+    phase: str | None = Field(
+        default=None,
+        description="The kind of rows being deleted, see accounts.main.PHASES",
+    )
+    total_rows: int = Field(
+        default=0,
+        description="The estimated number of rows to delete",
+    )
+    deleted_rows: int = Field(
+        default=0,
+        description="The number of rows deleted so far",
+    )
+    error: str | None = Field(
+        default=None,
+        description="The error of the last failed attempt, the job is retried once its lease expired",
+    )
+    created_at: datetime = Field(
+        default=...,
+        description="The job creation date",
+    )
+    updated_at: datetime = Field(
+        default=...,
+        description="The date of the last progress, running jobs not updated for a while are resumed",
+    )
+    finished_at: datetime | None = Field(
+        default=None,
+        description="The date the job finished",
+    )
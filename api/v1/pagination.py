@@ -0,0 +1,104 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional, TypeVar
+
+from fastapi import HTTPException
+from sqlmodel import and_, or_
+
+from config.main import parser
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = parser.getint("API", "default_page_size", fallback=20)
+MAX_PAGE_SIZE = parser.getint("API", "max_page_size", fallback=100)
+# Rows fetched per round trip from the server-side cursor of streamed exports
+EXPORT_BATCH_SIZE = parser.getint("API", "export_batch_size", fallback=1000)
+# Replies embedded in every comment of a comment page
+COMMENT_REPLY_PREVIEW = parser.getint("API", "comment_reply_preview", fallback=3)
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """
+    Encode the sort key of the last row of a page into an opaque cursor
+    """
+    raw = json.dumps([created_at.isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor!")
+
+
+def paginate(
+    query,
+    created_column: Any,
+    id_column: Any,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = True,
+):
+    """
+    Apply keyset pagination on (created_at, id) to a query
+
+    One extra row is selected to find out if there is a next page, see :func:`next_page`.
+    """
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        if descending:
+            query = query.where(
+                or_(created_column < created_at, and_(created_column == created_at, id_column < id))
+            )
+        else:
+            query = query.where(
+                or_(created_column > created_at, and_(created_column == created_at, id_column > id))
+            )
+
+    if descending:
+        query = query.order_by(created_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(created_column, id_column)
+
+    return query.limit(limit + 1)
+
+
+def next_page(
+    rows: list[T],
+    limit: int,
+    key: Callable[[T], tuple[datetime, int]],
+) -> tuple[list[T], Optional[str]]:
+    """
+    Cut the extra row selected by :func:`paginate` off
+
+    :return: The rows of the page and the cursor of the next page, if any
+    """
+    if len(rows) <= limit:
+        return list(rows), None
+
+    rows = list(rows[:limit])
+    return rows, encode_cursor(*key(rows[-1]))
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """
+    Encode the position in a ranked result list, used where rows have no stable sort key
+    """
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode().rstrip("=")
+
+
+def decode_offset_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        offset = int(json.loads(raw)["offset"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(400, "Invalid cursor!")
+    if offset < 0:
+        raise HTTPException(400, "Invalid cursor!")
+    return offset
@@ -1,40 +1,62 @@
-from typing import Literal, Union
+from datetime import datetime
+from typing import Literal, Optional, Union
 
-from fastapi import APIRouter, Depends, Form, Query
+from fastapi import APIRouter, Depends, Form, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
 
-from api.v1.models.models import QuoteComment, QuoteReaction
+from api.v1.caching import cache_headers, cached_response, json_response, make_etag, not_modified, quote_tags
+from api.v1.dependencies import get_current_user, get_ids, get_optional_user
+from api.v1.models.models import QuoteReaction, User
+from api.v1.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from api.v1.schemas.discord import TokenBase
-from api.v1.schemas.quotes import CreateQuoteBody, CreateQuoteCommentBody, QuoteCommentSchema, QuoteSchema, SavedQuoteSchema, ToggleQuoteReactionBody
+from api.v1.schemas.pagination import Page
+from api.v1.schemas.quotes import (
+    CreateQuoteBody,
+    CreateQuoteCommentBody,
+    QuoteActionResultSchema,
+    QuoteActionsBody,
+    QuoteCommentSchema,
+    QuoteSchema,
+    SavedQuoteSchema,
+    ToggleQuoteReactionBody,
+)
 from api.v1.tasks.quotes import (
     _get_quotes,
     _create_quote,
+    _apply_quote_actions,
+    _export_quotes,
+    _get_quotes_batch,
     _get_top_quotes,
     _get_quote,
+    _get_quote_version,
     _delete_quote,
     _is_quote_saved,
-    _get_quote_reactions, _get_quote_comments, _create_quote_comment, _quote_toggle_react, _quote_toggle_save
+    _get_quote_reactions,
+    _get_quote_comments,
+    _get_quote_comments_version,
+    _get_comment_replies,
+    _create_quote_comment,
+    _quote_toggle_react,
+    _quote_toggle_save,
 )
-from database.main import DatabaseHandler
-from discord.main import DiscordOAuthHandler
+from database.main import db
 
 router = APIRouter(
     prefix="/quotes", tags=["Quotes"]
 )
 
-db = DatabaseHandler()
-dc_handler = DiscordOAuthHandler()
-
 
 @router.get(
-    "", response_model=list[QuoteSchema]
+    "", response_model=Page[QuoteSchema]
 )
 def get_quotes(
-    page: int = Query(
-        default=None, description="The page number to retrieve starting from 1"
+    request: Request,
+    cursor: str = Query(
+        default=None, description="The cursor of the page to retrieve, starts with the first page"
     ),
     limit: int = Query(
-        default=None, description="The number of items to retrieve"
+        default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="The number of items to retrieve"
     ),
     search: str = Query(
         default=None, description="The search term to filter quotes by",
@@ -42,12 +64,19 @@ def get_quotes(
     sort: Literal["ascend", "descend"] = Query(
         default="descend", description="The order to sort the quotes by"
     ),
-    token: str = Query(
-        default=None, description="The JWT token from the current user"
-    ),
+    viewer: Optional[User] = Depends(get_optional_user),
     session: Session = Depends(db.get_session),
 ):
-    return _get_quotes(page, limit, search, sort, token, session)
+    if viewer:
+        return json_response(Page[QuoteSchema], _get_quotes(cursor, limit, search, sort, viewer, session))
+
+    return cached_response(
+        request,
+        {"cursor": cursor, "limit": limit, "search": search, "sort": sort},
+        Page[QuoteSchema],
+        lambda: _get_quotes(cursor, limit, search, sort, viewer, session),
+        lambda page: ["listing", *quote_tags(page.items)],
+    )
 
 
 @router.post(
@@ -60,28 +89,111 @@ def create_quote(
     return _create_quote(payload.quote, payload.token, payload.send_webhook, session)
 
 
+@router.get(
+    "/batch", response_model=list[QuoteSchema]
+)
+def get_quotes_batch(
+    request: Request,
+    ids: list[int] = Depends(get_ids),
+    session: Session = Depends(db.get_session),
+):
+    # Viewer independent, so it is cached and the viewer's state is fetched from /users/me/quote-state
+    return cached_response(
+        request,
+        {"ids": ",".join(map(str, ids))},
+        list[QuoteSchema],
+        lambda: _get_quotes_batch(ids, session),
+        quote_tags,
+    )
+
+
+@router.post(
+    "/actions", response_model=list[QuoteActionResultSchema]
+)
+def apply_quote_actions(
+    payload: QuoteActionsBody,
+    session: Session = Depends(db.get_session),
+):
+    return _apply_quote_actions(payload.actions, payload.token, session)
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}},
+)
+def export_quotes(
+    format: Literal["ndjson", "csv"] = Query(
+        default="ndjson", description="The format to export the quotes in"
+    ),
+    user: int = Query(
+        default=None, description="Only export the quotes of this user identifier"
+    ),
+    since: datetime = Query(
+        default=None, description="Only export quotes created at or after this date"
+    ),
+    until: datetime = Query(
+        default=None, description="Only export quotes created before this date"
+    ),
+    reactions: bool = Query(
+        default=False, description="Include the reaction counts of every quote"
+    ),
+):
+    return StreamingResponse(
+        _export_quotes(format, user, since, until, reactions, db.read_engine()),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename=quotes.{format}"},
+    )
+
+
 @router.get(
     "/top", response_model=list[QuoteSchema], )
 def get_top_quotes(
-    limit: int = Query(default=10, description="The number of top quotes to retrieve"),
-    token: str = Query(default=None, description="The JWT token from the current user"),
+    request: Request,
+    limit: int = Query(default=10, ge=1, le=MAX_PAGE_SIZE, description="The number of top quotes to retrieve"),
+    window: Literal["24h", "7d", "30d"] = Query(
+        default="30d", description="The time window the quotes were created in"
+    ),
+    viewer: Optional[User] = Depends(get_optional_user),
     session: Session = Depends(db.get_session),
 ):
-    # Get top quotes of the last 30 days sorted by QuoteReaction count
-    return _get_top_quotes(limit, token, session)
+    # Get top quotes of the window sorted by QuoteReaction count
+    if viewer:
+        return json_response(list[QuoteSchema], _get_top_quotes(limit, window, viewer, session))
+
+    return cached_response(
+        request,
+        {"limit": limit, "window": window},
+        list[QuoteSchema],
+        lambda: _get_top_quotes(limit, window, viewer, session),
+        lambda quotes: ["leaderboard", *quote_tags(quotes)],
+    )
 
 
 @router.get(
     "/{id}", response_model=QuoteSchema
 )
 def get_quote(
+    request: Request,
     id: int,
-    token: str = Query(
-        default=None, description="The JWT token from the current user"
-    ),
+    viewer: Optional[User] = Depends(get_optional_user),
     session: Session = Depends(db.get_session),
 ):
-    return _get_quote(id, token, session)
+    headers = cache_headers(make_etag(_get_quote_version(id, viewer, session)), public=not viewer)
+    if unchanged := not_modified(request, headers):
+        return unchanged
+
+    if viewer:
+        return json_response(QuoteSchema, _get_quote(id, viewer, session), headers)
+
+    return cached_response(
+        request,
+        {},
+        QuoteSchema,
+        lambda: _get_quote(id, viewer, session),
+        lambda quote: quote_tags([quote]),
+        headers,
+    )
 
 
 @router.delete(
@@ -100,10 +212,10 @@ def delete_quote(
 )
 def is_quote_saved(
     id: int,
-    token: str = Query(..., description="The JWT token from the current user"),
+    user: User = Depends(get_current_user),
     session: Session = Depends(db.get_session)
 ):
-    return _is_quote_saved(id, token, session)
+    return _is_quote_saved(id, user, session)
 
 
 @router.get(
@@ -116,13 +228,44 @@ def get_quote_reactions(
 
 
 @router.get(
-    "/{id}/comments", response_model=list[QuoteCommentSchema]
+    "/{id}/comments", response_model=Page[QuoteCommentSchema]
 )
 def get_quote_comments(
+    request: Request,
+    response: Response,
     id: int,
+    cursor: str = Query(
+        default=None, description="The cursor of the page to retrieve, starts with the first page"
+    ),
+    limit: int = Query(
+        default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="The number of items to retrieve"
+    ),
     session: Session = Depends(db.get_session),
-) -> list[QuoteComment]:
-    return _get_quote_comments(id, session)
+):
+    etag = make_etag(cursor, limit, _get_quote_comments_version(id, session))
+    headers = cache_headers(etag, public=True)
+    if unchanged := not_modified(request, headers):
+        return unchanged
+
+    response.headers.update(headers)
+    return _get_quote_comments(id, cursor, limit, session)
+
+
+@router.get(
+    "/{id}/comments/{comment_id}/replies", response_model=Page[QuoteCommentSchema]
+)
+def get_comment_replies(
+    id: int,
+    comment_id: int,
+    cursor: str = Query(
+        default=None, description="The cursor of the page to retrieve, starts with the first page"
+    ),
+    limit: int = Query(
+        default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="The number of items to retrieve"
+    ),
+    session: Session = Depends(db.get_session),
+):
+    return _get_comment_replies(id, comment_id, cursor, limit, session)
 
 
 @router.post(
@@ -133,7 +276,7 @@ def create_quote_comment(
     payload: CreateQuoteCommentBody,
     session: Session = Depends(db.get_session)
 ):
-    return _create_quote_comment(id, payload.comment, payload.token, session)
+    return _create_quote_comment(id, payload.comment, payload.parent, payload.token, session)
 
 
 @router.post(
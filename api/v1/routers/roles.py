@@ -1,17 +1,14 @@
-from fastapi import APIRouter, Depends, Query
-from sqlmodel import Session
+from fastapi import APIRouter, Query
 
 from api.v1.models.models import Role
+from api.v1.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from api.v1.tasks.roles import _get_roles, _get_role
-from database.main import DatabaseHandler
 
 router = APIRouter(
     prefix="/roles",
     tags=["Roles"]
 )
 
-db = DatabaseHandler()
-
 
 @router.get(
     "",
@@ -19,16 +16,18 @@ db = DatabaseHandler()
 )
 def get_roles(
     page: int = Query(
-        default=None,
+        default=1,
+        ge=1,
         description="The page number to retrieve starting from 1"
     ),
     limit: int = Query(
-        default=None,
+        default=DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=MAX_PAGE_SIZE,
         description="The number of items to retrieve"
     ),
-    session: Session = Depends(db.get_session),
 ) -> list[Role]:
-    return _get_roles(page, limit, session)
+    return _get_roles(page, limit)
 
 
 @router.get(
@@ -37,6 +36,5 @@ def get_roles(
 )
 def get_role(
     id: int,
-    session: Session = Depends(db.get_session),
 ) -> Role:
-    return _get_role(id, session)
+    return _get_role(id)
@@ -1,16 +1,24 @@
-from typing import Literal
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, Path, Query, Form
+from fastapi import APIRouter, Depends, Path, Query, Form, Request, Response
 from sqlmodel import Session
 
-from api.v1.models.models import Quote, QuoteReaction, Webhook
+from api.v1.caching import cache_headers, cached_response, json_response, make_etag, not_modified, quote_tags
+from api.v1.dependencies import get_current_user, get_ids, get_optional_user
+from api.v1.models.models import Quote, Webhook
 from api.v1.models.models import Role, User
+from api.v1.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from api.v1.schemas.discord import AuthorizeBody, TokenBase, WebhookDeleteBody
-from api.v1.schemas.quotes import QuoteSchema
+from api.v1.schemas.pagination import Page
+from api.v1.schemas.quotes import QuoteSchema, QuoteStateSchema, UserReactionSchema
+from api.v1.schemas.users import AccountDeletionSchema, UserSuggestionSchema
 from api.v1.tasks.users import (
     _get_users,
+    _suggest_users,
     _get_me,
+    _get_quote_states,
     _delete_me,
+    _get_account_deletion,
     _get_user,
     _get_user_quotes,
     _get_user_reactions,
@@ -19,24 +27,25 @@ from api.v1.tasks.users import (
     _create_webhook,
     _get_webhooks, _delete_webhook
 )
-from database.main import DatabaseHandler
+from database.main import db
 
 router = APIRouter(
     prefix="/users",
     tags=["Users"]
 )
 
-db = DatabaseHandler()
-
 
 @router.get("", response_model=list[User])
 def get_users(
     page: int = Query(
-        default=None,
+        default=1,
+        ge=1,
         description="The page number to retrieve starting from 1"
     ),
     limit: int = Query(
-        default=None,
+        default=DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=MAX_PAGE_SIZE,
         description="The number of items to retrieve"
     ),
     search: str = Query(
@@ -48,29 +57,80 @@ def get_users(
     return _get_users(page, limit, search, session)
 
 
+@router.get(
+    "/suggest",
+    response_model=list[UserSuggestionSchema]
+)
+def suggest_users(
+    prefix: str = Query(
+        default=...,
+        min_length=1,
+        description="The beginning of the display name, or of a word of it"
+    ),
+    limit: int = Query(
+        default=10,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="The number of suggestions to retrieve"
+    ),
+):
+    return json_response(list[UserSuggestionSchema], _suggest_users(prefix, limit))
+
+
 @router.get(
     "/me",
     response_model=User
 )
 def get_me(
-    token: str = Query(
-        default=...,
-        description="The JWT token"
-    ),
-    session: Session = Depends(db.get_session),
+    user: User = Depends(get_current_user),
 ) -> User:
-    return _get_me(token, session)
+    return _get_me(user)
+
+
+@router.get(
+    "/me/quote-state",
+    response_model=list[QuoteStateSchema]
+)
+def get_quote_states(
+    ids: list[int] = Depends(get_ids),
+    user: User = Depends(get_current_user),
+    session: Session = Depends(db.get_session),
+):
+    return _get_quote_states(ids, user, session)
 
 
 @router.delete(
     "/me/delete",
-    response_model=User
+    response_model=User,
+    responses={202: {"model": AccountDeletionSchema, "description": "The account is deleted in the background"}},
 )
 def delete_me(
     payload: TokenBase,
     session: Session = Depends(db.get_session),
-) -> User:
-    return _delete_me(payload.token, session)
+):
+    user, job = _delete_me(payload.token, session)
+    if job:
+        return json_response(
+            AccountDeletionSchema,
+            job,
+            headers={"Location": f"/v1/users/deletions/{job['job_id']}"},
+            status_code=202,
+        )
+    return user
+
+
+@router.get(
+    "/deletions/{job_id}",
+    response_model=AccountDeletionSchema
+)
+def get_account_deletion(
+    job_id: str = Path(
+        default=...,
+        description="The deletion job identifier"
+    ),
+    session: Session = Depends(db.get_session),
+):
+    return json_response(AccountDeletionSchema, _get_account_deletion(job_id, session).model_dump())
 
 
 @router.get(
@@ -78,20 +138,31 @@ def delete_me(
     response_model=User,
 )
 def get_user(
+    request: Request,
+    response: Response,
     id: int = Path(
         default=...,
         description="The user or discord user identifier"
     ),
     session: Session = Depends(db.get_session),
 ) -> User:
-    return _get_user(id, session)
+    user = _get_user(id, session)
+
+    # Users have no version column, every serialized column is part of the ETag
+    headers = cache_headers(make_etag(user.model_dump()), public=True)
+    if unchanged := not_modified(request, headers):
+        return unchanged
+
+    response.headers.update(headers)
+    return user
 
 
 @router.get(
     "/{id}/quotes",
-    response_model=list[QuoteSchema]
+    response_model=Page[QuoteSchema]
 )
 def get_user_quotes(
+    request: Request,
     id: int = Path(
         default=...,
         description="The user identifier"
@@ -100,27 +171,54 @@ def get_user_quotes(
         default="descend",
         description="The order to sort the quotes by"
     ),
-    token: str = Query(
+    cursor: str = Query(
         default=None,
-        description="The JWT token"
+        description="The cursor of the page to retrieve, starts with the first page"
+    ),
+    limit: int = Query(
+        default=DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="The number of items to retrieve"
     ),
+    viewer: Optional[User] = Depends(get_optional_user),
     session: Session = Depends(db.get_session)
 ):
-    return _get_user_quotes(id, sort, token, session)
+    if viewer:
+        return json_response(Page[QuoteSchema], _get_user_quotes(id, sort, cursor, limit, viewer, session))
+
+    return cached_response(
+        request,
+        {"sort": sort, "cursor": cursor, "limit": limit},
+        Page[QuoteSchema],
+        lambda: _get_user_quotes(id, sort, cursor, limit, viewer, session),
+        lambda page: [f"user:{id}", *quote_tags(page.items)],
+    )
 
 
 @router.get(
     "/{id}/reactions",
-    response_model=list[QuoteReaction]
+    response_model=Page[UserReactionSchema]
 )
 def get_user_reactions(
     id: int = Path(
         default=...,
         description="The user identifier"
     ),
+    cursor: str = Query(
+        default=None,
+        description="The cursor of the page to retrieve, starts with the first page"
+    ),
+    limit: int = Query(
+        default=DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="The number of items to retrieve"
+    ),
+    viewer: Optional[User] = Depends(get_optional_user),
     session: Session = Depends(db.get_session),
-) -> list[QuoteReaction]:
-    return _get_user_reactions(id, session)
+):
+    return json_response(Page[UserReactionSchema], _get_user_reactions(id, cursor, limit, viewer, session))
 
 
 @router.get(
@@ -132,27 +230,33 @@ def get_user_roles(
         default=...,
         description="The user identifier"
     ),
-    session: Session = Depends(db.get_session),
 ) -> list[Role]:
-    return _get_user_roles(id, session)
+    return _get_user_roles(id)
 
 
 @router.get(
     "/{id}/saved-quotes",
-    response_model=list[QuoteSchema]
+    response_model=Page[QuoteSchema]
 )
 def get_user_saved_quotes(
     id: int = Path(
         default=...,
         description="The user identifier"
     ),
-    token: str = Query(
+    cursor: str = Query(
         default=None,
-        description="The JWT token"
+        description="The cursor of the page to retrieve, starts with the first page"
     ),
+    limit: int = Query(
+        default=DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="The number of items to retrieve"
+    ),
+    viewer: Optional[User] = Depends(get_optional_user),
     session: Session = Depends(db.get_session),
-) -> list[Quote]:
-    return _get_user_saved_quotes(id, token, session)
+):
+    return json_response(Page[QuoteSchema], _get_user_saved_quotes(id, cursor, limit, viewer, session))
 
 
 @router.post(
@@ -169,13 +273,10 @@ def create_webhook(
     response_model=list[Webhook]
 )
 def get_webhooks(
-    token: str = Query(
-        default=...,
-        description="The JWT token"
-    ),
+    user: User = Depends(get_current_user),
     session: Session = Depends(db.get_session),
 ):
-    return _get_webhooks(token, session)
+    return _get_webhooks(user, session)
 
 @router.delete(
     "/webhook"
@@ -30,4 +30,23 @@ class WebhookDeleteBody(TokenBase):
         default=...,
         description="The webhook db identifier"
     ),
-    
\ No newline at end of file
+
+class RefreshBody(Base):
+    refresh_token: str = Field(
+        default=...,
+        description="The refresh token issued together with the session token"
+    )
+
+class SessionTokensSchema(Base):
+    token: str = Field(
+        default=...,
+        description="Short-lived JWT session token"
+    )
+    refresh_token: str = Field(
+        default=...,
+        description="Long-lived JWT token to request a new session token"
+    )
+    expires_in: int = Field(
+        default=...,
+        description="Lifetime of the session token in seconds"
+    )
@@ -0,0 +1,27 @@
+from typing import Generic, Optional, TypeVar
+
+from humps import camel
+from pydantic import BaseModel, Field
+
+T = TypeVar("T")
+
+
+def to_camel(string):
+    return camel.case(string)
+
+
+class Base(BaseModel):
+    class Config:
+        alias_generator = to_camel
+        populate_by_name = True
+
+
+class Page(Base, Generic[T]):
+    items: list[T] = Field(
+        default=[],
+        description="The items of the page"
+    )
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="The cursor to retrieve the next page with, empty on the last page"
+    )
@@ -4,7 +4,7 @@ from typing import Literal, Optional, Union
 from humps import camel
 from pydantic import BaseModel, Field
 
-from api.v1.models.models import Quote, User
+from api.v1.models.models import REACTION_COUNT_COLUMNS, Quote, QuoteComment, User
 from api.v1.schemas.discord import TokenBase
 
 
@@ -18,6 +18,33 @@ class Base(BaseModel):
         populate_by_name = True
 
 
+class UserSchema(Base):
+    user_id: int = Field(
+        default=...,
+        description="The user's identifier",
+    )
+    discord_id: str = Field(
+        default=...,
+        description="The discord user's identifier",
+    )
+    display_name: str = Field(
+        default=...,
+        description="The user's name to display",
+    )
+    avatar_url: str = Field(
+        default="",
+        description="The user's avatar",
+    )
+    created_at: datetime | None = Field(
+        default=None,
+        description="The user's creation date",
+    )
+    deleted_at: datetime | None = Field(
+        default=None,
+        description="The user's deletion date",
+    )
+
+
 class QuoteSchema(Base):
     quote: str = Field(
         default=None,
@@ -53,9 +80,48 @@ class QuoteSchema(Base):
         description="The user's reaction to the quote",
     )
 
-    user: Union[User, None] = None
+    user: Union[UserSchema, None] = None
     reactions: list["QuoteReactionSchema"] = []
 
+    @staticmethod
+    def row(quote: Quote, user: Optional[dict], is_saved: bool = False, reaction: Optional[str] = None) -> dict:
+        """
+        Build the response row of a quote from loaded rows with plain attribute access
+
+        Rows are validated once by the precompiled adapter serializing the response, see
+        :func:`api.v1.caching.json_response`.
+        """
+        return {
+            "quote": quote.quote,
+            "quote_id": quote.quote_id,
+            "user_id": quote.user_id,
+            "created_at": quote.created_at,
+            "changed_at": quote.changed_at,
+            "deleted_at": quote.deleted_at,
+            "is_saved": is_saved,
+            "reaction": reaction,
+            "user": user,
+            "reactions": [
+                {"reaction_name": name, "count": getattr(quote, column)}
+                for name, column in REACTION_COUNT_COLUMNS.items()
+            ],
+        }
+
+
+class QuoteStateSchema(Base):
+    quote_id: int = Field(
+        default=...,
+        description="The quote identifier",
+    )
+    is_saved: bool = Field(
+        default=False,
+        description="The quote is saved by the user",
+    )
+    reaction: Optional[str] = Field(
+        default=None,
+        description="The user's reaction to the quote",
+    )
+
 
 class QuoteCommentSchema(Base):
     comment_id: int = Field(
@@ -86,8 +152,24 @@ class QuoteCommentSchema(Base):
         default=None,
         description="The user's deletion date",
     )
+    reply_count: int = Field(
+        default=0,
+        description="The number of direct replies",
+    )
 
-    user: Union[User, None] = None
+    user: Union[UserSchema, None] = None
+    replies: list["QuoteCommentSchema"] = Field(
+        default=[],
+        description="The first replies, the others are loaded from the replies endpoint",
+    )
+
+    @staticmethod
+    def row(comment: QuoteComment, user: Optional[dict], replies: list[dict]) -> dict:
+        return {
+            **comment.model_dump(),
+            "user": user,
+            "replies": replies,
+        }
 
 
 class QuoteReactionSchema(Base):
@@ -101,6 +183,27 @@ class QuoteReactionSchema(Base):
     )
 
 
+class UserReactionSchema(Base):
+    reaction_id: int = Field(
+        default=...,
+        description="The reaction identifier",
+    )
+    quote_id: int = Field(
+        default=...,
+        description="The quote identifier",
+    )
+    reaction_name: Literal["red-heart", "thumbs-up", "face-with-tears-of-joy", "melting-face", "skull"] = Field(
+        default=...,
+        description="The reaction name",
+    )
+    created_at: datetime = Field(
+        default=...,
+        description="The reaction date",
+    )
+
+    quote: Union[QuoteSchema, None] = None
+
+
 class SavedQuoteSchema(Base):
     saved_id: int = Field(
         default=...,
@@ -117,9 +220,53 @@ class CreateQuoteBody(TokenBase):
     
 class CreateQuoteCommentBody(TokenBase):
     comment: str = Field(default=..., description="Comment's text"),
+    parent: Optional[int] = Field(default=None, description="The identifier of the comment to reply to")
     
 class ToggleQuoteReactionBody(TokenBase):
     reaction_name: Literal["red-heart", "thumbs-up", "face-with-tears-of-joy", "melting-face", "skull"] = Field(
         default=..., 
         description="The reaction name"
-    ),
\ No newline at end of file
+    ),
+
+
+class QuoteAction(Base):
+    type: Literal["react", "save"] = Field(
+        default=...,
+        description="Toggle a reaction or the saved state of the quote",
+    )
+    quote_id: int = Field(
+        default=...,
+        description="The quote identifier",
+    )
+    reaction_name: Optional[
+        Literal["red-heart", "thumbs-up", "face-with-tears-of-joy", "melting-face", "skull"]
+    ] = Field(
+        default=None,
+        description="The reaction name, required for react actions",
+    )
+
+
+class QuoteActionsBody(TokenBase):
+    actions: list[QuoteAction] = Field(
+        default=...,
+        description="The actions to apply in order",
+    )
+
+
+class QuoteActionResultSchema(Base):
+    type: Literal["react", "save"] = Field(
+        default=...,
+        description="The action type",
+    )
+    quote_id: int = Field(
+        default=...,
+        description="The quote identifier",
+    )
+    result: Optional[bool] = Field(
+        default=None,
+        description="Whether the reaction or save is set after the action, like the toggle endpoints",
+    )
+    error: Optional[str] = Field(
+        default=None,
+        description="Why the action was skipped",
+    )
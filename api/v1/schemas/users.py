@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Literal, Optional
+
+from humps import camel
+from pydantic import BaseModel, Field
+
+
+def to_camel(string):
+    return camel.case(string)
+
+
+class Base(BaseModel):
+    class Config:
+        alias_generator = to_camel
+        populate_by_name = True
+
+
+class AccountDeletionSchema(Base):
+    job_id: str = Field(
+        default=...,
+        description="The deletion job identifier",
+    )
+    status: Literal["pending", "running", "done"] = Field(
+        default=...,
+        description="The job status",
+    )
+    phase: Optional[str] = Field(
+        default=None,
+        description="The kind of rows being deleted",
+    )
+    total_rows: int = Field(
+        default=0,
+        description="The estimated number of rows to delete",
+    )
+    deleted_rows: int = Field(
+        default=0,
+        description="The number of rows deleted so far",
+    )
+    created_at: datetime = Field(
+        default=...,
+        description="The job creation date",
+    )
+    finished_at: Optional[datetime] = Field(
+        default=None,
+        description="The date the account was deleted",
+    )
+
+
+class UserSuggestionSchema(Base):
+    user_id: int = Field(
+        default=...,
+        description="The user's identifier",
+    )
+    display_name: str = Field(
+        default=...,
+        description="The user's name to display",
+    )
+    avatar_url: str = Field(
+        default="",
+        description="The user's avatar",
+    )
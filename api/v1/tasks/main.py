@@ -5,10 +5,14 @@ from fastapi import HTTPException
 from sqlmodel import Session, select
 
 from api.v1.models.models import User
-from config.main import parser
-from discord.main import DiscordOAuthHandler
-
-dc_handler = DiscordOAuthHandler()
+from auth.main import SessionTokens, session_handler
+from cache.main import store
+from cache.responses import response_cache
+from cache.roles import role_cache
+from database.main import db, engines
+from discord.main import dc_handler
+from search.main import search_backend
+from search.suggest import user_suggestions
 
 
 def _authorize(
@@ -18,22 +22,30 @@ def _authorize(
     """
     Authorize user with Discord
 
-    :return: JWT token
+    :return: Session and refresh JWT tokens
     """
-    key = parser.get("JWT", "key")
-
     access_response = dc_handler.receive_access_response(code)
     if not "access_token" in access_response:
         raise HTTPException(status_code=400, detail="Invalid authorization code")
 
-    user_info = dc_handler.receive_user_information(access_response["access_token"])
+    user_info = dc_handler.receive_user_information(
+        access_response["access_token"], access_response.get("expires_in")
+    )
     if not "id" in user_info:
         raise HTTPException(status_code=400, detail="Invalid user information")
 
     # Add or update user
     user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
 
-    if not user:
+    if user and user.deleted_at:
+        raise HTTPException(status_code=409, detail="The account is being deleted")
+    created = not user
+    renamed = bool(user) and user.display_name != user_info["global_name"]
+    # Name and avatar are embedded in cached quote responses
+    profile_changed = bool(user) and (user.display_name, user.avatar_url) != (
+        user_info["global_name"], user_info["avatar"]
+    )
+    if created:
         user = User(
             discord_id=user_info["id"],
             email_address=user_info["email"],
@@ -47,6 +59,57 @@ def _authorize(
         user.email_address = user_info["email"]
 
     session.add(user)
+    session.flush()
+    if created or renamed:
+        search_backend.index_user(session, user.user_id, user.display_name)
     session.commit()
+    if profile_changed:
+        response_cache.invalidate(f"user:{user.user_id}")
+    # Every update makes all workers reload the suggestion overlay
+    if created or profile_changed:
+        user_suggestions.update(user.user_id, user.display_name, user.avatar_url)
+
+    return _create_session_tokens(user)
+
+
+def _refresh(
+    refresh_token: str,
+    session: Session,
+) -> SessionTokens:
+    """
+    Exchange a refresh token for a new session
+
+    :return: Session and refresh JWT tokens
+    """
+    try:
+        claims = session_handler.decode(refresh_token, "refresh")
+    except jwt.PyJWTError:
+        claims = None
 
-    return jwt.encode(access_response, key)
+    if not claims:
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+
+    user = session.get(User, claims["user_id"])
+    if not user or user.deleted_at:
+        raise HTTPException(status_code=401, detail="User is not registered!")
+
+    return _create_session_tokens(user)
+
+
+def _create_session_tokens(
+    user: User,
+) -> SessionTokens:
+    roles = [role.name for role in role_cache.user_roles(user.user_id)]
+    tokens = session_handler.create_tokens(user.user_id, user.discord_id, roles)
+    # The user may have just been created or changed on the primary, which replicas might not have caught up with
+    db.stick(tokens["token"])
+    return tokens
+
+
+def _get_metrics() -> dict[str, int]:
+    """
+    Get the counters shared by all workers and the connection pool gauges of this worker
+
+    :return: Counter and gauge values by name
+    """
+    return {**store.counters(), **engines.pool_stats()}
@@ -1,51 +1,76 @@
-from datetime import datetime, timedelta
-from typing import Literal
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Literal, Optional
 
-from discord_webhook import DiscordWebhook, DiscordEmbed
 from fastapi import HTTPException
-from sqlalchemy import func
-from sqlalchemy.orm import selectinload
-from sqlmodel import select, Session, or_, and_
-
-from api.v1.models.models import Quote, User, SavedQuote, QuoteReaction, QuoteComment, Webhook
-from api.v1.schemas.quotes import QuoteSchema
-from discord.main import DiscordOAuthHandler
-
-dc_handler = DiscordOAuthHandler()
+from sqlalchemy import Engine, delete, func, insert, literal, update
+from sqlalchemy.orm import aliased
+from sqlmodel import select, Session, and_
+
+from api.v1.dependencies import MAX_BATCH_SIZE, authenticate
+from api.v1.models.models import REACTION_TYPES, Quote, User, SavedQuote, QuoteReaction, QuoteComment, WebhookDelivery
+from api.v1.pagination import (
+    COMMENT_REPLY_PREVIEW,
+    EXPORT_BATCH_SIZE,
+    decode_offset_cursor,
+    encode_offset_cursor,
+    next_page,
+    paginate,
+)
+from api.v1.schemas.quotes import QuoteAction, QuoteCommentSchema, QuoteSchema
+from cache.responses import response_cache
+from cache.roles import role_cache
+from leaderboard.main import leaderboard
+from search.main import search_backend
+from webhooks.main import enqueue_quote
 
 
 def _get_quotes(
-    page: int,
+    cursor: Optional[str],
     limit: int,
     search: str,
     sort: Literal["ascend", "descend"],
-    token: str,
+    viewer: Optional[User],
     session: Session,
 ):
+    if search:
+        return _search_quotes(cursor, limit, search, viewer, session)
+
     # Query quotes
-    query = select(Quote).options(selectinload(Quote.user))
+    query = select(Quote)
+    query = paginate(query, Quote.created_at, Quote.quote_id, cursor, limit, sort == "descend")
+    quotes, next_cursor = next_page(session.exec(query).all(), limit, lambda quote: (quote.created_at, quote.quote_id))
 
-    if page and limit and page > 0 and limit > 0:
-        query = query.limit(limit).offset((page - 1) * limit)
+    return {
+        "items": Quote.formatted_quotes(quotes, session, viewer),
+        "next_cursor": next_cursor,
+    }
 
-    if search:
-        query = query.join(User).where(
-            or_(
-                Quote.quote.like(f"%{search}%"), User.display_name.like(f"%{search}%")
-            )
-        )
 
-    if sort == "descend":
-        query = query.order_by(Quote.created_at.desc())
-    else:
-        query = query.order_by(Quote.created_at)
+def _search_quotes(
+    cursor: Optional[str],
+    limit: int,
+    search: str,
+    viewer: Optional[User],
+    session: Session,
+):
+    # Results are ordered by relevance, so the cursor is the offset into the ranked result list
+    offset = decode_offset_cursor(cursor)
+    ids = search_backend.search_quotes(session, search, offset, limit + 1)
+
+    next_cursor = None
+    if len(ids) > limit:
+        ids = ids[:limit]
+        next_cursor = encode_offset_cursor(offset + limit)
 
-    quotes = session.exec(query).all()
+    quotes = {quote.quote_id: quote for quote in session.exec(select(Quote).where(Quote.quote_id.in_(ids)))}
 
-    if token:
-        user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
-        return [quote.formatted_quote(user_info) for quote in quotes]
-    return [quote.formatted_quote() for quote in quotes]
+    return {
+        "items": Quote.formatted_quotes([quotes[id] for id in ids if id in quotes], session, viewer),
+        "next_cursor": next_cursor,
+    }
 
 
 def _create_quote(
@@ -54,13 +79,7 @@ def _create_quote(
     send_webhook: bool,
     session: Session,
 ):
-    access_response = dc_handler.decode_token(token)
-
-    user_info = dc_handler.receive_user_information(access_response["access_token"])
-    user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
-
-    if not user:
-        raise HTTPException(404, "User is not registered!")
+    user = authenticate(token, session)
 
     quote_obj = Quote(
         quote=quote, user_id=user.user_id, created_at=datetime.now()
@@ -70,73 +89,135 @@ def _create_quote(
     session.flush()
 
     quote_dump: QuoteSchema = quote_obj.formatted_quote()
-
-    session.commit()
+    search_backend.index_quote(session, quote_obj.quote_id, quote_obj.quote, user.display_name)
+    leaderboard.add_quote(session, quote_obj)
 
     if send_webhook:
-        # Post to Discord Webhook
-        webhooks = session.exec(select(Webhook)).all()
-        if not webhooks:
-            return quote_dump
-
-        webhook_urls = [f"{dc_handler.discord_api_endpoint}/webhooks/{webhook.webhook_id}/{webhook.webhook_token}" for
-            webhook in webhooks]
-
-        dc_webhooks = DiscordWebhook.create_batch(
-            webhook_urls,
-            avatar_url="https://quotly.eu/quotly512.png",
-            username="Quotly"
-        )
+        # Queued in the same transaction, the webhook worker delivers it to Discord
+        enqueue_quote(quote_obj, user, session)
 
-        embed = DiscordEmbed(
-            title="Quotly",
-            url=f"https://quotly.eu/quote/{quote_dump.get("quote_id")}",
-            description=quote_dump.get("quote"),
-            color=0xffffff,
-            footer={
-                "text": quote_dump.get("user").display_name,
-                "icon_url": (f"https://cdn.discordapp.com/avatars/{quote_dump.get("user").discord_id}/"
-                             f"{quote_dump.get("user").avatar_url}")
-            }
-        )
-        for dc_webhook in dc_webhooks:
-            dc_webhook.add_embed(embed)
-            dc_webhook.execute()
+    session.commit()
+    leaderboard.invalidate()
+    response_cache.invalidate("listing", f"user:{user.user_id}")
 
     return quote_dump
 
 
+def _get_quotes_batch(
+    ids: list[int],
+    session: Session,
+):
+    # Viewer independent, the viewer's state comes from _get_quote_states
+    quotes = {quote.quote_id: quote for quote in session.exec(select(Quote).where(Quote.quote_id.in_(ids)))}
+
+    return Quote.formatted_quotes([quotes[id] for id in ids if id in quotes], session)
+
+
+def _export_quotes(
+    format: Literal["ndjson", "csv"],
+    user_id: Optional[int],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    include_reactions: bool,
+    engine: Engine,
+) -> Iterator[str]:
+    """
+    Stream quotes oldest first from a server-side cursor, in chunks of EXPORT_BATCH_SIZE rows
+
+    The generator opens its own session, since the response is streamed after the request's
+    session has been closed.
+    """
+    columns = ["quoteId", "quote", "userId", "displayName", "createdAt"]
+    query = select(Quote.quote_id, Quote.quote, Quote.user_id, User.display_name, Quote.created_at).join(
+        User, User.user_id == Quote.user_id
+    )
+    if include_reactions:
+        columns += REACTION_TYPES
+        query = query.add_columns(*[Quote.reaction_count_column(name) for name in REACTION_TYPES])
+
+    if user_id is not None:
+        query = query.where(Quote.user_id == user_id)
+    if since:
+        query = query.where(Quote.created_at >= since)
+    if until:
+        query = query.where(Quote.created_at < until)
+    query = query.order_by(Quote.created_at, Quote.quote_id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == "csv":
+        writer.writerow(columns)
+
+    with Session(engine) as session:
+        for rows in session.exec(query).partitions():
+            for row in rows:
+                if format == "csv":
+                    writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, row)), default=datetime.isoformat))
+                    buffer.write("\n")
+
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
 def _get_top_quotes(
     limit: int,
-    token: str,
+    period: str,
+    viewer: Optional[User],
     session: Session
 ):
-    # Get top quotes of the last 30 days sorted by QuoteReaction count
-    query = (select(Quote).outerjoin(Quote.reactions).where(
-        Quote.created_at >= datetime.now() - timedelta(days=30)
-    ).group_by(Quote.quote_id).order_by(func.count(Quote.reactions).desc()).limit(limit))
-
-    quotes = session.exec(query).all()
+    # Get top quotes of the window sorted by reaction count from the leaderboard
+    ids = leaderboard.top(period, limit)
+    quotes = {quote.quote_id: quote for quote in session.exec(select(Quote).where(Quote.quote_id.in_(ids)))}
 
-    if token:
-        user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
-        return [quote.formatted_quote(user_info) for quote in quotes]
-    return [quote.formatted_quote() for quote in quotes]
+    return Quote.formatted_quotes([quotes[id] for id in ids if id in quotes], session, viewer)
 
 
 def _get_quote(
     id: int,
-    token: str,
+    viewer: Optional[User],
     session: Session,
 ):
     quote = session.exec(select(Quote).where(Quote.quote_id == id)).first()
     if not quote:
         raise HTTPException(status_code=404, detail="Quote not found")
 
-    if token:
-        user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
-        return quote.formatted_quote(user_info)
-    return quote.formatted_quote()
+    return Quote.formatted_quotes([quote], session, viewer)[0]
+
+
+def _get_quote_version(
+    id: int,
+    viewer: Optional[User],
+    session: Session,
+) -> tuple:
+    """
+    Versions of the rows the response of :func:`_get_quote` is built from, for its ETag
+    """
+    query = select(
+        Quote.quote_id,
+        Quote.changed_at,
+        *[Quote.reaction_count_column(name) for name in REACTION_TYPES],
+        User.display_name,
+        User.avatar_url,
+    ).join(User, User.user_id == Quote.user_id).where(Quote.quote_id == id)
+
+    if viewer:
+        query = query.add_columns(QuoteReaction.reaction_name, SavedQuote.saved_id).outerjoin(
+            QuoteReaction, and_(QuoteReaction.quote_id == Quote.quote_id, QuoteReaction.user_id == viewer.user_id)
+        ).outerjoin(
+            SavedQuote, and_(SavedQuote.quote_id == Quote.quote_id, SavedQuote.user_id == viewer.user_id)
+        )
+
+    version = session.exec(query).first()
+    if not version:
+        raise HTTPException(status_code=404, detail="Quote not found")
+
+    return viewer.user_id if viewer else None, *version
 
 
 def _delete_quote(
@@ -144,40 +225,27 @@ def _delete_quote(
     token: str,
     session: Session
 ):
-    user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
-
-    user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
-
-    if not user:
-        raise HTTPException(404, "User is not registered!")
+    user = authenticate(token, session)
 
     quote = session.exec(select(Quote).where(Quote.quote_id == id)).first()
     if not quote:
         raise HTTPException(404, "Quote not found!")
 
-    is_admin = False
-    for role in user.roles:
-        if role.role.name == "admin":
-            is_admin = True
+    if quote.user_id != user.user_id and not role_cache.has_role(user.user_id, "admin"):
+        raise HTTPException(403, "Insufficient permissions!")
 
-    if quote.user_id is not user.user_id or not is_admin:
-        raise HTTPException(400, "Insufficient permissions!")
-
-    session.delete(quote)
+    author_id = quote.user_id
+    _delete_quote_rows([quote.quote_id], session)
     session.commit()
+    leaderboard.invalidate()
+    response_cache.invalidate("listing", f"quote:{id}", f"user:{author_id}")
 
 
 def _is_quote_saved(
     id: int,
-    token: str,
+    user: User,
     session: Session
 ):
-    user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
-
-    user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     quote = session.exec(select(Quote).where(Quote.quote_id == id)).first()
     if not quote:
         raise HTTPException(status_code=404, detail="Quote not found")
@@ -198,32 +266,135 @@ def _get_quote_reactions(
 
 def _get_quote_comments(
     id: int,
+    cursor: Optional[str],
+    limit: int,
     session: Session,
-) -> list[QuoteComment]:
-    result = session.exec(select(QuoteComment).where(QuoteComment.quote_id == id)).all()
-    return result
+):
+    # Top level comments, replies are previewed and loaded level by level with _get_comment_replies
+    query = paginate(
+        select(QuoteComment).where(QuoteComment.quote_id == id, QuoteComment.parent == None),
+        QuoteComment.created_at, QuoteComment.comment_id, cursor, limit, descending=False
+    )
+    comments, next_cursor = next_page(
+        session.exec(query).all(), limit, lambda comment: (comment.created_at, comment.comment_id)
+    )
+
+    return {
+        "items": _format_comments(comments, session),
+        "next_cursor": next_cursor,
+    }
+
+
+def _get_comment_replies(
+    id: int,
+    comment_id: int,
+    cursor: Optional[str],
+    limit: int,
+    session: Session,
+):
+    query = paginate(
+        select(QuoteComment).where(QuoteComment.quote_id == id, QuoteComment.parent == comment_id),
+        QuoteComment.created_at, QuoteComment.comment_id, cursor, limit, descending=False
+    )
+    replies, next_cursor = next_page(
+        session.exec(query).all(), limit, lambda comment: (comment.created_at, comment.comment_id)
+    )
+
+    return {
+        "items": _format_comments(replies, session),
+        "next_cursor": next_cursor,
+    }
+
+
+def _format_comments(
+    comments: list[QuoteComment],
+    session: Session,
+) -> list[dict]:
+    """
+    Attach the first COMMENT_REPLY_PREVIEW replies and the authors to a page of comments
+
+    The previews of all comments are loaded with one windowed query and the authors of the
+    comments and previews with one IN query.
+    """
+    previews: dict[int, list[QuoteComment]] = {}
+    parent_ids = [comment.comment_id for comment in comments if comment.reply_count]
+
+    if parent_ids and COMMENT_REPLY_PREVIEW:
+        position = func.row_number().over(
+            partition_by=QuoteComment.parent, order_by=(QuoteComment.created_at, QuoteComment.comment_id)
+        ).label("position")
+        ranked = select(QuoteComment, position).where(QuoteComment.parent.in_(parent_ids)).subquery()
+        reply = aliased(QuoteComment, ranked)
+
+        for row in session.exec(
+            select(reply).where(ranked.c.position <= COMMENT_REPLY_PREVIEW).order_by(reply.created_at, reply.comment_id)
+        ):
+            previews.setdefault(row.parent, []).append(row)
+
+    user_ids = {comment.user_id for comment in comments}
+    user_ids.update(row.user_id for replies in previews.values() for row in replies)
+    users = User.response_rows(user_ids, session)
+
+    return [
+        QuoteCommentSchema.row(
+            comment,
+            users.get(comment.user_id),
+            [QuoteCommentSchema.row(row, users.get(row.user_id), []) for row in previews.get(comment.comment_id, [])],
+        )
+        for comment in comments
+    ]
+
+
+def _get_quote_comments_version(
+    id: int,
+    session: Session,
+) -> tuple:
+    """
+    Versions of the comments of a quote and of their embedded authors, for the ETag of
+    :func:`_get_quote_comments`
+    """
+    comments = tuple(session.exec(
+        select(
+            func.count(),
+            func.max(QuoteComment.comment_id),
+            func.max(QuoteComment.updated_at),
+            func.max(QuoteComment.deleted_at),
+        ).where(QuoteComment.quote_id == id)
+    ).one())
+    # Users have no version column, so renames and new avatars show up in the authors' columns
+    authors = tuple(tuple(row) for row in session.exec(
+        select(User.user_id, User.display_name, User.avatar_url, User.deleted_at)
+        .where(User.user_id.in_(select(QuoteComment.user_id).where(QuoteComment.quote_id == id)))
+        .order_by(User.user_id)
+    ))
+    return comments + (authors,)
 
 
 def _create_quote_comment(
     id: int,
     comment: str,
+    parent: Optional[int],
     token: str,
     session: Session
 ):
     if not comment:
         raise HTTPException(400, "Required comment is empty!")
 
-    if not token:
-        raise HTTPException(400, "Required token is empty!")
+    user = authenticate(token, session)
 
-    user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
-    user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
+    if parent is not None:
+        parent_comment = session.get(QuoteComment, parent)
+        if not parent_comment or parent_comment.quote_id != id:
+            raise HTTPException(404, "Parent comment not found!")
 
-    if not user:
-        raise HTTPException(404, "User is not registered!")
+        session.exec(
+            update(QuoteComment).where(QuoteComment.comment_id == parent).values(
+                reply_count=QuoteComment.reply_count + 1
+            )
+        )
 
     comment_object = QuoteComment(
-        comment=comment, quote_id=id, user_id=user.user_id, created_at=datetime.now()
+        comment=comment, quote_id=id, parent=parent, user_id=user.user_id, created_at=datetime.now()
     )
 
     session.add(comment_object)
@@ -236,44 +407,76 @@ def _create_quote_comment(
     return comment_dump
 
 
+def _detach_comments(
+    comments: list[tuple[int, Optional[int]]],
+    session: Session,
+):
+    """
+    Prepare deleting comments, given as (comment_id, parent): their replies move to the top level and
+    the reply counters of their parents lose them
+    """
+    comment_ids = [comment_id for comment_id, _ in comments]
+    session.exec(update(QuoteComment).where(QuoteComment.parent.in_(comment_ids)).values(parent=None))
+
+    replies: dict[int, int] = {}
+    for _, parent in comments:
+        if parent is not None:
+            replies[parent] = replies.get(parent, 0) + 1
+    for parent, count in replies.items():
+        session.exec(
+            update(QuoteComment).where(QuoteComment.comment_id == parent).values(
+                reply_count=QuoteComment.reply_count - count
+            )
+        )
+
+
+def _delete_quote_rows(
+    quote_ids: list[int],
+    session: Session,
+) -> int:
+    """
+    Delete quotes with set-based statements in dependency order, instead of loading the ORM cascades
+
+    Deliveries, reactions, saves, comments, leaderboard entries and the search index entries of the
+    quotes are deleted first. The caller commits and invalidates caches.
+
+    :return: The number of deleted rows
+    """
+    if not quote_ids:
+        return 0
+
+    deleted = session.exec(delete(WebhookDelivery).where(WebhookDelivery.quote_id.in_(quote_ids))).rowcount
+    deleted += session.exec(delete(QuoteReaction).where(QuoteReaction.quote_id.in_(quote_ids))).rowcount
+    deleted += session.exec(delete(SavedQuote).where(SavedQuote.quote_id.in_(quote_ids))).rowcount
+    # Replies reference their parents, unlink them so no row is deleted before its replies
+    session.exec(
+        update(QuoteComment)
+        .where(QuoteComment.quote_id.in_(quote_ids), QuoteComment.parent.is_not(None))
+        .values(parent=None)
+    )
+    deleted += session.exec(delete(QuoteComment).where(QuoteComment.quote_id.in_(quote_ids))).rowcount
+    leaderboard.remove_quotes(session, quote_ids)
+    search_backend.remove_quotes(session, quote_ids)
+    deleted += session.exec(delete(Quote).where(Quote.quote_id.in_(quote_ids))).rowcount
+    return deleted
+
+
 def _quote_toggle_react(
     id: int,
     reaction_name: Literal["red-heart", "thumbs-up", "face-with-tears-of-joy", "melting-face", "skull"],
     token: str,
     session: Session
 ):
-    user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
-
-    user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = authenticate(token, session)
 
-    quote = session.exec(select(Quote).where(Quote.quote_id == id)).first()
-    if not quote:
-        raise HTTPException(status_code=404, detail="Quote not found")
+    reacted, counters = _toggle_reaction(id, user.user_id, reaction_name, session)
+    session.commit()
 
-    reaction = session.exec(
-        select(QuoteReaction).where(
-            and_(QuoteReaction.quote_id == quote.quote_id, QuoteReaction.user_id == user.user_id)
-        )
-    ).first()
+    if counters:
+        leaderboard.invalidate()
+        response_cache.invalidate(f"quote:{id}")
 
-    if reaction:
-        if reaction.reaction_name == reaction_name:
-            session.delete(reaction)
-            session.commit()
-            return False
-        else:
-            reaction.reaction_name = reaction_name
-            session.commit()
-            return True
-    else:
-        saved_object = QuoteReaction(
-            user_id=user.user_id, quote_id=quote.quote_id, reaction_name=reaction_name
-        )
-        session.add(saved_object)
-        session.commit()
-        return True
+    return reacted
 
 
 def _quote_toggle_save(
@@ -281,27 +484,195 @@ def _quote_toggle_save(
     token: str,
     session: Session
 ):
-    user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
+    user = authenticate(token, session)
 
-    user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    saved = _toggle_save(id, user.user_id, session)
+    session.commit()
 
-    quote = session.exec(select(Quote).where(Quote.quote_id == id)).first()
-    if not quote:
-        raise HTTPException(status_code=404, detail="Quote not found")
+    return saved
 
-    saved = session.exec(
-        select(SavedQuote).where(and_(SavedQuote.quote_id == quote.quote_id, SavedQuote.user_id == user.user_id))
-    ).first()
-    if saved:
-        session.delete(saved)
-        session.commit()
-    else:
-        saved_object = SavedQuote(
-            user_id=user.user_id, quote_id=quote.quote_id
+
+def _toggle_reaction(
+    id: int,
+    user_id: int,
+    reaction_name: str,
+    session: Session,
+) -> tuple[bool, dict[str, int]]:
+    """
+    Toggle a reaction of the user without committing, safe against concurrent toggles of the same user
+
+    :return: Whether the reaction is set now, and the changes of the reaction counters of the quote
+    """
+    # Removing the current reaction tells which one it was, a different one is inserted afterwards
+    previous = session.exec(
+        delete(QuoteReaction)
+        .where(QuoteReaction.quote_id == id, QuoteReaction.user_id == user_id)
+        .returning(QuoteReaction.reaction_name)
+    ).scalar()
+
+    counters = {previous: -1} if previous else {}
+    reacted = False
+    if previous != reaction_name:
+        reacted = _insert_ignore(
+            QuoteReaction,
+            {"user_id": user_id, "reaction_name": reaction_name, "created_at": datetime.now()},
+            id,
+            session,
         )
-        session.add(saved_object)
-        session.commit()
+        if reacted:
+            counters[reaction_name] = 1
+
+    # Reaction counters on the quote are updated atomically in the same transaction
+    _update_reaction_counts(id, counters, session)
+    leaderboard.update(session, id, sum(counters.values()))
+
+    return reacted, counters
+
+
+def _toggle_save(
+    id: int,
+    user_id: int,
+    session: Session,
+) -> bool:
+    """
+    Toggle the saved state of the quote for the user without committing
+
+    :return: Whether the quote is saved now
+    """
+    removed = session.exec(
+        delete(SavedQuote).where(SavedQuote.quote_id == id, SavedQuote.user_id == user_id)
+    ).rowcount
+    if not removed:
+        _insert_ignore(SavedQuote, {"user_id": user_id, "created_at": datetime.now()}, id, session)
 
-    return False if saved else True
+    return not removed
+
+
+def _insert_ignore(
+    model: type[SavedQuote | QuoteReaction],
+    values: dict,
+    id: int,
+    session: Session,
+) -> bool:
+    """
+    Insert a row of the user for a quote in one statement, unless the quote does not exist or the
+    unique (quote_id, user_id) key already has a row, which a concurrent request inserted
+
+    :return: Whether the row was inserted
+    """
+    columns = list(values)
+    source = select(*[literal(value) for value in values.values()], Quote.quote_id).where(Quote.quote_id == id)
+    statement = (
+        insert(model)
+        .from_select([*columns, "quote_id"], source)
+        .prefix_with("IGNORE", dialect="mariadb")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+    if session.exec(statement).rowcount:
+        return True
+
+    if not session.get(Quote, id):
+        raise HTTPException(status_code=404, detail="Quote not found")
+    return False
+
+
+def _apply_quote_actions(
+    actions: list[QuoteAction],
+    token: str,
+    session: Session,
+) -> list[dict]:
+    """
+    Apply reaction and save toggles in order within one transaction
+
+    Every action is applied with the statements of the single toggle endpoints, so duplicate actions
+    and concurrent toggles of the same quote neither hit the unique keys nor skew the counters. Actions
+    on unknown quotes are skipped with an error instead of failing the whole batch.
+    """
+    if len(actions) > MAX_BATCH_SIZE:
+        raise HTTPException(400, f"At most {MAX_BATCH_SIZE} actions are allowed!")
+
+    user = authenticate(token, session)
+
+    results = []
+    changed_ids = set()
+    for action in actions:
+        result = {"type": action.type, "quote_id": action.quote_id}
+        results.append(result)
+
+        try:
+            if action.type == "save":
+                result["result"] = _toggle_save(action.quote_id, user.user_id, session)
+            elif not action.reaction_name:
+                result["error"] = "Required reaction name is empty!"
+            else:
+                result["result"], counters = _toggle_reaction(
+                    action.quote_id, user.user_id, action.reaction_name, session
+                )
+                if counters:
+                    changed_ids.add(action.quote_id)
+        except HTTPException as error:
+            result["error"] = error.detail
+
+    session.commit()
+
+    if changed_ids:
+        leaderboard.invalidate()
+        response_cache.invalidate(*[f"quote:{id}" for id in changed_ids])
+
+    return results
+
+
+def _update_reaction_counts(
+    id: int,
+    counters: dict[str, int],
+    session: Session,
+):
+    if not counters:
+        return
+
+    session.exec(
+        update(Quote).where(Quote.quote_id == id).values({
+            Quote.reaction_count_column(name): Quote.reaction_count_column(name) + delta
+            for name, delta in counters.items()
+        })
+    )
+
+
+def _remove_reaction_counts(
+    reactions: list[tuple[int, str]],
+    session: Session,
+):
+    """
+    Subtract reactions of one user, as (quote_id, reaction_name), from the counters before they are deleted
+
+    A user reacts at most once per quote, so every counter is decremented by one with one UPDATE per reaction type.
+    """
+    quote_ids: dict[str, list[int]] = {}
+    for quote_id, reaction_name in reactions:
+        quote_ids.setdefault(reaction_name, []).append(quote_id)
+
+    for name, ids in quote_ids.items():
+        column = Quote.reaction_count_column(name)
+        session.exec(update(Quote).where(Quote.quote_id.in_(ids)).values({column: column - 1}))
+
+
+def _reconcile_reaction_counts(
+    session: Session,
+) -> int:
+    """
+    Rebuild every reaction counter from the quote_reactions table
+
+    :return: The number of updated quotes
+    """
+    result = session.exec(
+        update(Quote).values({
+            Quote.reaction_count_column(name): (
+                select(func.count())
+                .where(QuoteReaction.quote_id == Quote.quote_id, QuoteReaction.reaction_name == name)
+                .scalar_subquery()
+            )
+            for name in REACTION_TYPES
+        })
+    )
+    session.commit()
+    return result.rowcount
@@ -1,18 +1,20 @@
-from typing import Literal
+from typing import Literal, Optional
 
 import jwt
 from fastapi import HTTPException
-from requests import session
 from sqlalchemy import Select
 from sqlmodel import Session, or_, select
 
-from api.v1.models.models import Quote, QuoteReaction, SavedQuote, Webhook
-from api.v1.models.models import Role, User, UserRole
-from api.v1.schemas.quotes import QuoteSchema
+from accounts.main import account_deleter
+from api.v1.dependencies import authenticate
+from api.v1.models.models import AccountDeletion, Quote, QuoteReaction, SavedQuote, Webhook
+from api.v1.models.models import Role, User
+from api.v1.pagination import next_page, paginate
+from cache.roles import role_cache
 from config.main import parser
-from discord.main import DiscordOAuthHandler
-
-dc_handler = DiscordOAuthHandler()
+from discord.main import dc_handler
+from search.main import search_backend
+from search.suggest import user_suggestions
 
 
 def _get_users(
@@ -21,48 +23,83 @@ def _get_users(
     search: str,
     session: Session,
 ) -> list[User]:
-    query = select(User)
-
-    if page and limit and page > 0 and limit > 0:
-        query = query.limit(limit).offset(page - 1 * limit)
-
     if search:
-        query = query.filter(User.display_name.like(f"%{search}%"))
+        ids = search_backend.search_users(session, search, (page - 1) * limit, limit)
+        users = {user.user_id: user for user in session.exec(select(User).where(User.user_id.in_(ids)))}
+        return [users[id] for id in ids if id in users]
+
+    query = select(User).order_by(User.user_id).limit(limit).offset((page - 1) * limit)
 
     result = session.exec(query).all()
 
     return result
 
 
+def _suggest_users(
+    prefix: str,
+    limit: int,
+) -> list[dict]:
+    return user_suggestions.suggest(prefix, limit)
+
+
 def _get_me(
-    token: str,
-    session: Session,
+    user: User,
 ) -> User:
-    access_response = dc_handler.decode_token(token)
+    return user.model_dump()
 
-    user_info = dc_handler.receive_user_information(access_response["access_token"])
-    user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
 
-    return user.model_dump()
+def _get_quote_states(
+    ids: list[int],
+    user: User,
+    session: Session,
+) -> list[dict]:
+    """
+    Saved flags and reactions of the user for the given quotes, with one indexed query each
+    """
+    if not ids:
+        return []
+
+    saved_ids = set(session.exec(
+        select(SavedQuote.quote_id).where(SavedQuote.user_id == user.user_id, SavedQuote.quote_id.in_(ids))
+    ).all())
+    reactions = dict(session.exec(
+        select(QuoteReaction.quote_id, QuoteReaction.reaction_name).where(
+            QuoteReaction.user_id == user.user_id, QuoteReaction.quote_id.in_(ids)
+        )
+    ).all())
+
+    return [{"quote_id": id, "is_saved": id in saved_ids, "reaction": reactions.get(id)} for id in ids]
 
 
 def _delete_me(
     token: str,
     session: Session,
-) -> User:
-    access_response = dc_handler.decode_token(token)
+) -> tuple[dict, Optional[dict]]:
+    """
+    Delete the account right away, or queue a background job for large accounts
 
-    user_info = dc_handler.receive_user_information(access_response["access_token"])
-    user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
-
-    if not user:
-        raise HTTPException(404, "User not found!")
+    :return: The deleted user and the deletion job, if one was queued
+    """
+    user = authenticate(token, session)
 
     user_dump = user.model_dump()
-    session.delete(user)
-    session.commit()
+    total_rows = account_deleter.count_rows(session, user.user_id)
+    if total_rows > account_deleter.background_threshold:
+        return user_dump, account_deleter.enqueue(session, user, total_rows)
+
+    account_deleter.mark_deleted(session, user)
+    account_deleter.delete(session, user.user_id)
+    return user_dump, None
+
 
-    return user_dump
+def _get_account_deletion(
+    job_id: str,
+    session: Session,
+) -> AccountDeletion:
+    job = session.get(AccountDeletion, job_id)
+    if not job:
+        raise HTTPException(404, "Account deletion not found!")
+    return job
 
 
 def _get_user(
@@ -78,61 +115,90 @@ def _get_user(
 def _get_user_quotes(
     id: int,
     sort: Literal["ascend", "descend"],
-    token: str,
+    cursor: Optional[str],
+    limit: int,
+    viewer: Optional[User],
     session: Session
-) -> list[QuoteSchema]:
-    user: User = session.exec(select(User).where(User.user_id == id)).first()
+):
+    user = session.get(User, id)
     if not user:
         raise HTTPException(404, "User not found!")
 
-    # Sort quotes by created_at
-    if sort == "ascend":
-        user.quotes.sort(key=lambda quote: quote.created_at)
-    else:
-        user.quotes.sort(key=lambda quote: quote.created_at, reverse=True)
+    query = paginate(
+        select(Quote).where(Quote.user_id == id), Quote.created_at, Quote.quote_id, cursor, limit, sort == "descend"
+    )
+    quotes, next_cursor = next_page(session.exec(query).all(), limit, lambda quote: (quote.created_at, quote.quote_id))
 
-    if token:
-        user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
-        return [quote.formatted_quote(user_info) for quote in user.quotes]
-    return [quote.formatted_quote() for quote in user.quotes]
+    return {
+        "items": Quote.formatted_quotes(quotes, session, viewer),
+        "next_cursor": next_cursor,
+    }
 
 
 def _get_user_reactions(
     id: int,
+    cursor: Optional[str],
+    limit: int,
+    viewer: Optional[User],
     session: Session,
-) -> list[QuoteReaction]:
-    result: list[QuoteReaction] = session.exec(select(QuoteReaction).where(QuoteReaction.user_id == id)).all()
-    return result
+):
+    # The reacted quotes are joined in, their authors and counters are formatted in batch
+    query = paginate(
+        select(QuoteReaction, Quote).join(Quote, Quote.quote_id == QuoteReaction.quote_id)
+        .where(QuoteReaction.user_id == id),
+        QuoteReaction.created_at, QuoteReaction.reaction_id, cursor, limit
+    )
+    rows, next_cursor = next_page(
+        session.exec(query).all(), limit, lambda row: (row[0].created_at, row[0].reaction_id)
+    )
+    quotes = Quote.formatted_quotes([quote for _, quote in rows], session, viewer)
+
+    return {
+        "items": [
+            {
+                "reaction_id": reaction.reaction_id,
+                "quote_id": reaction.quote_id,
+                "reaction_name": reaction.reaction_name,
+                "created_at": reaction.created_at,
+                "quote": quote,
+            }
+            for (reaction, _), quote in zip(rows, quotes)
+        ],
+        "next_cursor": next_cursor,
+    }
 
 
 def _get_user_roles(
     id: int,
-    session: Session,
 ) -> list[Role]:
-    user_roles = session.exec(select(UserRole).where(UserRole.user_id == id)).all()
-    return [user_role.role for user_role in user_roles]
+    return role_cache.user_roles(id)
 
 
 def _get_user_saved_quotes(
     id: int,
-    token: str,
+    cursor: Optional[str],
+    limit: int,
+    viewer: Optional[User],
     session: Session,
-) -> list[Quote]:
-    saved_quotes = session.exec(select(SavedQuote).where(SavedQuote.user_id == id)).all()
+):
+    # Most recently saved first, paginated on the save rather than the quote
+    query = paginate(
+        select(Quote, SavedQuote.created_at, SavedQuote.saved_id)
+        .join(SavedQuote, SavedQuote.quote_id == Quote.quote_id)
+        .where(SavedQuote.user_id == id),
+        SavedQuote.created_at, SavedQuote.saved_id, cursor, limit
+    )
+    rows, next_cursor = next_page(session.exec(query).all(), limit, lambda row: (row.created_at, row.saved_id))
 
-    if token:
-        user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
-        return [saved_quote.quote.formatted_quote(user_info) for saved_quote in saved_quotes]
-    return [saved_quote.quote.formatted_quote() for saved_quote in saved_quotes]
+    return {
+        "items": Quote.formatted_quotes([quote for quote, _, _ in rows], session, viewer),
+        "next_cursor": next_cursor,
+    }
 
 def _get_webhooks(
-    token: str,
+    user: User,
     session: Session,
 ) -> list[Webhook]:
-    user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
-    user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
-    if not user:
-        raise HTTPException(404, "User not found!")
     webhooks = session.exec(select(Webhook).where(Webhook.user_id == user.user_id)).all()
     return webhooks
 
@@ -147,7 +213,9 @@ def _create_webhook(
     if not webhook:
         raise HTTPException(404, "Webhook not found!")
 
-    user_info = dc_handler.receive_user_information(access_response["access_token"])
+    user_info = dc_handler.receive_user_information(
+        access_response["access_token"], access_response.get("expires_in")
+    )
     user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
     if not user:
         raise HTTPException(404, "User not found!")
@@ -167,10 +235,7 @@ def _delete_webhook(
     id: int,
     session: Session,
 ):
-    user_info = dc_handler.receive_user_information(dc_handler.decode_token(token)["access_token"])
-    user = session.exec(select(User).where(User.discord_id == user_info["id"])).first()
-    if not user:
-        raise HTTPException(404, "User not found!")
+    user = authenticate(token, session)
 
     webhook = session.exec(select(Webhook).where(Webhook.id == id)).first()
     if not webhook:
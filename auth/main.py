@@ -0,0 +1,68 @@
+import time
+from typing import Optional, TypedDict
+
+import jwt
+
+from config.main import parser
+
+
+class SessionHandler:
+    """
+    Issues and verifies the API's own session tokens.
+
+    Session tokens are short-lived and carry everything needed to resolve the local user, refresh tokens
+    live longer and can only be exchanged for a new token pair.
+    """
+
+    def __init__(self):
+        self.__key = parser.get("JWT", "key")
+        self.session_ttl = parser.getint("JWT", "session_ttl", fallback=900)
+        self.refresh_ttl = parser.getint("JWT", "refresh_ttl", fallback=2592000)
+
+    def create_tokens(self, user_id: int, discord_id: str, roles: list[str]) -> "SessionTokens":
+        now = int(time.time())
+        claims = {
+            "sub": str(user_id),
+            "user_id": user_id,
+            "discord_id": discord_id,
+            "roles": roles,
+            "iat": now,
+        }
+        return {
+            "token": jwt.encode({**claims, "type": "session", "exp": now + self.session_ttl}, self.__key),
+            "refresh_token": jwt.encode({**claims, "type": "refresh", "exp": now + self.refresh_ttl}, self.__key),
+            "expires_in": self.session_ttl,
+        }
+
+    def decode(self, token: str, token_type: str = "session") -> Optional["SessionClaims"]:
+        """
+        Decode a session or refresh token
+
+        :return: The token claims or None if the token is a legacy Discord access token
+        :raises jwt.PyJWTError: If the token is invalid or expired
+        """
+        claims = jwt.decode(token, self.__key, algorithms=["HS256"])
+        if "type" not in claims:
+            return None
+        if claims["type"] != token_type:
+            raise jwt.InvalidTokenError(f"Expected a {token_type} token")
+        return claims
+
+
+class SessionClaims(TypedDict):
+    sub: str
+    user_id: int
+    discord_id: str
+    roles: list[str]
+    type: str
+    iat: int
+    exp: int
+
+
+class SessionTokens(TypedDict):
+    token: str
+    refresh_token: str
+    expires_in: int
+
+
+session_handler = SessionHandler()
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import time
+from typing import Optional
+
+from cache.main import SharedStore, store
+from config.main import parser
+
+
+class IdentityCache:
+    """
+    Verified Discord identities keyed by a hash of the access token.
+
+    Entries live until the access token expires, but never longer than ``max_ttl`` seconds, and the
+    least recently used entries are evicted once ``max_entries`` is exceeded.
+    """
+
+    # Only rewrite the last usage of an entry this often, so hits stay read-only
+    touch_interval = 30
+
+    def __init__(self, store: SharedStore, max_entries: int, max_ttl: int):
+        self.store = store
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+
+        self.store.execute_script(
+            """
+            CREATE TABLE IF NOT EXISTS identities (
+                token_hash TEXT PRIMARY KEY,
+                discord_id TEXT NOT NULL,
+                user_info TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_identities_discord_id ON identities (discord_id);
+            CREATE INDEX IF NOT EXISTS ix_identities_used_at ON identities (used_at);
+            """
+        )
+
+    @staticmethod
+    def key(access_token: str) -> str:
+        return hashlib.sha256(access_token.encode()).hexdigest()
+
+    def get(self, access_token: str) -> Optional[dict]:
+        now = time.time()
+        row = self._row(access_token, now)
+
+        if not row:
+            self.store.increment("identity_cache.misses")
+            return None
+
+        if now - row[1] > self.touch_interval:
+            self.store.connection().execute(
+                "UPDATE identities SET used_at = ? WHERE token_hash = ?", (now, self.key(access_token))
+            )
+
+        self.store.increment("identity_cache.hits")
+        return json.loads(row[0])
+
+    def peek(self, access_token: str) -> Optional[dict]:
+        """
+        Look an entry up without counting a hit or miss or marking it used, e.g. while polling for it
+        """
+        row = self._row(access_token, time.time())
+        return json.loads(row[0]) if row else None
+
+    def _row(self, access_token: str, now: float) -> Optional[tuple[str, float]]:
+        return self.store.connection().execute(
+            "SELECT user_info, used_at FROM identities WHERE token_hash = ? AND expires_at > ?",
+            (self.key(access_token), now)
+        ).fetchone()
+
+    def set(self, access_token: str, user_info: dict, expires_in: Optional[int] = None):
+        now = time.time()
+        ttl = min(expires_in, self.max_ttl) if expires_in else self.max_ttl
+        connection = self.store.connection()
+
+        connection.execute(
+            "INSERT OR REPLACE INTO identities (token_hash, discord_id, user_info, expires_at, used_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (self.key(access_token), user_info["id"], json.dumps(user_info), now + ttl, now)
+        )
+        self._evict(now)
+
+    def invalidate(self, discord_id: str):
+        self.store.connection().execute("DELETE FROM identities WHERE discord_id = ?", (discord_id,))
+        self.store.increment("identity_cache.invalidations")
+
+    def _evict(self, now: float):
+        connection = self.store.connection()
+        connection.execute("DELETE FROM identities WHERE expires_at <= ?", (now,))
+
+        (count,) = connection.execute("SELECT count(*) FROM identities").fetchone()
+        if count <= self.max_entries:
+            return
+
+        connection.execute(
+            "DELETE FROM identities WHERE token_hash IN "
+            "(SELECT token_hash FROM identities ORDER BY used_at LIMIT ?)",
+            (count - self.max_entries,)
+        )
+        self.store.increment("identity_cache.evictions", count - self.max_entries)
+
+
+identity_cache = IdentityCache(
+    store,
+    max_entries=parser.getint("Cache", "identity_max_entries", fallback=10000),
+    max_ttl=parser.getint("Cache", "identity_ttl", fallback=300),
+)
@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from config.main import parser
+
+
+class SharedStore:
+    """
+    SQLite database shared by all worker processes of this host.
+
+    Every thread gets its own connection, the database runs in WAL mode so readers never block
+    each other and counters are buffered in memory and flushed at most once per second.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending: dict[str, int] = {}
+        self._flushed_at = time.monotonic()
+
+        self.execute_script(
+            """
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS generations (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS ix_generations_value ON generations (value);
+            """
+        )
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def execute_script(self, script: str):
+        self.connection().executescript(script)
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self._pending[name] = self._pending.get(name, 0) + amount
+            if time.monotonic() - self._flushed_at < self.flush_interval:
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+
+        if not pending:
+            return
+
+        self.connection().executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            pending.items()
+        )
+
+    def counters(self, prefix: str = "") -> dict[str, int]:
+        self.flush()
+        rows = self.connection().execute(
+            "SELECT name, value FROM counters WHERE name LIKE ? ORDER BY name", (f"{prefix}%",)
+        ).fetchall()
+        return dict(rows)
+
+    def generation(self, name: str) -> int:
+        """
+        Current value of a generation counter, used by workers to notice that shared data changed
+        """
+        return self.generations([name]).get(name, 0)
+
+    def generations(self, names: list[str]) -> dict[str, int]:
+        placeholders = ", ".join("?" * len(names))
+        return dict(self.connection().execute(
+            f"SELECT name, value FROM generations WHERE name IN ({placeholders})", names
+        ).fetchall())
+
+    def sequence(self) -> int:
+        """
+        Highest generation handed out so far, every later :meth:`bump` returns a higher value
+        """
+        (value,) = self.connection().execute("SELECT coalesce(max(value), 0) FROM generations").fetchone()
+        return value
+
+    def bump(self, *names: str, statement: Optional[str] = None, parameters: tuple = ()) -> int:
+        """
+        Move generation counters past every other counter right away, unlike the buffered :meth:`increment`
+
+        An optional statement runs in the same transaction with the new value appended to its parameters, so
+        readers never see the bumped counters without the change they announce.
+        """
+        connection = self.connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            (value,) = connection.execute("SELECT coalesce(max(value), 0) + 1 FROM generations").fetchone()
+            connection.executemany(
+                "INSERT INTO generations (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                [(name, value) for name in names]
+            )
+            if statement:
+                connection.execute(statement, (*parameters, value))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return value
+
+
+store = SharedStore(parser.get("Cache", "path", fallback="cache.sqlite3"))
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+from urllib.parse import urlencode
+
+from cache.main import SharedStore, store
+from config.main import parser
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    tags: tuple[str, ...]
+    # Shared sequence before the response was built, see SharedStore.sequence
+    sequence: int
+    # Monotonic expiry time, for responses built from data that may lag behind
+    expires_at: Optional[float] = None
+
+
+class ResponseCache:
+    """
+    Serialized responses of anonymous requests, kept in memory by every worker.
+
+    Entries are tagged with what they were built from (``quote:<id>``, ``user:<id>``, ``listing``,
+    ``leaderboard``). Writes bump the generation of the tags they affect in the shared store, and an
+    entry is only served while none of its tags was bumped after it started to be built, so an
+    invalidation in one worker reaches all of them. Workers evict the least recently used entries
+    once they hold more than ``max_bytes``.
+    """
+
+    def __init__(self, store: SharedStore, max_bytes: int):
+        self.store = store
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._size = 0
+
+    @staticmethod
+    def key(path: str, params: dict[str, Any]) -> str:
+        """
+        Cache key of a request from its path and its parsed query parameters, so parameter order and
+        omitted defaults do not split entries
+        """
+        return f"{path}?{urlencode(sorted((name, value) for name, value in params.items() if value is not None))}"
+
+    def sequence(self) -> int:
+        """
+        Take before building a response and pass on to :meth:`set`
+        """
+        return self.store.sequence()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+
+        if (
+            not entry
+            or (entry.expires_at is not None and entry.expires_at <= time.monotonic())
+            or not self._is_fresh(entry.tags, entry.sequence)
+        ):
+            self.store.increment("response_cache.misses")
+            return None
+
+        self.store.increment("response_cache.hits")
+        return entry.body
+
+    def set(self, key: str, body: bytes, tags: list[str], sequence: int, ttl: Optional[float] = None):
+        # A tag bumped while the response was built may not be reflected in it
+        if not self._is_fresh(tags, sequence):
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._size -= len(previous.body)
+
+            expires_at = time.monotonic() + ttl if ttl is not None else None
+            self._entries[key] = CachedResponse(body, tuple(tags), sequence, expires_at)
+            self._size += len(body)
+
+            evicted = 0
+            while self._size > self.max_bytes and self._entries:
+                _, entry = self._entries.popitem(last=False)
+                self._size -= len(entry.body)
+                evicted += 1
+
+        if evicted:
+            self.store.increment("response_cache.evictions", evicted)
+
+    def invalidate(self, *tags: str):
+        """
+        Drop every entry tagged with one of the tags in all workers, call after committing a change
+        """
+        self.store.bump(*tags)
+
+    def _is_fresh(self, tags: list[str], sequence: int) -> bool:
+        return not tags or max(self.store.generations(list(tags)).values(), default=0) <= sequence
+
+
+response_cache = ResponseCache(
+    store,
+    max_bytes=parser.getint("Cache", "response_max_bytes", fallback=32 * 1024 * 1024),
+)
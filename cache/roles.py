@@ -0,0 +1,92 @@
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+from api.v1.models.models import Role, UserRole
+from cache.main import SharedStore, store
+from config.main import parser
+from database.main import db
+
+
+class RoleCache:
+    """
+    The roles table and the role memberships of all users, kept in memory by every worker.
+
+    Both tables are tiny and rarely change, so they are loaded as a whole and permission checks do
+    not query the database. Writes to them bump the shared generation counter and every worker
+    reloads on its next read. Roles edited directly in the database are picked up after at most
+    ``ttl`` seconds, or right away with ``python manage.py reload-roles``. The tables are loaded from
+    the primary, a lagging replica would keep stale roles cached until the next reload.
+    """
+
+    GENERATION = "roles"
+
+    def __init__(self, store: SharedStore, engine: Engine, ttl: float):
+        self.store = store
+        self.engine = engine
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._generation = -1
+        self._loaded_at = 0.0
+        self._roles: dict[int, Role] = {}
+        self._memberships: dict[int, tuple[int, ...]] = {}
+
+    def roles(self) -> list[Role]:
+        """
+        :return: All roles ordered by identifier
+        """
+        self._refresh()
+        return list(self._roles.values())
+
+    def role(self, role_id: int) -> Optional[Role]:
+        self._refresh()
+        return self._roles.get(role_id)
+
+    def user_roles(self, user_id: int) -> list[Role]:
+        self._refresh()
+        roles = self._roles
+        return [roles[role_id] for role_id in self._memberships.get(user_id, ()) if role_id in roles]
+
+    def has_role(self, user_id: int, name: str) -> bool:
+        return any(role.name == name for role in self.user_roles(user_id))
+
+    def invalidate(self):
+        """
+        Make every worker reload the roles, call after committing a change to roles or user_roles
+        """
+        self.store.bump(self.GENERATION)
+
+    def _refresh(self):
+        generation = self.store.generation(self.GENERATION)
+        with self._lock:
+            if generation == self._generation and time.monotonic() - self._loaded_at < self.ttl:
+                return
+
+        with Session(self.engine) as session:
+            # Detached copies, so the cached roles outlive the session loading them
+            roles = {
+                role_id: Role(role_id=role_id, name=name, created_at=created_at)
+                for role_id, name, created_at in session.exec(
+                    select(Role.role_id, Role.name, Role.created_at).order_by(Role.role_id)
+                )
+            }
+            memberships: dict[int, list[int]] = {}
+            for user_id, role_id in session.exec(select(UserRole.user_id, UserRole.role_id).order_by(UserRole.id)):
+                memberships.setdefault(int(user_id), []).append(int(role_id))
+
+        with self._lock:
+            self._roles = roles
+            self._memberships = {user_id: tuple(role_ids) for user_id, role_ids in memberships.items()}
+            self._generation = generation
+            self._loaded_at = time.monotonic()
+        self.store.increment("role_cache.reloads")
+
+
+role_cache = RoleCache(
+    store,
+    db.engine,
+    ttl=parser.getfloat("Cache", "role_ttl", fallback=300),
+)
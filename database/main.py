@@ -1,25 +1,242 @@
-from configparser import ConfigParser
+import hashlib
+import itertools
+import threading
+import time
+from typing import Optional
 
+from fastapi import Request
+from loguru import logger
+from sqlalchemy import Engine, event, exc
+from sqlalchemy.pool import QueuePool
 from sqlmodel import Session, create_engine
 
+from cache.main import store
 from config.main import parser
 
+# Uvicorn worker processes and threads per worker running synchronous endpoints, see startup.py
+WORKERS = parser.getint("Server", "workers", fallback=9)
+THREADPOOL_SIZE = parser.getint("Server", "threadpool_size", fallback=40)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    Queue pool counting checkouts, the time spent waiting for a connection and checkout timeouts in the
+    shared counters, under ``database.pool.<name>.``
+    """
+
+    name = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            store.increment(f"database.pool.{self.name}.timeouts")
+            raise
+        finally:
+            store.increment(f"database.pool.{self.name}.checkouts")
+            store.increment(f"database.pool.{self.name}.wait_us", int((time.perf_counter() - started) * 1_000_000))
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        pool = super().recreate()
+        pool.name = self.name
+        return pool
+
+
+class EngineRegistry:
+    """
+    The engines of this process by name, each created once with a pool sized for the worker count.
+
+    Every worker gets an equal share of ``[Database] max_connections``, the connections the API may hold
+    on the server in total, but never more than its threadpool can use at once.
+    """
+
+    def __init__(self, max_connections: int, max_overflow: int, pool_timeout: float):
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_size = max(1, min(THREADPOOL_SIZE, max_connections // WORKERS - max_overflow))
+        self._lock = threading.Lock()
+        self._engines: dict[str, Engine] = {}
+
+    def get(self, name: str, url: str) -> Engine:
+        with self._lock:
+            engine = self._engines.get(name)
+            if engine is None:
+                engine = self._engines[name] = create_engine(
+                    url,
+                    poolclass=InstrumentedQueuePool,
+                    pool_size=self.pool_size,
+                    max_overflow=self.max_overflow,
+                    pool_timeout=self.pool_timeout,
+                    pool_pre_ping=True,
+                )
+                engine.pool.name = name
+            return engine
+
+    def pool_stats(self) -> dict[str, int]:
+        """
+        Pool gauges of this worker process
+
+        :return: Size, checked out (in use), overflow and idle connections of every pool by name
+        """
+        with self._lock:
+            engines = dict(self._engines)
+
+        stats = {}
+        for name, engine in engines.items():
+            pool = engine.pool
+            if not isinstance(pool, QueuePool):
+                continue
+            stats[f"database.pool.{name}.size"] = pool.size()
+            stats[f"database.pool.{name}.in_use"] = pool.checkedout()
+            stats[f"database.pool.{name}.overflow"] = max(0, pool.overflow())
+            stats[f"database.pool.{name}.idle"] = pool.checkedin()
+        return stats
+
+
+engines = EngineRegistry(
+    max_connections=parser.getint("Database", "max_connections", fallback=150),
+    max_overflow=parser.getint("Database", "max_overflow", fallback=0),
+    pool_timeout=parser.getfloat("Database", "pool_timeout", fallback=10),
+)
+
+
+class Replica:
+    def __init__(self, name: str, engine: Engine):
+        self.name = name
+        self.engine = engine
+        # Monotonic time until which the replica gets no sessions after failing
+        self.ejected_until = 0.0
+
 
 class DatabaseHandler:
+    """
+    Sessions on the primary, or on a read replica for GET requests.
+
+    Replicas are picked round robin or by the fewest checked out connections and ejected for
+    `eject_interval` seconds when a connection to them fails. Reads of a token whose session committed
+    a write go to the primary for `max_lag` seconds, so users read their own writes. The tokens are
+    tracked in the shared store, so this holds whichever worker answers the next request.
+    """
+
     def __init__(self):
-        user = parser.get("Database", "user")
-        password = parser.get("Database", "password")
-        host = parser.get("Database", "host")
-        port = parser.getint("Database", "port")
-        database = parser.get("Database", "database")
-
-        self.engine = create_engine(
-            f"mariadb+mariadbconnector://{user}:{password}@{host}:{port}/{database}",
-            pool_size=20,
-            pool_pre_ping=True,
-            max_overflow=5
+        url = parser.get("Database", "url", fallback="")
+        if not url:
+            user = parser.get("Database", "user")
+            password = parser.get("Database", "password")
+            host = parser.get("Database", "host")
+            port = parser.getint("Database", "port")
+            database = parser.get("Database", "database")
+            url = f"mariadb+mariadbconnector://{user}:{password}@{host}:{port}/{database}"
+
+        self.engine = engines.get("primary", url)
+        self.replicas = [
+            Replica(f"replica{index}", engines.get(f"replica{index}", url.strip()))
+            for index, url in enumerate(parser.get("Database", "replicas", fallback="").split(","), 1)
+            if url.strip()
+        ]
+        self.selection = parser.get("Database", "replica_selection", fallback="round_robin")
+        self.eject_interval = parser.getfloat("Database", "replica_eject_interval", fallback=30)
+        self.max_lag = parser.getfloat("Database", "replica_max_lag", fallback=5)
+        self._next = itertools.count()
+
+        store.execute_script(
+            """
+            CREATE TABLE IF NOT EXISTS sticky_tokens (
+                token_hash TEXT PRIMARY KEY,
+                until REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_sticky_tokens_until ON sticky_tokens (until);
+            """
         )
+        event.listen(Session, "after_commit", self._after_commit)
+
+    def get_session(self, request: Request):
+        replica = None
+        if request.method in ("GET", "HEAD") and not self._is_sticky(_request_token(request)):
+            replica = self.replica()
+        # Read by the response cache, entries built from a replica may lag behind
+        request.state.replica = replica is not None
+
+        with Session(replica.engine if replica else self.engine) as session:
+            try:
+                yield session
+            except (exc.OperationalError, exc.InterfaceError):
+                if replica:
+                    self.eject(replica)
+                raise
+
+    def replica(self) -> Optional[Replica]:
+        """
+        :return: A healthy replica, None without replicas or if all of them are ejected
+        """
+        now = time.monotonic()
+        healthy = [replica for replica in self.replicas if replica.ejected_until <= now]
+        if not healthy:
+            return None
+        if self.selection == "least_loaded":
+            return min(healthy, key=lambda replica: replica.engine.pool.checkedout())
+        return healthy[next(self._next) % len(healthy)]
+
+    def read_engine(self) -> Engine:
+        """
+        Engine for long reads outside of a request session, e.g. streamed exports
+        """
+        replica = self.replica()
+        return replica.engine if replica else self.engine
+
+    def eject(self, replica: Replica):
+        logger.warning(f"Ejecting database {replica.name} for {self.eject_interval} seconds")
+        replica.ejected_until = time.monotonic() + self.eject_interval
+        store.increment(f"database.{replica.name}.ejections")
+
+    def track_writes(self, session: Session, token: str):
+        """
+        Send the reads of the token to the primary for a while once the session commits
+        """
+        if self.replicas:
+            session.info["token"] = token
+
+    def stick(self, token: str):
+        """
+        Send the reads of the token to the primary for `max_lag` seconds, e.g. for a token issued right
+        after creating its user
+        """
+        if not self.replicas:
+            return
+
+        now = time.time()
+        connection = store.connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO sticky_tokens (token_hash, until) VALUES (?, ?)",
+            (_token_hash(token), now + self.max_lag)
+        )
+        connection.execute("DELETE FROM sticky_tokens WHERE until < ?", (now,))
+
+    def _after_commit(self, session: Session):
+        token = session.info.get("token")
+        if token and session.get_bind() is self.engine:
+            self.stick(token)
+
+    def _is_sticky(self, token: Optional[str]) -> bool:
+        if not token or not self.replicas:
+            return False
+        row = store.connection().execute(
+            "SELECT until FROM sticky_tokens WHERE token_hash = ?", (_token_hash(token),)
+        ).fetchone()
+        return bool(row) and row[0] > time.time()
+
+
+def _request_token(request: Request) -> Optional[str]:
+    # Same sources as api.v1.dependencies.get_token, GET requests carry no body
+    authorization = request.headers.get("authorization")
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return request.query_params.get("token")
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
 
-    def get_session(self):
-        with Session(self.engine) as session:
-            yield session
+db = DatabaseHandler()
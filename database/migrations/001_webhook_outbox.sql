@@ -0,0 +1,19 @@
+-- Durable outbox for quote webhook deliveries
+ALTER TABLE webhooks
+    ADD COLUMN disabled_at DATETIME NULL;
+
+CREATE TABLE webhook_outbox (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    webhook_id INT NOT NULL,
+    quote_id INT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    last_error VARCHAR(255) NULL,
+    created_at DATETIME NOT NULL,
+    next_attempt_at DATETIME NOT NULL,
+    delivered_at DATETIME NULL,
+    failed_at DATETIME NULL,
+    INDEX ix_webhook_outbox_next_attempt_at (next_attempt_at),
+    FOREIGN KEY (webhook_id) REFERENCES webhooks (id) ON DELETE CASCADE,
+    FOREIGN KEY (quote_id) REFERENCES quotes (quote_id) ON DELETE CASCADE
+);
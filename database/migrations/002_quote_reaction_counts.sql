@@ -0,0 +1,7 @@
+-- Denormalized per-quote reaction counters, fill them with `python manage.py reconcile-reactions`
+ALTER TABLE quotes
+    ADD COLUMN red_heart_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN thumbs_up_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN face_with_tears_of_joy_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN melting_face_count INT NOT NULL DEFAULT 0,
+    ADD COLUMN skull_count INT NOT NULL DEFAULT 0;
@@ -0,0 +1,3 @@
+-- Indexes backing the (created_at, id) keyset pagination
+CREATE INDEX ix_quotes_created_at ON quotes (created_at, quote_id);
+CREATE INDEX ix_quote_comments_quote_id_created_at ON quote_comments (quote_id, created_at, comment_id);
@@ -0,0 +1,3 @@
+-- FULLTEXT indexes backing the mariadb search backend ([Search] backend=mariadb)
+CREATE FULLTEXT INDEX ft_quotes_quote ON quotes (quote);
+CREATE FULLTEXT INDEX ft_users_display_name ON users (display_name);
@@ -0,0 +1,11 @@
+-- Top quotes per time window, filled with `python manage.py rebuild-leaderboard`
+CREATE TABLE quote_leaderboard (
+    period VARCHAR(8) NOT NULL,
+    quote_id INT NOT NULL,
+    score INT NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (period, quote_id),
+    INDEX ix_quote_leaderboard_quote_id (quote_id),
+    INDEX ix_quote_leaderboard_period_score (period, score, quote_id),
+    FOREIGN KEY (quote_id) REFERENCES quotes (quote_id) ON DELETE CASCADE
+);
@@ -0,0 +1,11 @@
+-- Reply counters of threaded comments and the index their pages are read from
+ALTER TABLE quote_comments
+    ADD COLUMN reply_count INT NOT NULL DEFAULT 0;
+
+UPDATE quote_comments
+    JOIN (
+        SELECT parent, count(*) AS replies FROM quote_comments WHERE parent IS NOT NULL GROUP BY parent
+    ) AS counts ON counts.parent = quote_comments.comment_id
+SET quote_comments.reply_count = counts.replies;
+
+CREATE INDEX ix_quote_comments_quote_id_parent ON quote_comments (quote_id, parent, created_at, comment_id);
@@ -0,0 +1,17 @@
+-- One reaction and one save per user and quote, duplicates from racing toggles are removed first.
+-- Run `python manage.py reconcile-reactions` afterwards to fix counters the duplicates inflated.
+DELETE duplicate FROM quote_reactions AS duplicate
+    JOIN quote_reactions AS kept
+        ON kept.quote_id = duplicate.quote_id AND kept.user_id = duplicate.user_id
+        AND kept.reaction_id < duplicate.reaction_id;
+
+DELETE duplicate FROM saved_quotes AS duplicate
+    JOIN saved_quotes AS kept
+        ON kept.quote_id = duplicate.quote_id AND kept.user_id = duplicate.user_id
+        AND kept.saved_id < duplicate.saved_id;
+
+ALTER TABLE quote_reactions
+    ADD CONSTRAINT uq_quote_reactions_quote_id_user_id UNIQUE (quote_id, user_id);
+
+ALTER TABLE saved_quotes
+    ADD CONSTRAINT uq_saved_quotes_quote_id_user_id UNIQUE (quote_id, user_id);
@@ -0,0 +1,2 @@
+-- Index backing the (created_at, quote_id) keyset pagination of /v1/users/{id}/quotes
+CREATE INDEX ix_quotes_user_id_created_at ON quotes (user_id, created_at, quote_id);
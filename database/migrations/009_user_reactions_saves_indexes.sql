@@ -0,0 +1,3 @@
+-- Indexes backing /v1/users/{id}/reactions (keyset on created_at, reaction_id) and the saved quote join
+CREATE INDEX ix_quote_reactions_user_id_created_at ON quote_reactions (user_id, created_at, reaction_id);
+CREATE INDEX ix_saved_quotes_user_id ON saved_quotes (user_id, quote_id);
@@ -0,0 +1,15 @@
+-- Background account deletion jobs, processed by the API workers
+CREATE TABLE account_deletions (
+    job_id CHAR(32) NOT NULL PRIMARY KEY,
+    user_id INT NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    phase VARCHAR(32) NULL,
+    total_rows INT NOT NULL DEFAULT 0,
+    deleted_rows INT NOT NULL DEFAULT 0,
+    error VARCHAR(255) NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    finished_at DATETIME NULL,
+    INDEX ix_account_deletions_user_id (user_id),
+    INDEX ix_account_deletions_status_updated_at (status, updated_at)
+);
@@ -0,0 +1,6 @@
+-- Save time of saved quotes, /v1/users/{id}/saved-quotes pages through them most recently saved first.
+-- Existing saves get the migration time, their identifiers keep them in the order they were saved.
+ALTER TABLE saved_quotes
+    ADD COLUMN created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE INDEX ix_saved_quotes_user_id_created_at ON saved_quotes (user_id, created_at, saved_id);
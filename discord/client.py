@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Coroutine, Optional, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+
+class DiscordError(Exception):
+    """Base class for errors talking to Discord"""
+
+
+class DiscordUnavailableError(DiscordError):
+    """Discord could not be reached or did not answer in time"""
+
+
+class RateLimitedError(DiscordError):
+    """The call would exceed a Discord rate limit"""
+
+    def __init__(self, retry_after: float, bucket: Optional[str] = None):
+        super().__init__(f"Rate limited for {retry_after:.2f}s" + (f" on bucket {bucket}" if bucket else ""))
+        self.retry_after = retry_after
+        self.bucket = bucket
+
+
+@dataclass
+class RateLimitBucket:
+    remaining: int = 1
+    reset_at: float = 0.0
+
+    def wait_time(self, now: float) -> float:
+        if self.remaining > 0 or now >= self.reset_at:
+            return 0.0
+        return self.reset_at - now
+
+
+class DiscordClient:
+    """
+    Asynchronous Discord HTTP client with a persistent connection pool.
+
+    The underlying ``httpx.AsyncClient`` lives on a dedicated event loop thread, so synchronous task
+    functions (via :meth:`request_sync`) and async endpoints share the same keep-alive connections.
+    ``X-RateLimit-*`` headers are tracked per route bucket and calls that would be rejected with a 429
+    are delayed for up to ``max_wait`` seconds or rejected right away with :class:`RateLimitedError`.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 5.0,
+        max_connections: int = 20,
+        max_wait: float = 2.0,
+    ):
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 3.0))
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_wait = max_wait
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Route key -> Discord bucket hash, bucket hash + major parameter -> state
+        self._routes: dict[str, str] = {}
+        self._buckets: dict[str, RateLimitBucket] = {}
+        self._global_reset_at = 0.0
+
+    # Event loop
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="discord-client", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _submit(self, coroutine: Coroutine[Any, Any, T]) -> Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._client is not None:
+            self._submit(self._client.aclose()).result()
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    # Rate limits
+    def _bucket_key(self, route: str, major: Optional[str]) -> str:
+        return f"{self._routes.get(route, route)}:{major or ''}"
+
+    def _reserve(self, bucket_key: str) -> float:
+        now = time.monotonic()
+        wait = max(self._global_reset_at - now, 0.0)
+
+        bucket = self._buckets.get(bucket_key)
+        if bucket:
+            wait = max(wait, bucket.wait_time(now))
+            if wait == 0.0 and bucket.remaining > 0:
+                bucket.remaining -= 1
+
+        if wait > self.max_wait:
+            raise RateLimitedError(wait, bucket_key)
+        return wait
+
+    def _update(self, route: str, major: Optional[str], response: httpx.Response):
+        headers = response.headers
+        now = time.monotonic()
+
+        if bucket_hash := headers.get("X-RateLimit-Bucket"):
+            self._routes[route] = bucket_hash
+
+        if "X-RateLimit-Remaining" in headers and "X-RateLimit-Reset-After" in headers:
+            self._buckets[self._bucket_key(route, major)] = RateLimitBucket(
+                remaining=int(headers["X-RateLimit-Remaining"]),
+                reset_at=now + float(headers["X-RateLimit-Reset-After"]),
+            )
+
+        if response.status_code == 429:
+            retry_after = float(headers.get("Retry-After") or headers.get("X-RateLimit-Reset-After") or 1.0)
+            if headers.get("X-RateLimit-Global") or headers.get("X-RateLimit-Scope") == "global":
+                self._global_reset_at = now + retry_after
+            else:
+                self._buckets[self._bucket_key(route, major)] = RateLimitBucket(0, now + retry_after)
+
+    # Requests
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        route: Optional[str] = None,
+        major: Optional[str] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits)
+
+        route = route or f"{method} {path}"
+
+        # Retry at most once when Discord answers with a 429 we were not able to predict
+        for attempt in range(2):
+            wait = self._reserve(self._bucket_key(route, major))
+            if wait:
+                await asyncio.sleep(wait)
+
+            try:
+                response = await self._client.request(method, path, **kwargs)
+            except httpx.TransportError as error:
+                raise DiscordUnavailableError(str(error)) from error
+
+            self._update(route, major, response)
+            if response.status_code != 429 or attempt:
+                return response
+
+        return response
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        route: Optional[str] = None,
+        major: Optional[str] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """
+        Send a request to Discord from any event loop
+
+        :param route: Rate limit route key, defaults to the method and path
+        :param major: Major parameter (e.g. webhook id) that splits the route into separate buckets
+        """
+        coroutine = self._request(method, path, route, major, **kwargs)
+        if asyncio.get_running_loop() is self._loop:
+            return await coroutine
+        return await asyncio.wrap_future(self._submit(coroutine))
+
+    def request_sync(
+        self,
+        method: str,
+        path: str,
+        route: Optional[str] = None,
+        major: Optional[str] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """Blocking variant of :meth:`request` for synchronous task functions"""
+        return self._submit(self._request(method, path, route, major, **kwargs)).result()
@@ -2,9 +2,12 @@ from configparser import ConfigParser
 from typing import Optional, TypedDict
 
 import jwt
-import requests
 
+from cache.identity import identity_cache
+from cache.main import store
 from config.main import parser
+from discord.client import DiscordClient
+from discord.singleflight import SingleFlight
 
 
 class DiscordOAuthHandler:
@@ -16,35 +19,77 @@ class DiscordOAuthHandler:
         self.redirect_uri_webhook = f"{self.__redirect_uri}/webhook"
         self.__key = parser.get("JWT", "key")
 
-        self.discord_api_endpoint = "https://discord.com/api/v10"
+        self.discord_api_endpoint = parser.get("Discord", "api_endpoint", fallback="https://discord.com/api/v10")
         self.webhook_url = f"{self.discord_api_endpoint}/webhooks/{parser.get("Discord", "webhook")}"
 
+        self.client = DiscordClient(
+            self.discord_api_endpoint,
+            timeout=parser.getfloat("Discord", "timeout", fallback=5.0),
+            max_connections=parser.getint("Discord", "max_connections", fallback=20),
+            max_wait=parser.getfloat("Discord", "rate_limit_max_wait", fallback=2.0),
+        )
+
+        # Concurrent requests with the same code or token share one Discord call. Access responses hold
+        # OAuth secrets and are only shared within a worker, user lookups also across workers through the
+        # identity cache
+        self.access_flights = SingleFlight("access_response", store)
+        self.user_flights = SingleFlight(
+            "user_information",
+            store,
+            shared=parser.getboolean("Discord", "coalesce_across_workers", fallback=True),
+            lease=parser.getfloat("Discord", "timeout", fallback=5.0),
+        )
+
+    def _access_request(self, code: str, redirect_uri: Optional[str]) -> dict:
+        return {
+            "method": "POST",
+            "path": "/oauth2/token",
+            "data": {
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": redirect_uri if redirect_uri else self.redirect_uri_oauth,
+            },
+            "headers": {"Content-Type": "application/x-www-form-urlencoded"},
+            "auth": (self.__client_id, self.__client_secret),
+        }
+
+    @staticmethod
+    def _user_request(access_token: str) -> dict:
+        return {
+            "method": "GET",
+            "path": "/users/@me",
+            "route": "GET /users/@me",
+            "major": identity_cache.key(access_token),
+            "headers": {"Authorization": f"Bearer {access_token}"},
+        }
+
     def receive_access_response(
         self,
         code: str,
         redirect_uri: Optional[str] = None,
     ) -> "AccessResponse":
-        data = {
-            "grant_type": "authorization_code",
-            "code": code,
-            "redirect_uri": redirect_uri if redirect_uri else self.redirect_uri_oauth,
-        }
-        headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        response = requests.post(
-            f"{self.discord_api_endpoint}/oauth2/token",
-            data=data,
-            headers=headers,
-            auth=(self.__client_id, self.__client_secret)
+        return self.access_flights.do(
+            f"{code}:{redirect_uri}",
+            lambda: self.client.request_sync(**self._access_request(code, redirect_uri)).json()
         )
-        return response.json()
 
-    def receive_user_information(self, access_token: str) -> "UserObject":
-        headers = {"Authorization": f"Bearer {access_token}"}
-        response = requests.get(
-            f"{self.discord_api_endpoint}/users/@me",
-            headers=headers
-        )
-        return response.json()
+    def receive_user_information(self, access_token: str, expires_in: Optional[int] = None) -> "UserObject":
+        cached = identity_cache.get(access_token)
+        if cached:
+            return cached
+
+        def fetch() -> "UserObject":
+            user_info = self.client.request_sync(**self._user_request(access_token)).json()
+            if "id" in user_info:
+                identity_cache.set(access_token, user_info, expires_in)
+            return user_info
+
+        # The miss of this call is counted above, polling for the result of another worker is not
+        return self.user_flights.do(access_token, fetch, lambda: identity_cache.peek(access_token))
+
+    def identify(self, token: str) -> "UserObject":
+        access_response = self.decode_token(token)
+        return self.receive_user_information(access_response["access_token"], access_response.get("expires_in"))
 
     def decode_token(self, token: str):
         access_response: AccessResponse = jwt.decode(token, self.__key, algorithms=["HS256"])
@@ -93,4 +138,7 @@ class Webhook(TypedDict):
     guild_id: str
     application_id: str
     token: str
-    url: str
\ No newline at end of file
+    url: str
+
+
+dc_handler = DiscordOAuthHandler()
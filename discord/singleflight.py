@@ -0,0 +1,111 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, TypeVar
+
+from cache.main import SharedStore
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Call:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one execution.
+
+    Within a worker the first caller runs the function and every concurrent caller waits for its result.
+    With ``shared`` set, calls given a ``lookup`` are also coalesced across workers: the leader of every
+    worker claims the hashed key in the shared store for up to ``lease`` seconds, and leaders of other
+    workers wait until the claim ends and then look the result up where the first leader stored it, e.g. in
+    the identity cache. Only the claim is shared, results never leave the worker that fetched them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        store: SharedStore,
+        shared: bool = False,
+        lease: float = 10.0,
+        poll_interval: float = 0.05,
+    ):
+        self.name = name
+        self.store = store
+        self.shared = shared
+        self.lease = lease
+        self.poll_interval = poll_interval
+
+        self._calls: dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+        self.store.execute_script(
+            """
+            CREATE TABLE IF NOT EXISTS flights (
+                key TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            );
+            """
+        )
+
+    def do(self, key: str, function: Callable[[], T], lookup: Optional[Callable[[], Optional[T]]] = None) -> T:
+        """
+        :param lookup: Returns the result stored by a call of another worker, or None. It is polled while
+            waiting, so it should not count cache hits or misses.
+        """
+        key = hashlib.sha256(f"{self.name}:{key}".encode()).hexdigest()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            self.store.increment(f"singleflight.{self.name}.coalesced")
+            if call.error:
+                raise call.error
+            return call.result
+
+        self.store.increment(f"singleflight.{self.name}.leaders")
+        try:
+            call.result = self._run_shared(key, function, lookup) if self.shared and lookup else function()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _run_shared(self, key: str, function: Callable[[], T], lookup: Callable[[], Optional[T]]) -> T:
+        connection = self.store.connection()
+
+        # Wait for the claim of another worker to end, it is not held across more than one call
+        while not self._claim(connection, key):
+            time.sleep(self.poll_interval)
+            result = lookup()
+            if result is not None:
+                self.store.increment(f"singleflight.{self.name}.coalesced_workers")
+                return result
+
+        try:
+            return function()
+        finally:
+            connection.execute("DELETE FROM flights WHERE key = ?", (key,))
+
+    def _claim(self, connection: sqlite3.Connection, key: str) -> bool:
+        now = time.time()
+        return connection.execute(
+            "INSERT INTO flights (key, expires_at) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET expires_at = excluded.expires_at WHERE flights.expires_at <= ?",
+            (key, now + self.lease, now)
+        ).rowcount > 0
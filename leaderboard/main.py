@@ -0,0 +1,165 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+from loguru import logger
+from sqlalchemy import Engine, delete, insert, literal, select, update
+from sqlmodel import Session
+
+from api.v1.models.models import LeaderboardEntry, Quote
+from api.v1.pagination import MAX_PAGE_SIZE
+from cache.main import SharedStore, store
+from config.main import parser
+from database.main import db
+
+WINDOWS = {
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+}
+
+
+class Leaderboard:
+    """
+    Top quotes by total reactions for each window of WINDOWS.
+
+    Scores live in the quote_leaderboard table and are updated in the transaction of the write
+    that changes them, with one row per window and quote. Every worker keeps the top `size`
+    entries of each window in memory and reloads them from the primary when the shared generation
+    counter was bumped by a write, so reading the leaderboard does not query the table at all.
+    """
+
+    GENERATION = "leaderboard"
+
+    def __init__(self, store: SharedStore, engine: Engine, size: int, expire_interval: float):
+        self.store = store
+        self.engine = engine
+        self.size = size
+        self.expire_interval = expire_interval
+        self._lock = threading.Lock()
+        self._generation = -1
+        self._top: dict[str, list[int]] = {}
+
+    def add_quote(self, session: Session, quote: Quote):
+        session.exec(insert(LeaderboardEntry).values([
+            {"period": period, "quote_id": quote.quote_id, "score": 0, "created_at": quote.created_at}
+            for period in WINDOWS
+        ]))
+
+    def remove_quotes(self, session: Session, quote_ids: list[int]):
+        session.exec(delete(LeaderboardEntry).where(LeaderboardEntry.quote_id.in_(quote_ids)))
+
+    def update(self, session: Session, quote_id: int, delta: int):
+        if delta:
+            session.exec(
+                update(LeaderboardEntry)
+                .where(LeaderboardEntry.quote_id == quote_id)
+                .values(score=LeaderboardEntry.score + delta)
+            )
+
+    def remove_reactions(self, session: Session, quote_ids: list[int]):
+        """
+        Subtract one reaction from the scores of the quotes, before reactions of one user are deleted
+        """
+        if quote_ids:
+            session.exec(
+                update(LeaderboardEntry)
+                .where(LeaderboardEntry.quote_id.in_(quote_ids))
+                .values(score=LeaderboardEntry.score - 1)
+            )
+
+    def invalidate(self):
+        """
+        Make every worker reload the leaderboard, call after committing a change
+        """
+        self.store.bump(self.GENERATION)
+
+    def top(self, period: str, limit: int) -> list[int]:
+        """
+        :return: Identifiers of the top quotes of the window, best first
+        """
+        if limit > self.size:
+            return self._load(period, limit)
+
+        generation = self.store.generation(self.GENERATION)
+        with self._lock:
+            if generation == self._generation and period in self._top:
+                return self._top[period][:limit]
+
+        top = self._load(period, self.size)
+        with self._lock:
+            if generation != self._generation:
+                self._top = {}
+                self._generation = generation
+            self._top[period] = top
+        return top[:limit]
+
+    def _load(self, period: str, limit: int) -> list[int]:
+        with Session(self.engine) as session:
+            return list(session.execute(
+                select(LeaderboardEntry.quote_id)
+                .where(
+                    LeaderboardEntry.period == period,
+                    LeaderboardEntry.created_at >= datetime.now() - WINDOWS[period],
+                )
+                .order_by(LeaderboardEntry.score.desc(), LeaderboardEntry.quote_id.desc())
+                .limit(limit)
+            ).scalars())
+
+    def expire(self, session: Session) -> int:
+        """
+        Remove the entries of quotes that left their window
+
+        :return: The number of removed entries
+        """
+        removed = 0
+        for period, window in WINDOWS.items():
+            removed += session.exec(
+                delete(LeaderboardEntry).where(
+                    LeaderboardEntry.period == period, LeaderboardEntry.created_at < datetime.now() - window
+                )
+            ).rowcount
+        session.commit()
+
+        if removed:
+            self.invalidate()
+        return removed
+
+    def rebuild(self, session: Session):
+        """
+        Rebuild every window from the quote reaction counters
+        """
+        session.exec(delete(LeaderboardEntry))
+        for period, window in WINDOWS.items():
+            session.exec(
+                insert(LeaderboardEntry).from_select(
+                    ["period", "quote_id", "score", "created_at"],
+                    select(literal(period), Quote.quote_id, Quote.total_reactions(), Quote.created_at)
+                    .where(Quote.created_at >= datetime.now() - window)
+                )
+            )
+        session.commit()
+        self.invalidate()
+
+    async def run_expiry(self, engine: Engine):
+        """
+        Expire entries every `expire_interval` seconds until cancelled
+        """
+        while True:
+            await asyncio.sleep(self.expire_interval)
+            try:
+                await asyncio.to_thread(self._expire_with_engine, engine)
+            except Exception as error:
+                logger.warning(f"Expiring leaderboard entries failed: {error}")
+
+    def _expire_with_engine(self, engine: Engine):
+        with Session(engine) as session:
+            self.expire(session)
+
+
+leaderboard = Leaderboard(
+    store,
+    db.engine,
+    size=MAX_PAGE_SIZE,
+    expire_interval=parser.getfloat("Leaderboard", "expire_interval", fallback=300),
+)
@@ -0,0 +1,81 @@
+import argparse
+
+from loguru import logger
+
+from __init__ import VERSION, API_NAME
+
+
+def reconcile_reactions(arguments: argparse.Namespace):
+    from sqlmodel import Session
+
+    from api.v1.tasks.quotes import _reconcile_reaction_counts
+    from database.main import db
+
+    with Session(db.engine) as session:
+        count = _reconcile_reaction_counts(session)
+    logger.info(f"Rebuilt reaction counters of {count} quotes")
+
+
+def reindex_search(arguments: argparse.Namespace):
+    from sqlmodel import Session
+
+    from database.main import db
+    from search.main import search_backend
+    from search.suggest import user_suggestions
+
+    with Session(db.engine) as session:
+        search_backend.rebuild(session)
+    user_suggestions.rebuild()
+    logger.info("Rebuilt the search index and the user suggestions")
+
+
+def rebuild_leaderboard(arguments: argparse.Namespace):
+    from sqlmodel import Session
+
+    from database.main import db
+    from leaderboard.main import leaderboard
+
+    with Session(db.engine) as session:
+        leaderboard.rebuild(session)
+    logger.info("Rebuilt the top quotes leaderboard")
+
+
+def delete_accounts(arguments: argparse.Namespace):
+    from accounts.main import account_deleter
+    from database.main import db
+
+    count = 0
+    while account_deleter.run_once(db.engine):
+        count += 1
+    logger.info(f"Ran {count} pending account deletions")
+
+
+def reload_roles(arguments: argparse.Namespace):
+    from cache.roles import role_cache
+
+    role_cache.invalidate()
+    logger.info("Roles are reloaded by every worker on their next permission check")
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description=f"{API_NAME} {VERSION} management commands")
+    subparsers = argument_parser.add_subparsers(required=True)
+
+    subparsers.add_parser(
+        "reconcile-reactions", help="Rebuild the per-quote reaction counters from quote_reactions"
+    ).set_defaults(command=reconcile_reactions)
+    subparsers.add_parser(
+        "reindex-search", help="Rebuild the quote and user search index and the user suggestions"
+    ).set_defaults(command=reindex_search)
+    subparsers.add_parser(
+        "rebuild-leaderboard", help="Rebuild the top quotes leaderboard from the reaction counters"
+    ).set_defaults(command=rebuild_leaderboard)
+    subparsers.add_parser(
+        "delete-accounts", help="Run the pending account deletion jobs now instead of in the API workers"
+    ).set_defaults(command=delete_accounts)
+    subparsers.add_parser(
+        "reload-roles", help="Make all workers reload roles and role memberships after editing them in the database"
+    ).set_defaults(command=reload_roles)
+
+    arguments = argument_parser.parse_args()
+    arguments.command(arguments)
@@ -0,0 +1,74 @@
+import re
+from abc import ABC, abstractmethod
+
+from sqlmodel import Session
+
+from config.main import parser
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class SearchBackend(ABC):
+    """
+    Ranked full-text search over quotes (text and author name) and users (display name).
+
+    Search terms are tokenized, every token has to match and the last token of the term is also
+    matched as a prefix, so results show up while the user is still typing. Indexing runs in the
+    caller's transaction and takes effect with its commit.
+    """
+
+    @abstractmethod
+    def index_quote(self, session: Session, quote_id: int, quote: str, author: str):
+        pass
+
+    @abstractmethod
+    def remove_quotes(self, session: Session, quote_ids: list[int]):
+        pass
+
+    @abstractmethod
+    def index_user(self, session: Session, user_id: int, display_name: str):
+        """
+        Index a new or renamed user, including the author name of the user's quotes
+        """
+
+    @abstractmethod
+    def remove_user(self, session: Session, user_id: int):
+        pass
+
+    @abstractmethod
+    def search_quotes(self, session: Session, term: str, offset: int, limit: int) -> list[int]:
+        """
+        :return: Quote identifiers ordered by relevance
+        """
+
+    @abstractmethod
+    def search_users(self, session: Session, term: str, offset: int, limit: int) -> list[int]:
+        """
+        :return: User identifiers ordered by relevance
+        """
+
+    @abstractmethod
+    def rebuild(self, session: Session):
+        """
+        Rebuild the whole index from the database
+        """
+
+
+def create_search_backend(name: str) -> SearchBackend:
+    if name == "mariadb":
+        from search.mariadb import MariaDBFulltextBackend
+        return MariaDBFulltextBackend(min_token_size=parser.getint("Search", "min_token_size", fallback=3))
+    if name == "sqlite":
+        from search.sqlite import SQLiteFTSBackend
+        return SQLiteFTSBackend()
+    if name == "memory":
+        from search.memory import InMemorySearchBackend
+        return InMemorySearchBackend()
+    raise ValueError(f"Unknown search backend: {name}")
+
+
+search_backend = create_search_backend(parser.get("Search", "backend", fallback="mariadb"))
@@ -0,0 +1,82 @@
+from sqlalchemy import text
+from sqlmodel import Session
+
+from search.main import SearchBackend, tokenize
+
+# InnoDB's default stopword list, see information_schema.INNODB_FT_DEFAULT_STOPWORD
+STOPWORDS = frozenset((
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en", "for", "from", "how", "i", "in",
+    "is", "it", "la", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "who",
+    "will", "with", "und", "www",
+))
+
+
+class MariaDBFulltextBackend(SearchBackend):
+    """
+    MariaDB InnoDB FULLTEXT backend for production.
+
+    The FULLTEXT indexes on quotes.quote and users.display_name are maintained by MariaDB itself, so
+    indexing is a no-op and searches run in boolean mode ranked by relevance. Stopwords and words
+    shorter than `min_token_size`, which has to match the server's innodb_ft_min_token_size, are not
+    in the index and are left out of the search, the last word is always matched as a prefix.
+    """
+
+    def __init__(self, min_token_size: int = 3):
+        self.min_token_size = min_token_size
+
+    def _match_query(self, term: str) -> str:
+        tokens = tokenize(term)
+        if not tokens:
+            return ""
+        required = [
+            f"+{token}" for token in tokens[:-1]
+            if len(token) >= self.min_token_size and token not in STOPWORDS
+        ]
+        # Words with the truncation operator are searched even if they are short or stopwords
+        return " ".join(required + [f"+{tokens[-1]}*"])
+
+    def index_quote(self, session: Session, quote_id: int, quote: str, author: str):
+        pass
+
+    def remove_quotes(self, session: Session, quote_ids: list[int]):
+        pass
+
+    def index_user(self, session: Session, user_id: int, display_name: str):
+        pass
+
+    def remove_user(self, session: Session, user_id: int):
+        pass
+
+    def search_quotes(self, session: Session, term: str, offset: int, limit: int) -> list[int]:
+        query = self._match_query(term)
+        if not query:
+            return []
+        return list(session.execute(
+            text(
+                "SELECT quote_id FROM ("
+                "  SELECT quote_id, MATCH (quote) AGAINST (:query IN BOOLEAN MODE) AS score FROM quotes"
+                "  WHERE MATCH (quote) AGAINST (:query IN BOOLEAN MODE)"
+                "  UNION ALL"
+                "  SELECT quotes.quote_id, MATCH (users.display_name) AGAINST (:query IN BOOLEAN MODE) / 2 AS score"
+                "  FROM users JOIN quotes ON quotes.user_id = users.user_id"
+                "  WHERE MATCH (users.display_name) AGAINST (:query IN BOOLEAN MODE)"
+                ") AS matches GROUP BY quote_id ORDER BY sum(score) DESC, quote_id LIMIT :limit OFFSET :offset"
+            ),
+            {"query": query, "limit": limit, "offset": offset}
+        ).scalars())
+
+    def search_users(self, session: Session, term: str, offset: int, limit: int) -> list[int]:
+        query = self._match_query(term)
+        if not query:
+            return []
+        return list(session.execute(
+            text(
+                "SELECT user_id FROM users WHERE MATCH (display_name) AGAINST (:query IN BOOLEAN MODE) "
+                "ORDER BY MATCH (display_name) AGAINST (:query IN BOOLEAN MODE) DESC, user_id "
+                "LIMIT :limit OFFSET :offset"
+            ),
+            {"query": query, "limit": limit, "offset": offset}
+        ).scalars())
+
+    def rebuild(self, session: Session):
+        session.execute(text("OPTIMIZE TABLE quotes, users"))
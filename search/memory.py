@@ -0,0 +1,215 @@
+import bisect
+import math
+import threading
+from collections import defaultdict
+from typing import Callable
+
+from loguru import logger
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from api.v1.models.models import Quote, User
+from database.main import WORKERS
+from search.main import SearchBackend, tokenize
+
+
+class InvertedIndex:
+    """
+    Token -> document postings with a sorted term list for prefix lookups.
+    """
+
+    # Weight of a prefix match compared to an exact token match
+    prefix_weight = 0.5
+    # Maximum number of terms a prefix expands to
+    max_expansions = 64
+
+    def __init__(self):
+        self.postings: dict[str, dict[int, float]] = {}
+        self.documents: dict[int, set[str]] = {}
+        self.terms: list[str] = []
+
+    def add(self, doc_id: int, fields: list[tuple[str, float]]):
+        self.remove(doc_id)
+
+        weights: dict[str, float] = defaultdict(float)
+        for text, weight in fields:
+            for token in tokenize(text):
+                weights[token] += weight
+
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                bisect.insort(self.terms, token)
+            self.postings[token][doc_id] = weight
+        self.documents[doc_id] = set(weights)
+
+    def remove(self, doc_id: int):
+        for token in self.documents.pop(doc_id, ()):
+            postings = self.postings[token]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[token]
+                del self.terms[bisect.bisect_left(self.terms, token)]
+
+    def _expand(self, token: str) -> list[str]:
+        start = bisect.bisect_left(self.terms, token)
+        expansions = []
+        for term in self.terms[start:start + self.max_expansions]:
+            if not term.startswith(token):
+                break
+            expansions.append(term)
+        return expansions
+
+    def search(self, term: str, offset: int, limit: int) -> list[int]:
+        tokens = tokenize(term)
+        if not tokens:
+            return []
+
+        total = len(self.documents) or 1
+        scores: dict[int, float] | None = None
+
+        for position, token in enumerate(tokens):
+            # Only the last token is still being typed
+            terms = self._expand(token) if position == len(tokens) - 1 else [token]
+
+            token_scores: dict[int, float] = defaultdict(float)
+            for match in terms:
+                postings = self.postings.get(match, {})
+                idf = math.log(1 + total / (1 + len(postings)))
+                boost = 1.0 if match == token else self.prefix_weight
+                for doc_id, weight in postings.items():
+                    token_scores[doc_id] = max(token_scores[doc_id], idf * weight * boost)
+
+            if scores is None:
+                scores = dict(token_scores)
+            else:
+                scores = {
+                    doc_id: score + token_scores[doc_id]
+                    for doc_id, score in scores.items() if doc_id in token_scores
+                }
+
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [doc_id for doc_id, _ in ranked[offset:offset + limit]]
+
+
+class InMemorySearchBackend(SearchBackend):
+    """
+    In-process inverted index, loaded lazily on the first search. Only for a single worker process.
+
+    The worker applies its own changes once their session commits. Quotes and users inserted by other
+    processes, e.g. manage.py, are picked up on the next search by their growing primary key, but edits
+    and deletions of other processes never are, and neither are inserts committed behind a higher key
+    that was already synced. Run more than one worker with the mariadb backend. Searches never wait for
+    the database reads of another thread, they use the index as it is until that sync is done.
+    """
+
+    def __init__(self):
+        if WORKERS > 1:
+            logger.warning(f"The memory search backend is not shared between the {WORKERS} workers")
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._quotes = InvertedIndex()
+        self._users = InvertedIndex()
+        self._loaded = False
+        self._max_quote_id = 0
+        self._max_user_id = 0
+
+        event.listen(Session, "after_commit", self._after_commit)
+        event.listen(Session, "after_soft_rollback", self._after_rollback)
+
+    def _defer(self, session: Session, change: Callable[[], None]):
+        # Applied with the commit of the session, dropped with a rollback
+        session.info.setdefault(self, []).append(change)
+
+    def _after_commit(self, session: Session):
+        changes = session.info.pop(self, ())
+        with self._lock:
+            for change in changes:
+                change()
+
+    def _after_rollback(self, session: Session, previous_transaction):
+        if not previous_transaction.nested:
+            session.info.pop(self, None)
+
+    def _sync(self, session: Session):
+        # Only the first load has to be waited for
+        if not self._sync_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            with self._lock:
+                if not self._loaded:
+                    self._quotes = InvertedIndex()
+                    self._users = InvertedIndex()
+                    self._max_quote_id = self._max_user_id = 0
+                max_quote_id, max_user_id = self._max_quote_id, self._max_user_id
+
+            quotes = session.exec(
+                select(Quote.quote_id, Quote.quote, User.display_name)
+                .join(User, User.user_id == Quote.user_id)
+                .where(Quote.quote_id > max_quote_id)
+            ).all()
+            users = session.exec(
+                select(User.user_id, User.display_name).where(User.user_id > max_user_id)
+            ).all()
+
+            with self._lock:
+                # Documents indexed while reading are newer than the rows read
+                for quote_id, quote, author in quotes:
+                    if quote_id not in self._quotes.documents:
+                        self._index_quote(quote_id, quote, author)
+                    self._max_quote_id = max(self._max_quote_id, quote_id)
+                for user_id, display_name in users:
+                    if user_id not in self._users.documents:
+                        self._index_user(user_id, display_name)
+                    self._max_user_id = max(self._max_user_id, user_id)
+                self._loaded = True
+        finally:
+            self._sync_lock.release()
+
+    def _index_quote(self, quote_id: int, quote: str, author: str):
+        self._quotes.add(quote_id, [(quote, 1.0), (author, 0.5)])
+
+    def _index_user(self, user_id: int, display_name: str):
+        self._users.add(user_id, [(display_name, 1.0)])
+
+    def index_quote(self, session: Session, quote_id: int, quote: str, author: str):
+        self._defer(session, lambda: self._index_quote(quote_id, quote, author))
+
+    def remove_quotes(self, session: Session, quote_ids: list[int]):
+        def remove():
+            for quote_id in quote_ids:
+                self._quotes.remove(quote_id)
+
+        self._defer(session, remove)
+
+    def index_user(self, session: Session, user_id: int, display_name: str):
+        # The author name is indexed with every quote of the user
+        quotes = session.exec(select(Quote.quote_id, Quote.quote).where(Quote.user_id == user_id)).all()
+
+        def index():
+            self._index_user(user_id, display_name)
+            for quote_id, quote in quotes:
+                self._index_quote(quote_id, quote, display_name)
+
+        self._defer(session, index)
+
+    def remove_user(self, session: Session, user_id: int):
+        self._defer(session, lambda: self._users.remove(user_id))
+
+    def search_quotes(self, session: Session, term: str, offset: int, limit: int) -> list[int]:
+        self._sync(session)
+        with self._lock:
+            return self._quotes.search(term, offset, limit)
+
+    def search_users(self, session: Session, term: str, offset: int, limit: int) -> list[int]:
+        self._sync(session)
+        with self._lock:
+            return self._users.search(term, offset, limit)
+
+    def rebuild(self, session: Session):
+        with self._lock:
+            self._loaded = False
+        self._sync(session)
@@ -0,0 +1,101 @@
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from api.v1.models.models import Quote, User
+from search.main import SearchBackend, tokenize
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    SQLite FTS5 backend, meant for tests and local development.
+
+    The FTS tables are written in the caller's transaction and ranked with bm25, matching on the
+    author name counts half as much as matching on the quote text.
+    """
+
+    def __init__(self):
+        self._created = False
+
+    def _ensure_tables(self, session: Session):
+        if self._created:
+            return
+        session.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS quotes_fts USING fts5(quote, author)"))
+        session.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(display_name)"))
+        self._created = True
+
+    @staticmethod
+    def _match_query(term: str) -> str:
+        tokens = tokenize(term)
+        if not tokens:
+            return ""
+        return " ".join([f'"{token}"' for token in tokens[:-1]] + [f'"{tokens[-1]}"*'])
+
+    def index_quote(self, session: Session, quote_id: int, quote: str, author: str):
+        self._ensure_tables(session)
+        session.execute(text("DELETE FROM quotes_fts WHERE rowid = :id"), {"id": quote_id})
+        session.execute(
+            text("INSERT INTO quotes_fts (rowid, quote, author) VALUES (:id, :quote, :author)"),
+            {"id": quote_id, "quote": quote, "author": author}
+        )
+
+    def remove_quotes(self, session: Session, quote_ids: list[int]):
+        self._ensure_tables(session)
+        for quote_id in quote_ids:
+            session.execute(text("DELETE FROM quotes_fts WHERE rowid = :id"), {"id": quote_id})
+
+    def index_user(self, session: Session, user_id: int, display_name: str):
+        self._ensure_tables(session)
+        session.execute(text("DELETE FROM users_fts WHERE rowid = :id"), {"id": user_id})
+        session.execute(
+            text("INSERT INTO users_fts (rowid, display_name) VALUES (:id, :display_name)"),
+            {"id": user_id, "display_name": display_name}
+        )
+        session.execute(
+            text(
+                "UPDATE quotes_fts SET author = :display_name "
+                "WHERE rowid IN (SELECT quote_id FROM quotes WHERE user_id = :id)"
+            ),
+            {"id": user_id, "display_name": display_name}
+        )
+
+    def remove_user(self, session: Session, user_id: int):
+        self._ensure_tables(session)
+        session.execute(text("DELETE FROM users_fts WHERE rowid = :id"), {"id": user_id})
+
+    def search_quotes(self, session: Session, term: str, offset: int, limit: int) -> list[int]:
+        query = self._match_query(term)
+        if not query:
+            return []
+        self._ensure_tables(session)
+        return list(session.execute(
+            text(
+                "SELECT rowid FROM quotes_fts WHERE quotes_fts MATCH :query "
+                "ORDER BY bm25(quotes_fts, 1.0, 0.5), rowid LIMIT :limit OFFSET :offset"
+            ),
+            {"query": query, "limit": limit, "offset": offset}
+        ).scalars())
+
+    def search_users(self, session: Session, term: str, offset: int, limit: int) -> list[int]:
+        query = self._match_query(term)
+        if not query:
+            return []
+        self._ensure_tables(session)
+        return list(session.execute(
+            text(
+                "SELECT rowid FROM users_fts WHERE users_fts MATCH :query "
+                "ORDER BY bm25(users_fts), rowid LIMIT :limit OFFSET :offset"
+            ),
+            {"query": query, "limit": limit, "offset": offset}
+        ).scalars())
+
+    def rebuild(self, session: Session):
+        self._ensure_tables(session)
+        session.execute(text("DELETE FROM quotes_fts"))
+        session.execute(text("DELETE FROM users_fts"))
+        for quote_id, quote, author in session.exec(
+            select(Quote.quote_id, Quote.quote, User.display_name).join(User, User.user_id == Quote.user_id)
+        ):
+            self.index_quote(session, quote_id, quote, author)
+        for user_id, display_name in session.exec(select(User.user_id, User.display_name)):
+            self.index_user(session, user_id, display_name)
+        session.commit()
@@ -0,0 +1,293 @@
+import bisect
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import unicodedata
+from typing import Iterator, NamedTuple, Optional
+
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+from api.v1.models.models import User
+from cache.main import SharedStore, store
+from config.main import parser
+from database.main import db
+
+MAGIC = b"QSUGGST1"
+# Magic, shared sequence the snapshot was built at, number of records
+HEADER = struct.Struct("<8sQI")
+OFFSET = struct.Struct("<I")
+# User identifier, lengths of the key, display name and avatar
+RECORD = struct.Struct("<IHHH")
+
+
+def normalize(text: str) -> str:
+    """
+    Case fold, strip accents and collapse whitespace, so "Zoë  Ann" is found with "zoe a"
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return " ".join("".join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
+class Suggestion(NamedTuple):
+    key: bytes
+    user_id: int
+    display_name: str
+    avatar_url: str
+
+
+def suggestions(user_id: int, display_name: str, avatar_url: str) -> list[Suggestion]:
+    """
+    One entry for the normalized name and for every later word of it, so "ada love" is found with "lo"
+    """
+    words = normalize(display_name).split(" ")
+    return [
+        Suggestion(" ".join(words[index:]).encode(), user_id, display_name, avatar_url or "")
+        for index in range(len(words)) if words[index]
+    ]
+
+
+class Snapshot:
+    """
+    Suggestions sorted by key in a memory-mapped file, shared read-only by all workers of the host
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self.inode = os.fstat(file.fileno()).st_ino
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.sequence, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a suggestion snapshot")
+
+    @staticmethod
+    def write(path: str, sequence: int, entries: list[Suggestion]):
+        """
+        Write a snapshot next to the path and move it in place, so readers never see a partial file
+        """
+        entries = sorted(entries, key=lambda entry: (entry.key, entry.user_id))
+        records = []
+        offset = HEADER.size + OFFSET.size * len(entries)
+        offsets = []
+        for entry in entries:
+            name, avatar = entry.display_name.encode(), entry.avatar_url.encode()
+            record = RECORD.pack(entry.user_id, len(entry.key), len(name), len(avatar)) + entry.key + name + avatar
+            offsets.append(OFFSET.pack(offset))
+            records.append(record)
+            offset += len(record)
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(HEADER.pack(MAGIC, sequence, len(entries)))
+            file.writelines(offsets)
+            file.writelines(records)
+        os.replace(temporary, path)
+
+    def _offset(self, index: int) -> int:
+        return OFFSET.unpack_from(self._map, HEADER.size + index * OFFSET.size)[0]
+
+    def _key(self, offset: int) -> bytes:
+        _, key_length, _, _ = RECORD.unpack_from(self._map, offset)
+        start = offset + RECORD.size
+        return self._map[start:start + key_length]
+
+    def _entry(self, offset: int) -> Suggestion:
+        user_id, key_length, name_length, avatar_length = RECORD.unpack_from(self._map, offset)
+        start = offset + RECORD.size
+        name_start = start + key_length
+        avatar_start = name_start + name_length
+        return Suggestion(
+            self._map[start:name_start],
+            user_id,
+            self._map[name_start:avatar_start].decode(),
+            self._map[avatar_start:avatar_start + avatar_length].decode(),
+        )
+
+    def search(self, prefix: bytes) -> Iterator[Suggestion]:
+        """
+        :return: Entries whose key starts with the prefix, in key order
+        """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(self._offset(middle)) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+
+        for index in range(low, self.count):
+            offset = self._offset(index)
+            if not self._key(offset).startswith(prefix):
+                return
+            yield self._entry(offset)
+
+
+class UserSuggestions:
+    """
+    Display name typeahead over a prefix index of normalized names.
+
+    The index is a sorted snapshot file that every worker maps into memory, built lazily by the first
+    worker that needs it. Users added, renamed or deleted since the snapshot are written to the shared
+    store and kept as a small sorted overlay by every worker. Once the overlay holds more than
+    `max_updates` users, one worker rebuilds the snapshot from the primary and the others remap it.
+    """
+
+    GENERATION = "user_suggestions"
+
+    def __init__(self, store: SharedStore, engine: Engine, path: str, max_updates: int):
+        self.store = store
+        self.engine = engine
+        self.path = path
+        self.max_updates = max_updates
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Snapshot] = None
+        self._sequence = -1
+        # Suggestions of the users changed since the snapshot, the entries of those users in it are ignored
+        self._overlay: list[Suggestion] = []
+        self._changed: frozenset[int] = frozenset()
+
+        self.store.execute_script(
+            """
+            CREATE TABLE IF NOT EXISTS user_suggestions (
+                user_id INTEGER PRIMARY KEY,
+                display_name TEXT NULL,
+                avatar_url TEXT NULL,
+                sequence INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_user_suggestions_sequence ON user_suggestions (sequence);
+            """
+        )
+
+    def update(self, user_id: int, display_name: str, avatar_url: str):
+        """
+        Add or rename a user, call after committing the change
+        """
+        self._record(user_id, display_name, avatar_url)
+
+    def remove(self, user_id: int):
+        """
+        Remove a user, call after committing the change
+        """
+        self._record(user_id, None, None)
+
+    def _record(self, user_id: int, display_name: Optional[str], avatar_url: Optional[str]):
+        self.store.bump(
+            self.GENERATION,
+            statement="INSERT OR REPLACE INTO user_suggestions (user_id, display_name, avatar_url, sequence) "
+                      "VALUES (?, ?, ?, ?)",
+            parameters=(user_id, display_name, avatar_url),
+        )
+
+    def suggest(self, prefix: str, limit: int) -> list[dict]:
+        """
+        :return: Up to `limit` users with a name or a word of it starting with the prefix, ordered by the
+            matched part of the name
+        """
+        key = normalize(prefix).encode()
+        if not key:
+            return []
+
+        self._refresh()
+        snapshot, overlay, changed = self._snapshot, self._overlay, self._changed
+
+        matches: dict[int, Suggestion] = {}
+        for entry in snapshot.search(key):
+            if entry.user_id not in changed and entry.user_id not in matches:
+                matches[entry.user_id] = entry
+                if len(matches) >= limit:
+                    break
+
+        for entry in overlay[bisect.bisect_left(overlay, (key,)):]:
+            if not entry.key.startswith(key):
+                break
+            if entry.user_id not in matches:
+                matches[entry.user_id] = entry
+
+        ranked = sorted(matches.values(), key=lambda entry: (entry.key, entry.user_id))[:limit]
+        return [
+            {"user_id": entry.user_id, "display_name": entry.display_name, "avatar_url": entry.avatar_url}
+            for entry in ranked
+        ]
+
+    def rebuild(self):
+        """
+        Rebuild the snapshot from the database and make every worker map it
+        """
+        with open(f"{self.path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._build()
+
+    def _refresh(self):
+        generation = self.store.generation(self.GENERATION)
+        if self._snapshot and generation == self._sequence:
+            return
+
+        with self._lock:
+            if not self._snapshot or not self._is_current(self._snapshot):
+                self._snapshot = self._load()
+                self._sequence = -1
+
+            rows = self.store.connection().execute(
+                "SELECT user_id, display_name, avatar_url, sequence FROM user_suggestions WHERE sequence > ?",
+                (self._snapshot.sequence,)
+            ).fetchall()
+            overlay = []
+            for user_id, display_name, avatar_url, _ in rows:
+                if display_name is not None:
+                    overlay.extend(suggestions(user_id, display_name, avatar_url))
+            self._overlay = sorted(overlay)
+            self._changed = frozenset(user_id for user_id, _, _, _ in rows)
+            self._sequence = generation
+
+        if len(rows) > self.max_updates:
+            self._rebuild_once()
+
+    def _is_current(self, snapshot: Snapshot) -> bool:
+        try:
+            return os.stat(self.path).st_ino == snapshot.inode
+        except FileNotFoundError:
+            return False
+
+    def _load(self) -> Snapshot:
+        if not os.path.exists(self.path):
+            # The first worker builds the snapshot, the others wait for it
+            with open(f"{self.path}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                if not os.path.exists(self.path):
+                    self._build()
+        return Snapshot(self.path)
+
+    def _rebuild_once(self):
+        with open(f"{self.path}.lock", "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another worker is rebuilding, keep serving the overlay meanwhile
+                return
+            self._build()
+
+    def _build(self):
+        # Changes recorded after this point are newer than the rows read below and stay in the overlay
+        sequence = self.store.sequence()
+        entries = []
+        with Session(self.engine) as session:
+            for user_id, display_name, avatar_url in session.exec(
+                select(User.user_id, User.display_name, User.avatar_url).where(User.deleted_at == None)
+            ):
+                entries.extend(suggestions(user_id, display_name or "", avatar_url))
+
+        Snapshot.write(self.path, sequence, entries)
+        self.store.connection().execute("DELETE FROM user_suggestions WHERE sequence <= ?", (sequence,))
+        self.store.bump(self.GENERATION)
+        self.store.increment("user_suggestions.rebuilds")
+
+
+user_suggestions = UserSuggestions(
+    store,
+    db.engine,
+    path=parser.get("Search", "suggest_snapshot", fallback="user_suggestions.idx"),
+    max_updates=parser.getint("Search", "suggest_max_updates", fallback=1000),
+)
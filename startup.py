@@ -4,11 +4,13 @@ if __name__ == "__main__":
     import uvicorn
     from loguru import logger
 
+    from config.main import parser
+
     logger.info(f"Version: {VERSION}")
     logger.info(f"Starting {API_NAME}...")
     uvicorn.run(
         "api.v1.main:app",
-        port=3560,
-        workers=9,
+        port=parser.getint("Server", "port", fallback=3560),
+        workers=parser.getint("Server", "workers", fallback=9),
         access_log="uvicorn_access.log",
     )
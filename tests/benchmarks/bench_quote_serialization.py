@@ -0,0 +1,80 @@
+"""
+Serialization time per row of a quote page, through FastAPI's response handling of ORM rows as the
+listing endpoints used to return them and through json_response with QuoteSchema.row.
+
+Run from the repository root with ``python tests/benchmarks/bench_quote_serialization.py [rows]``,
+nothing is read from or written to the database.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config.main import parser  # noqa: E402
+
+# The application modules read their settings on import
+DIRECTORY = tempfile.mkdtemp(prefix="quotly-bench-")
+parser.read_dict({
+    "Database": {"url": f"sqlite:///{os.path.join(DIRECTORY, 'primary.sqlite3')}", "replicas": ""},
+    "Cache": {"path": os.path.join(DIRECTORY, "cache.sqlite3")},
+    "Search": {"backend": "sqlite"},
+})
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from api.v1.caching import json_response  # noqa: E402
+from api.v1.models.models import Quote, User  # noqa: E402
+from api.v1.schemas.pagination import Page  # noqa: E402
+from api.v1.schemas.quotes import QuoteSchema  # noqa: E402
+
+
+def page(rows: int) -> tuple[list[Quote], dict[int, dict]]:
+    users = [
+        User(
+            user_id=index, discord_id=str(index), display_name=f"User {index}", avatar_url="", created_at=datetime.now()
+        )
+        for index in range(1, 51)
+    ]
+    quotes = [
+        Quote(
+            quote_id=index, quote=f"Quote number {index}", user_id=users[index % 50].user_id,
+            created_at=datetime.now(), red_heart_count=index % 7, skull_count=index % 3, user=users[index % 50],
+        )
+        for index in range(1, rows + 1)
+    ]
+    user_rows = {
+        user.user_id: {
+            "user_id": user.user_id, "discord_id": user.discord_id, "display_name": user.display_name,
+            "avatar_url": user.avatar_url, "created_at": user.created_at, "deleted_at": user.deleted_at,
+        }
+        for user in users
+    }
+    return quotes, user_rows
+
+
+def main(rows: int = 1000, repeat: int = 5, number: int = 10):
+    quotes, users = page(rows)
+    field = create_model_field("response", Page[QuoteSchema], mode="serialization")
+
+    def fastapi_response() -> bytes:
+        content = {"items": [quote.formatted_quote() for quote in quotes], "next_cursor": None}
+        return JSONResponse(asyncio.run(serialize_response(field=field, response_content=content))).body
+
+    def adapter_response() -> bytes:
+        content = {"items": [QuoteSchema.row(quote, users[quote.user_id]) for quote in quotes], "next_cursor": None}
+        return json_response(Page[QuoteSchema], content).body
+
+    assert len(fastapi_response()) and len(adapter_response())
+    for name, function in (("fastapi", fastapi_response), ("json_response", adapter_response)):
+        best = min(timeit.repeat(function, repeat=repeat, number=number)) / number
+        print(f"{name:>14}: {best / rows * 1_000_000:6.1f} us per row, {best * 1000:7.2f} ms per page of {rows}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
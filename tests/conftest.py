@@ -0,0 +1,128 @@
+import itertools
+import os
+import tempfile
+
+import pytest
+
+from config.main import parser
+
+# A throwaway SQLite primary and shared store, set before the application modules read their settings
+DIRECTORY = tempfile.mkdtemp(prefix="quotly-tests-")
+PRIMARY = os.path.join(DIRECTORY, "primary.sqlite3")
+parser.read_dict({
+    "Database": {"url": f"sqlite:///{PRIMARY}?check_same_thread=false", "replicas": ""},
+    "Server": {"workers": "1"},
+    "Discord": {
+        "client_id": "1",
+        "client_secret": "secret",
+        "redirect_uri": "http://localhost",
+        "webhook": "1/token",
+    },
+    "JWT": {"key": "tests"},
+    "Cache": {"path": os.path.join(DIRECTORY, "cache.sqlite3")},
+    "Search": {"backend": "sqlite", "suggest_snapshot": os.path.join(DIRECTORY, "user_suggestions.idx")},
+})
+
+from datetime import datetime  # noqa: E402
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from api.v1.main import app  # noqa: E402
+from api.v1.models.models import User  # noqa: E402
+from api.v1.tasks.quotes import _create_quote  # noqa: E402
+from auth.main import session_handler  # noqa: E402
+from cache.main import store  # noqa: E402
+from cache.responses import response_cache  # noqa: E402
+from cache.roles import role_cache  # noqa: E402
+from database.main import db  # noqa: E402
+from leaderboard.main import leaderboard  # noqa: E402
+from search.main import search_backend  # noqa: E402
+from search.suggest import user_suggestions  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """
+    Empty tables and caches for every test
+    """
+    SQLModel.metadata.drop_all(db.engine)
+    SQLModel.metadata.create_all(db.engine)
+    with Session(db.engine) as session:
+        search_backend.rebuild(session)
+
+    response_cache._entries.clear()
+    role_cache.invalidate()
+    leaderboard.invalidate()
+    if os.path.exists(user_suggestions.path):
+        os.remove(user_suggestions.path)
+    store.bump(user_suggestions.GENERATION)
+    store.connection().execute("DELETE FROM sticky_tokens")
+    yield db.engine
+
+
+@pytest.fixture
+def session():
+    with Session(db.engine) as session:
+        yield session
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def queries():
+    """
+    SQL statements run on the primary while the test runs
+    """
+    statements = []
+
+    def listener(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", listener)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", listener)
+
+
+@pytest.fixture
+def token():
+    """
+    :return: A function issuing a session token for a user
+    """
+    def token(user: User) -> str:
+        return session_handler.create_tokens(user.user_id, user.discord_id, [])["token"]
+
+    return token
+
+
+@pytest.fixture
+def make_user(session):
+    discord_ids = itertools.count(1000)
+
+    def make_user(display_name: str = "Ada Lovelace") -> User:
+        user = User(
+            discord_id=str(next(discord_ids)),
+            email_address="user@example.com",
+            display_name=display_name,
+            created_at=datetime.now(),
+        )
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        search_backend.index_user(session, user.user_id, user.display_name)
+        session.commit()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def make_quote(session, token):
+    def make_quote(user: User, text: str = "Simplicity is prerequisite for reliability") -> int:
+        return _create_quote(text, token(user), False, session)["quote_id"]
+
+    return make_quote
@@ -0,0 +1,69 @@
+from sqlalchemy import event
+from sqlmodel import Session, func, select
+
+from accounts.main import account_deleter
+from api.v1.models.models import Quote, QuoteComment, QuoteReaction, SavedQuote, User
+from api.v1.tasks.quotes import _create_quote_comment, _quote_toggle_react, _quote_toggle_save
+from cache.responses import response_cache
+
+
+def test_deletion_bounds_chunks_and_invalidates_after_commit(
+    database, session, make_user, make_quote, token, monkeypatch
+):
+    user, other = make_user("Ada Lovelace"), make_user("Grace Hopper")
+    quote_ids = [make_quote(user, f"Quote {index}") for index in range(2)]
+    kept = make_quote(other, "Kept")
+    readers = [make_user(f"Reader {index}") for index in range(6)]
+    for reader in readers:
+        for quote_id in quote_ids + [kept]:
+            _quote_toggle_react(quote_id, "skull", token(reader), session)
+            _quote_toggle_save(quote_id, token(reader), session)
+        _create_quote_comment(quote_ids[0], "Nice", None, token(reader), session)
+    _quote_toggle_react(kept, "red-heart", token(user), session)
+    user_id = user.user_id
+
+    monkeypatch.setattr(account_deleter, "chunk_size", 4)
+    deleted_rows = []
+    uncommitted = []
+    invalidated_before_commit = []
+
+    def after_execute(connection, cursor, statement, parameters, context, executemany):
+        if statement.startswith(("DELETE", "UPDATE")):
+            uncommitted.append(statement)
+        # Leaderboard entries are bounded by the quotes, one per window
+        if statement.startswith("DELETE") and "quote_leaderboard" not in statement:
+            deleted_rows.append(cursor.rowcount)
+
+    def after_commit(session):
+        uncommitted.clear()
+
+    invalidate = response_cache.invalidate
+
+    def checked_invalidate(*tags):
+        invalidated_before_commit.extend(uncommitted)
+        invalidate(*tags)
+
+    monkeypatch.setattr(response_cache, "invalidate", checked_invalidate)
+    event.listen(database, "after_cursor_execute", after_execute)
+    event.listen(Session, "after_commit", after_commit)
+    try:
+        with Session(database) as deletion_session:
+            account_deleter.delete(deletion_session, user_id)
+    finally:
+        event.remove(database, "after_cursor_execute", after_execute)
+        event.remove(Session, "after_commit", after_commit)
+
+    assert invalidated_before_commit == []
+    assert max(deleted_rows) <= 4
+
+    session.expire_all()
+    assert session.get(User, user_id) is None
+    assert session.exec(select(func.count()).where(Quote.user_id == user_id)).one() == 0
+    assert session.exec(select(func.count()).where(QuoteReaction.quote_id.in_(quote_ids))).one() == 0
+    assert session.exec(select(func.count()).where(SavedQuote.quote_id.in_(quote_ids))).one() == 0
+    assert session.exec(select(func.count()).where(QuoteComment.quote_id.in_(quote_ids))).one() == 0
+    # Rows on other quotes stay, the account's reaction is taken off the counters
+    assert session.exec(select(func.count()).where(QuoteReaction.quote_id == kept)).one() == 6
+    assert session.exec(select(func.count()).where(SavedQuote.quote_id == kept)).one() == 6
+    quote = session.get(Quote, kept)
+    assert (quote.skull_count, quote.red_heart_count) == (6, 0)
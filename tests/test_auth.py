@@ -0,0 +1,69 @@
+import pytest
+
+from api.v1.tasks.quotes import _create_quote
+from cache.main import store
+from cache.responses import response_cache
+from discord.main import dc_handler
+from search.suggest import user_suggestions
+
+
+@pytest.fixture
+def sign_in(client, monkeypatch):
+    """
+    :return: A function signing the Discord user 42 in with the given profile
+    """
+    monkeypatch.setattr(dc_handler, "receive_access_response", lambda code: {"access_token": "access"})
+
+    def sign_in(display_name: str = "Grace Hopper", avatar: str = "") -> dict:
+        monkeypatch.setattr(dc_handler, "receive_user_information", lambda access_token, expires_in: {
+            "id": "42", "email": "grace@example.com", "global_name": display_name, "avatar": avatar,
+        })
+        response = client.post("/v1/authorize", json={"code": "code"})
+        assert response.status_code == 200
+        return response.json()
+
+    return sign_in
+
+
+def test_cached_responses_are_invalidated_on_profile_changes(sign_in, monkeypatch):
+    invalidated = []
+    invalidate = response_cache.invalidate
+    monkeypatch.setattr(response_cache, "invalidate", lambda *tags: invalidated.extend(tags) or invalidate(*tags))
+
+    sign_in()
+    sign_in()
+    assert not [tag for tag in invalidated if tag.startswith("user:")]
+
+    sign_in(avatar="avatar")
+    sign_in(display_name="Grace Brewster Hopper", avatar="avatar")
+    assert len([tag for tag in invalidated if tag.startswith("user:")]) == 2
+
+
+def test_suggestions_are_updated_for_new_users_and_profile_changes(client, sign_in):
+    def generation() -> int:
+        return store.generation(user_suggestions.GENERATION)
+
+    before = generation()
+    sign_in()
+    created = generation()
+    sign_in()
+    assert before != created == generation()
+
+    sign_in(display_name="Grace Brewster Hopper")
+    assert generation() != created
+    assert [user["displayName"] for user in client.get("/v1/users/suggest", params={"prefix": "brew"}).json()] == [
+        "Grace Brewster Hopper"
+    ]
+
+
+def test_quotes_are_found_by_the_new_name_after_a_rename(client, session, sign_in):
+    tokens = sign_in()
+    quote_id = _create_quote("Humans are allergic to change", tokens["token"], False, session)["quote_id"]
+
+    sign_in(display_name="Grace Brewster Hopper")
+
+    def search(term: str) -> list[int]:
+        return [quote["quoteId"] for quote in client.get("/v1/quotes", params={"search": term}).json()["items"]]
+
+    assert search("brewster") == [quote_id]
+    assert search("grace") == [quote_id]
@@ -0,0 +1,157 @@
+import os
+import shutil
+import time
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from api.v1.main import app
+from api.v1.models.models import Role, UserRole
+from cache.roles import role_cache
+from conftest import DIRECTORY, PRIMARY
+from database.main import Replica, db, engines
+from discord.main import dc_handler
+from leaderboard.main import leaderboard
+
+
+@pytest.fixture
+def replicate(monkeypatch):
+    """
+    Two SQLite replicas, copies of the primary that lag behind it until `replicate` is called again
+    """
+    paths = [os.path.join(DIRECTORY, f"replica{index}.sqlite3") for index in (1, 2)]
+    replicas = [
+        Replica(f"replica{index}", engines.get(f"replica{index}", f"sqlite:///{path}?check_same_thread=false"))
+        for index, path in enumerate(paths, 1)
+    ]
+    monkeypatch.setattr(db, "replicas", replicas)
+    monkeypatch.setattr(db, "max_lag", 0.5)
+
+    def replicate():
+        for replica, path in zip(replicas, paths):
+            replica.engine.dispose()
+            if os.path.isdir(path):
+                os.rmdir(path)
+            shutil.copyfile(PRIMARY, path)
+
+    replicate()
+    yield replicate
+
+    for path in paths:
+        if os.path.isdir(path):
+            os.rmdir(path)
+
+
+@pytest.fixture
+def statements(replicate):
+    """
+    Names of the databases that ran statements, in order
+    """
+    used = []
+    listeners = [
+        (engine, lambda *args, name=name: used.append(name))
+        for name, engine in [("primary", db.engine), *[(replica.name, replica.engine) for replica in db.replicas]]
+    ]
+    for engine, listener in listeners:
+        event.listen(engine, "before_cursor_execute", listener)
+    yield used
+    for engine, listener in listeners:
+        event.remove(engine, "before_cursor_execute", listener)
+
+
+def test_get_requests_read_from_replicas(client, make_user, make_quote, replicate, statements):
+    quote_id = make_quote(make_user())
+    replicate()
+    statements.clear()
+
+    for _ in range(4):
+        assert client.get(f"/v1/quotes/{quote_id}/comments").status_code == 200
+
+    assert "primary" not in statements
+    assert {"replica1", "replica2"} <= set(statements)
+
+
+def test_writes_go_to_the_primary_and_stick(client, make_user, make_quote, token, replicate, statements):
+    user = make_user()
+    quote_id = make_quote(user)
+    replicate()
+    statements.clear()
+    headers = {"Authorization": f"Bearer {token(user)}"}
+
+    assert client.post(f"/v1/quotes/{quote_id}/toggleSave", json={"token": token(user)}).json() is True
+    assert set(statements) == {"primary"}
+
+    # The replicas have not seen the save, the user reads the primary until the lag passed
+    statements.clear()
+    response = client.get("/v1/users/me/quote-state", params={"ids": quote_id}, headers=headers)
+    assert response.json() == [{"quoteId": quote_id, "isSaved": True, "reaction": None}]
+    assert set(statements) == {"primary"}
+
+    time.sleep(db.max_lag)
+    statements.clear()
+    client.get("/v1/users/me/quote-state", params={"ids": quote_id}, headers=headers)
+    assert "primary" not in statements
+
+
+def test_signing_in_sticks_to_the_primary(client, monkeypatch, replicate):
+    monkeypatch.setattr(dc_handler, "receive_access_response", lambda code: {"access_token": "access"})
+    monkeypatch.setattr(dc_handler, "receive_user_information", lambda access_token, expires_in: {
+        "id": "42", "email": "grace@example.com", "global_name": "Grace Hopper", "avatar": "",
+    })
+
+    # The user only exists on the primary, the replicas would answer 404
+    tokens = client.post("/v1/authorize", json={"code": "code"}).json()
+    response = client.get("/v1/users/me", headers={"Authorization": f"Bearer {tokens['token']}"})
+    assert response.status_code == 200
+    assert response.json()["displayName"] == "Grace Hopper"
+
+    tokens = client.post("/v1/refresh", json={"refreshToken": tokens["refreshToken"]}).json()
+    response = client.get("/v1/users/me", headers={"Authorization": f"Bearer {tokens['token']}"})
+    assert response.status_code == 200
+
+
+def test_failing_replicas_are_ejected(make_user, make_quote, replicate, statements):
+    quote_id = make_quote(make_user())
+    replica = db.replicas[0]
+    replica.engine.dispose()
+    path = os.path.join(DIRECTORY, "replica1.sqlite3")
+    os.remove(path)
+    os.mkdir(path)
+
+    client = TestClient(app, raise_server_exceptions=False)
+    status_codes = [client.get(f"/v1/quotes/{quote_id}/comments").status_code for _ in range(6)]
+
+    assert status_codes.count(500) == 1
+    assert replica.ejected_until > time.monotonic()
+    assert db.replica() is db.replicas[1]
+
+
+def test_least_loaded_selection(monkeypatch, replicate):
+    monkeypatch.setattr(db, "selection", "least_loaded")
+    busy = db.replicas[0].engine.connect()
+    try:
+        assert all(db.replica() is db.replicas[1] for _ in range(4))
+    finally:
+        busy.close()
+
+
+def test_caches_reload_from_the_primary(client, session, make_user, make_quote, replicate):
+    user = make_user()
+    replicate()
+
+    # Written after the replicas were copied
+    quote_id = make_quote(user, "Premature optimization is the root of all evil")
+    session.add(Role(role_id=1, name="admin", created_at=datetime.now()))
+    session.add(UserRole(id=1, user_id=user.user_id, role_id=1))
+    session.commit()
+    role_cache.invalidate()
+    grace = make_user("Grace Hopper")
+
+    assert [role["name"] for role in client.get(f"/v1/users/{user.user_id}/roles").json()] == ["admin"]
+    assert [user["userId"] for user in client.get("/v1/users/suggest", params={"prefix": "gra"}).json()] == [
+        grace.user_id
+    ]
+    client.get("/v1/quotes/top")
+    assert quote_id in leaderboard.top("24h", 10)
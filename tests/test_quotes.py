@@ -0,0 +1,153 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, func, select
+
+from api.v1.models.models import REACTION_TYPES, Quote, QuoteReaction, Role, SavedQuote, UserRole
+from api.v1.schemas.quotes import QuoteAction
+from api.v1.tasks.quotes import _apply_quote_actions, _create_quote_comment, _quote_toggle_react, _quote_toggle_save
+from cache.roles import role_cache
+
+
+@pytest.fixture
+def feed(session, make_user, make_quote, token):
+    """
+    Three users with 30 quotes, reacting to and saving some of each other's quotes
+    """
+    users = [make_user(name) for name in ("Ada Lovelace", "Grace Hopper", "Edsger Dijkstra")]
+    quote_ids = [make_quote(users[index % 3], f"Quote number {index}") for index in range(30)]
+    for index, quote_id in enumerate(quote_ids):
+        for offset, user in enumerate(users):
+            if (index + offset) % 2:
+                _quote_toggle_react(quote_id, REACTION_TYPES[(index + offset) % 5], token(user), session)
+            if (index + offset) % 3 == 0:
+                _quote_toggle_save(quote_id, token(user), session)
+    return users, quote_ids
+
+
+@pytest.mark.parametrize("limit", [5, 30])
+def test_quote_pages_run_a_constant_number_of_queries(client, feed, token, queries, limit):
+    users, _ = feed
+    headers = {"Authorization": f"Bearer {token(users[0])}"}
+
+    queries.clear()
+    page = client.get("/v1/quotes", params={"limit": limit}, headers=headers).json()
+
+    assert len(page["items"]) == limit
+    for quote in page["items"]:
+        index = int(quote["quote"].rsplit(" ", 1)[1])
+        assert quote["isSaved"] == (index % 3 == 0)
+        assert quote["reaction"] == (REACTION_TYPES[index % 5] if index % 2 else None)
+        assert sum(reaction["count"] for reaction in quote["reactions"]) == (2 if index % 2 else 1)
+    # The viewer, the quotes, their authors and the viewer's saves and reactions
+    assert len(queries) == 5
+
+    queries.clear()
+    client.get("/v1/quotes", params={"limit": limit, "sort": "ascend"})
+    # The quotes and their authors
+    assert len(queries) == 2
+
+
+def test_comments_etag_changes_with_the_authors(client, session, make_user, make_quote, token):
+    user = make_user("Ada Lovelace")
+    quote_id = make_quote(user)
+    _create_quote_comment(quote_id, "First!", None, token(user), session)
+
+    response = client.get(f"/v1/quotes/{quote_id}/comments")
+    etag = response.headers["ETag"]
+    assert client.get(f"/v1/quotes/{quote_id}/comments", headers={"If-None-Match": etag}).status_code == 304
+
+    user.display_name = "Ada King"
+    session.add(user)
+    session.commit()
+
+    response = client.get(f"/v1/quotes/{quote_id}/comments", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["items"][0]["user"]["displayName"] == "Ada King"
+
+
+def test_quote_actions_apply_duplicates_in_order(client, session, make_user, make_quote, token):
+    user = make_user()
+    quote_id = make_quote(user)
+    actions = [
+        {"type": "react", "quoteId": quote_id, "reactionName": "skull"},
+        {"type": "react", "quoteId": quote_id, "reactionName": "skull"},
+        {"type": "react", "quoteId": quote_id, "reactionName": "red-heart"},
+        {"type": "react", "quoteId": quote_id},
+        {"type": "save", "quoteId": quote_id},
+        {"type": "save", "quoteId": quote_id},
+        {"type": "save", "quoteId": quote_id},
+        {"type": "save", "quoteId": quote_id + 1},
+    ]
+
+    response = client.post("/v1/quotes/actions", json={"token": token(user), "actions": actions})
+
+    assert response.status_code == 200
+    assert [(result["result"], result["error"]) for result in response.json()] == [
+        (True, None),
+        (False, None),
+        (True, None),
+        (None, "Required reaction name is empty!"),
+        (True, None),
+        (False, None),
+        (True, None),
+        (None, "Quote not found"),
+    ]
+    quote = client.get(f"/v1/quotes/{quote_id}", headers={"Authorization": f"Bearer {token(user)}"}).json()
+    assert quote["reaction"] == "red-heart"
+    assert quote["isSaved"]
+    assert {reaction["reactionName"]: reaction["count"] for reaction in quote["reactions"] if reaction["count"]} == {
+        "red-heart": 1
+    }
+
+
+def test_concurrent_toggles_keep_one_row_and_consistent_counters(session, make_user, make_quote, token):
+    user = make_user()
+    quote_id = make_quote(user)
+    user_token = token(user)
+
+    def toggle(index: int):
+        with Session(session.get_bind()) as thread_session:
+            for _ in range(10):
+                if index % 2:
+                    _apply_quote_actions([
+                        QuoteAction(type="react", quote_id=quote_id, reaction_name=REACTION_TYPES[index % 3]),
+                        QuoteAction(type="save", quote_id=quote_id),
+                    ], user_token, thread_session)
+                else:
+                    _quote_toggle_react(quote_id, REACTION_TYPES[index % 3], user_token, thread_session)
+                    _quote_toggle_save(quote_id, user_token, thread_session)
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(toggle, range(8)))
+
+    reactions = session.exec(
+        select(QuoteReaction.reaction_name).where(QuoteReaction.quote_id == quote_id)
+    ).all()
+    saves = session.exec(select(func.count()).where(SavedQuote.quote_id == quote_id)).one()
+    quote = session.exec(
+        select(Quote).where(Quote.quote_id == quote_id).execution_options(populate_existing=True)
+    ).one()
+
+    assert len(reactions) <= 1
+    assert saves <= 1
+    for name in REACTION_TYPES:
+        assert getattr(quote, Quote.reaction_count_column(name).key) == reactions.count(name)
+
+
+def test_quotes_are_deleted_by_their_author_or_an_admin(client, session, make_user, make_quote, token):
+    author, other, admin = make_user("Ada Lovelace"), make_user("Grace Hopper"), make_user("Edsger Dijkstra")
+    session.add(Role(role_id=1, name="admin", created_at=datetime.now()))
+    session.add(UserRole(user_id=admin.user_id, role_id=1))
+    session.commit()
+    role_cache.invalidate()
+    first, second = make_quote(author), make_quote(author)
+
+    def delete(quote_id: int, user) -> int:
+        return client.request("DELETE", f"/v1/quotes/{quote_id}/delete", json={"token": token(user)}).status_code
+
+    assert delete(first, other) == 403
+    assert delete(first, author) == 200
+    assert delete(second, admin) == 200
+    assert client.get(f"/v1/quotes/{second}").status_code == 404
@@ -0,0 +1,90 @@
+import pytest
+
+from search.mariadb import MariaDBFulltextBackend
+from search.memory import InMemorySearchBackend
+
+
+def test_quotes_are_searched_by_text_and_author(client, make_user, make_quote):
+    ada, grace = make_user("Ada Lovelace"), make_user("Grace Hopper")
+    engine = make_quote(ada, "The analytical engine weaves algebraic patterns")
+    compiler = make_quote(grace, "It is easier to ask forgiveness than permission")
+    make_quote(grace, "A ship in port is safe")
+
+    def search(term: str) -> list[int]:
+        return [quote["quoteId"] for quote in client.get("/v1/quotes", params={"search": term}).json()["items"]]
+
+    assert search("analytical engine") == [engine]
+    # The last word is matched as a prefix
+    assert search("forgiveness perm") == [compiler]
+    assert search("lovelace") == [engine]
+    assert search("engine permission") == []
+
+
+def test_search_pages_by_relevance(client, make_user, make_quote):
+    user = make_user()
+    ids = [make_quote(user, f"Quote number {index}") for index in range(5)]
+
+    first = client.get("/v1/quotes", params={"search": "quote", "limit": 3}).json()
+    second = client.get("/v1/quotes", params={"search": "quote", "limit": 3, "cursor": first["nextCursor"]}).json()
+
+    assert sorted(quote["quoteId"] for quote in first["items"] + second["items"]) == ids
+    assert second["nextCursor"] is None
+
+
+def test_users_are_searched_by_display_name(client, make_user):
+    ada = make_user("Ada Lovelace")
+    make_user("Grace Hopper")
+
+    users = client.get("/v1/users", params={"search": "ada love"}).json()
+
+    assert [user["userId"] for user in users] == [ada.user_id]
+
+
+def test_memory_backend_applies_own_changes_and_later_inserts(session, make_user, make_quote):
+    backend = InMemorySearchBackend()
+    user = make_user()
+    first = make_quote(user, "Premature optimization")
+
+    assert backend.search_quotes(session, "optim", 0, 10) == [first]
+
+    # Inserted without the backend, picked up by its key on the next search
+    second = make_quote(user, "Optimize for readability")
+    assert sorted(backend.search_quotes(session, "optim", 0, 10)) == [first, second]
+
+    backend.index_quote(session, first, "Root of all evil", user.display_name)
+    backend.remove_quotes(session, [second])
+    # Changes take effect with the commit
+    assert sorted(backend.search_quotes(session, "optim", 0, 10)) == [first, second]
+    session.commit()
+    assert backend.search_quotes(session, "optim", 0, 10) == []
+    assert backend.search_quotes(session, "evil", 0, 10) == [first]
+
+    backend.index_quote(session, first, "Discarded", user.display_name)
+    session.rollback()
+    assert backend.search_quotes(session, "discarded", 0, 10) == []
+
+
+def test_memory_backend_reindexes_the_quotes_of_renamed_users(session, make_user, make_quote):
+    backend = InMemorySearchBackend()
+    user = make_user("Ada Lovelace")
+    quote_id = make_quote(user)
+    assert backend.search_quotes(session, "lovelace", 0, 10) == [quote_id]
+
+    backend.index_user(session, user.user_id, "Ada King")
+    session.commit()
+
+    assert backend.search_quotes(session, "lovelace", 0, 10) == []
+    assert backend.search_quotes(session, "king", 0, 10) == [quote_id]
+    assert backend.search_users(session, "king", 0, 10) == [user.user_id]
+
+
+@pytest.mark.parametrize(("term", "query"), [
+    ("analytical engine", "+analytical +engine*"),
+    # Stopwords and words below the minimum token size are not indexed and would match nothing
+    ("the art of war", "+art +war*"),
+    ("go to ada", "+ada*"),
+    ("what is", "+is*"),
+    ("", ""),
+])
+def test_mariadb_match_query(term, query):
+    assert MariaDBFulltextBackend(min_token_size=3)._match_query(term) == query
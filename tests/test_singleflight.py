@@ -0,0 +1,79 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache.identity import identity_cache
+from cache.main import store
+from discord.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight("test_local", store)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"id": "1"}
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda _: flights.do("token", fetch), range(8)))
+
+    assert len(calls) == 1
+    assert results == [{"id": "1"}] * 8
+
+
+def test_workers_wait_for_the_claim_and_look_the_result_up():
+    # Two workers, the second one finds the result the first one stored instead of calling again
+    first, second = SingleFlight("test_shared", store, shared=True), SingleFlight("test_shared", store, shared=True)
+    stored, calls = {}, []
+    started = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        time.sleep(0.3)
+        stored["token"] = {"id": "1"}
+        return stored["token"]
+
+    def lookup():
+        return stored.get("token")
+
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(first.do, "token", fetch, lookup)
+        started.wait()
+        follower = executor.submit(second.do, "token", fetch, lookup)
+
+        assert leader.result() == follower.result() == {"id": "1"}
+    assert len(calls) == 1
+
+
+def test_waiting_workers_do_not_count_cache_misses():
+    first, second = SingleFlight("test_peek", store, shared=True), SingleFlight("test_peek", store, shared=True)
+    started = threading.Event()
+
+    def fetch():
+        started.set()
+        time.sleep(0.3)
+        identity_cache.set("access", {"id": "1"})
+        return {"id": "1"}
+
+    def misses() -> int:
+        return store.counters("identity_cache.misses").get("identity_cache.misses", 0)
+
+    before = misses()
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(first.do, "access", fetch, lambda: identity_cache.peek("access"))
+        started.wait()
+        follower = executor.submit(second.do, "access", fetch, lambda: identity_cache.peek("access"))
+
+        assert leader.result() == follower.result() == {"id": "1"}
+    assert misses() == before
+
+
+def test_claims_are_released():
+    flights = SingleFlight("test_release", store, shared=True)
+
+    flights.do("code", lambda: {"access_token": "secret"}, lambda: None)
+
+    assert not store.connection().execute("SELECT * FROM flights").fetchall()
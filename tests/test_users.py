@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from api.v1.tasks.quotes import _quote_toggle_react, _quote_toggle_save
+
+
+def test_saved_quotes_are_listed_by_save_time(client, session, make_user, make_quote, token):
+    user = make_user()
+    oldest, middle, newest = [make_quote(user, f"Quote {index}") for index in range(3)]
+    for quote_id in (newest, oldest, middle):
+        _quote_toggle_save(quote_id, token(user), session)
+
+    first = client.get(f"/v1/users/{user.user_id}/saved-quotes", params={"limit": 2}).json()
+    second = client.get(
+        f"/v1/users/{user.user_id}/saved-quotes", params={"limit": 2, "cursor": first["nextCursor"]}
+    ).json()
+
+    assert [quote["quoteId"] for quote in first["items"]] == [middle, oldest]
+    assert [quote["quoteId"] for quote in second["items"]] == [newest]
+    assert second["nextCursor"] is None
+
+
+def test_reactions_are_listed_with_their_quotes(client, session, make_user, make_quote, token, queries):
+    author, reader = make_user("Ada Lovelace"), make_user("Grace Hopper")
+    quote_ids = [make_quote(author, f"Quote {index}") for index in range(3)]
+    for quote_id, name in zip(quote_ids, ("red-heart", "skull", "thumbs-up")):
+        _quote_toggle_react(quote_id, name, token(reader), session)
+    _quote_toggle_react(quote_ids[0], "skull", token(author), session)
+
+    url = f"/v1/users/{reader.user_id}/reactions"
+
+    queries.clear()
+    first = client.get(url, params={"limit": 2}).json()
+    # The reactions joined with their quotes, and the authors
+    assert len(queries) == 2
+
+    second = client.get(url, params={"limit": 2, "cursor": first["nextCursor"]}).json()
+
+    assert [(item["quoteId"], item["reactionName"]) for item in first["items"] + second["items"]] == [
+        (quote_ids[2], "thumbs-up"), (quote_ids[1], "skull"), (quote_ids[0], "red-heart")
+    ]
+    assert second["nextCursor"] is None
+
+    quote = second["items"][0]["quote"]
+    assert quote["quote"] == "Quote 0"
+    assert quote["user"]["displayName"] == "Ada Lovelace"
+    assert {reaction["reactionName"]: reaction["count"] for reaction in quote["reactions"] if reaction["count"]} == {
+        "red-heart": 1, "skull": 1
+    }
+
+
+def test_listings_carry_the_viewer_state(client, session, make_user, make_quote, token):
+    author, reader = make_user("Ada Lovelace"), make_user("Grace Hopper")
+    first, second = make_quote(author, "Quote 0"), make_quote(author, "Quote 1")
+    _quote_toggle_save(first, token(reader), session)
+    _quote_toggle_save(second, token(reader), session)
+    _quote_toggle_react(first, "skull", token(reader), session)
+    _quote_toggle_save(second, token(author), session)
+    _quote_toggle_react(second, "red-heart", token(author), session)
+
+    headers = {"Authorization": f"Bearer {token(author)}"}
+    saved = client.get(f"/v1/users/{reader.user_id}/saved-quotes", headers=headers).json()
+    reactions = client.get(f"/v1/users/{reader.user_id}/reactions", headers=headers).json()
+
+    assert [(quote["quoteId"], quote["isSaved"], quote["reaction"]) for quote in saved["items"]] == [
+        (second, True, "red-heart"), (first, False, None)
+    ]
+    assert [(item["quote"]["isSaved"], item["quote"]["reaction"]) for item in reactions["items"]] == [(False, None)]
+
+
+def test_user_etag_covers_every_serialized_column(client, session, make_user):
+    user = make_user()
+    url = f"/v1/users/{user.user_id}"
+    etag = client.get(url).headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    user.created_at = datetime(2024, 10, 21)
+    session.add(user)
+    session.commit()
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["createdAt"] == "2024-10-21T00:00:00"
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlmodel import select
+
+from api.v1.models.models import Webhook, WebhookDelivery
+from api.v1.tasks.quotes import _create_quote
+from database.main import db
+from discord.client import DiscordClient
+from webhooks.main import WebhookDeliveryWorker
+
+
+class FakeDiscord(BaseHTTPRequestHandler):
+    """
+    Answers webhook executions with the status of the webhook identifier, e.g. /webhooks/404/token
+    """
+
+    received: list[tuple[str, dict]] = []
+
+    def do_POST(self):
+        webhook_id = self.path.split("/")[2]
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.received.append((webhook_id, json.loads(body)))
+
+        status = int(webhook_id)
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0.5")
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        if status != 204:
+            self.wfile.write(json.dumps({"message": "error", "retry_after": 0.5}).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def discord():
+    FakeDiscord.received = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeDiscord)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = DiscordClient(f"http://127.0.0.1:{server.server_port}", max_wait=1.0)
+    yield client
+    client.close()
+    server.shutdown()
+
+
+@pytest.fixture
+def worker(discord):
+    return WebhookDeliveryWorker(db.engine, discord, backoff=60.0, poll_interval=0.01)
+
+
+@pytest.fixture
+def enqueue(session, make_user, token):
+    def enqueue(*statuses: int) -> str:
+        user = make_user()
+        for status in statuses:
+            session.add(Webhook(user_id=user.user_id, webhook_id=str(status), webhook_token="token"))
+        session.commit()
+        return _create_quote("Talk is cheap. Show me the code.", token(user), True, session)["quote_id"]
+
+    return enqueue
+
+
+def deliveries(session) -> dict[str, WebhookDelivery]:
+    session.expire_all()
+    return {
+        webhook.webhook_id: delivery
+        for delivery, webhook in session.exec(
+            select(WebhookDelivery, Webhook).join(Webhook, Webhook.id == WebhookDelivery.webhook_id)
+        )
+    }
+
+
+def test_delivers_queued_quotes(session, enqueue, worker):
+    quote_id = enqueue(204)
+
+    assert asyncio.run(worker.run_once()) == 1
+
+    assert deliveries(session)["204"].delivered_at
+    [(_, message)] = FakeDiscord.received
+    assert message["embeds"][0]["url"].endswith(f"/quote/{quote_id}")
+    assert asyncio.run(worker.run_once()) == 0
+
+
+def test_disables_unknown_webhooks(session, enqueue, worker):
+    enqueue(404, 401)
+
+    asyncio.run(worker.run_once())
+
+    for webhook_id, delivery in deliveries(session).items():
+        assert delivery.failed_at and not delivery.delivered_at
+        assert session.exec(select(Webhook).where(Webhook.webhook_id == webhook_id)).one().disabled_at
+
+
+def test_retries_with_backoff_or_after_the_rate_limit(session, enqueue, worker):
+    enqueue(500, 429)
+    started = datetime.now()
+
+    asyncio.run(worker.run_once())
+
+    failed, limited = deliveries(session)["500"], deliveries(session)["429"]
+    assert failed.attempts == limited.attempts == 1
+    assert failed.next_attempt_at > started + timedelta(seconds=40)
+    assert limited.next_attempt_at < datetime.now() + timedelta(seconds=1)
+    assert not failed.failed_at and not limited.failed_at
+
+
+def test_gives_up_after_max_attempts(session, enqueue, worker):
+    enqueue(400)
+
+    asyncio.run(worker.run_once())
+
+    delivery = deliveries(session)["400"]
+    assert delivery.failed_at and delivery.last_error.startswith("400")
+
+
+def test_keeps_running_after_errors(monkeypatch, session, enqueue, worker):
+    enqueue(204)
+    claim = worker._claim
+    calls = []
+
+    def flaky_claim():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database is gone")
+        return claim()
+
+    async def run():
+        stop = asyncio.Event()
+        task = asyncio.create_task(worker.run(stop))
+        while len(calls) < 3:
+            await asyncio.sleep(0.01)
+        stop.set()
+        await task
+
+    monkeypatch.setattr(worker, "_claim", flaky_claim)
+    asyncio.run(asyncio.wait_for(run(), 5))
+
+    assert deliveries(session)["204"].delivered_at
@@ -0,0 +1,17 @@
+from __init__ import VERSION, API_NAME
+
+if __name__ == "__main__":
+    import asyncio
+    from loguru import logger
+
+    from database.main import db
+    from discord.main import dc_handler
+    from webhooks.main import WebhookDeliveryWorker
+
+    logger.info(f"Version: {VERSION}")
+    logger.info(f"Starting {API_NAME} webhook delivery worker...")
+    worker = WebhookDeliveryWorker.from_config(db.engine, dc_handler.client)
+    try:
+        asyncio.run(worker.run())
+    finally:
+        dc_handler.client.close()
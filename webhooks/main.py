@@ -0,0 +1,268 @@
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Optional
+
+import httpx
+from loguru import logger
+from sqlalchemy import Engine, insert, literal, update
+from sqlmodel import Session, select
+
+from api.v1.models.models import Quote, User, Webhook, WebhookDelivery
+from config.main import parser
+from discord.client import DiscordClient, DiscordError, RateLimitedError
+
+
+def build_quote_message(quote: Quote, user: User) -> dict:
+    """
+    Build the Discord webhook message announcing a quote
+
+    :return: JSON body for the execute webhook endpoint
+    """
+    return {
+        "username": "Quotly",
+        "avatar_url": "https://quotly.eu/quotly512.png",
+        "embeds": [
+            {
+                "title": "Quotly",
+                "url": f"https://quotly.eu/quote/{quote.quote_id}",
+                "description": quote.quote,
+                "color": 0xffffff,
+                "footer": {
+                    "text": user.display_name,
+                    "icon_url": f"https://cdn.discordapp.com/avatars/{user.discord_id}/{user.avatar_url}",
+                },
+            }
+        ],
+    }
+
+
+def enqueue_quote(quote: Quote, user: User, session: Session) -> int:
+    """
+    Queue a delivery of the quote to every active webhook
+
+    Runs as a single INSERT ... SELECT inside the caller's transaction, so the deliveries are committed
+    together with the quote.
+
+    :return: The number of queued deliveries
+    """
+    now = datetime.now()
+    webhooks = select(
+        Webhook.id,
+        literal(quote.quote_id),
+        literal(json.dumps(build_quote_message(quote, user))),
+        literal(now),
+        literal(now),
+    ).where(Webhook.disabled_at.is_(None))
+
+    result = session.exec(
+        insert(WebhookDelivery).from_select(
+            ["webhook_id", "quote_id", "payload", "created_at", "next_attempt_at"], webhooks
+        )
+    )
+    return result.rowcount
+
+
+class WebhookDeliveryWorker:
+    """
+    Drains the webhook outbox.
+
+    Due deliveries are claimed in batches by pushing their next attempt past a lease, then executed with
+    bounded concurrency through the rate limit aware Discord client. Failed deliveries are retried with
+    exponential backoff, or after the delay Discord asks for when rate limited, webhooks that Discord
+    reports as unknown or unauthorized are disabled. Deliveries interrupted by an error are claimed again
+    once their lease expired.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        client: DiscordClient,
+        concurrency: int = 4,
+        batch_size: int = 50,
+        max_attempts: int = 8,
+        backoff: float = 5.0,
+        lease: float = 60.0,
+        poll_interval: float = 1.0,
+    ):
+        self.engine = engine
+        self.client = client
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+
+    @classmethod
+    def from_config(cls, engine: Engine, client: DiscordClient) -> "WebhookDeliveryWorker":
+        return cls(
+            engine,
+            client,
+            concurrency=parser.getint("Webhooks", "concurrency", fallback=4),
+            batch_size=parser.getint("Webhooks", "batch_size", fallback=50),
+            max_attempts=parser.getint("Webhooks", "max_attempts", fallback=8),
+            backoff=parser.getfloat("Webhooks", "backoff", fallback=5.0),
+        )
+
+    async def run(self, stop: Optional[asyncio.Event] = None):
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            try:
+                if await self.run_once():
+                    continue
+            except Exception as error:
+                logger.warning(f"Claiming webhook deliveries failed: {error}")
+            try:
+                await asyncio.wait_for(stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_once(self) -> int:
+        """
+        Claim and execute one batch of due deliveries
+
+        :return: The number of processed deliveries
+        """
+        deliveries = await asyncio.to_thread(self._claim)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(delivery: dict):
+            async with semaphore:
+                try:
+                    await self._deliver(delivery)
+                except Exception as error:
+                    logger.warning(f"Webhook delivery {delivery['id']} failed: {error}")
+
+        await asyncio.gather(*(deliver(delivery) for delivery in deliveries))
+        return len(deliveries)
+
+    def _claim(self) -> list[dict]:
+        now = datetime.now()
+        with Session(self.engine) as session:
+            rows = session.exec(
+                select(WebhookDelivery, Webhook)
+                .join(Webhook, Webhook.id == WebhookDelivery.webhook_id)
+                .where(
+                    WebhookDelivery.delivered_at.is_(None),
+                    WebhookDelivery.failed_at.is_(None),
+                    WebhookDelivery.next_attempt_at <= now,
+                    Webhook.disabled_at.is_(None),
+                )
+                .order_by(WebhookDelivery.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+
+            if not rows:
+                return []
+
+            session.exec(
+                update(WebhookDelivery)
+                .where(WebhookDelivery.id.in_([delivery.id for delivery, _ in rows]))
+                .values(next_attempt_at=now + timedelta(seconds=self.lease))
+            )
+            claimed = [
+                {
+                    "id": delivery.id,
+                    "attempts": delivery.attempts,
+                    "payload": delivery.payload,
+                    "webhook": webhook.id,
+                    "webhook_id": webhook.webhook_id,
+                    "webhook_token": webhook.webhook_token,
+                }
+                for delivery, webhook in rows
+            ]
+            session.commit()
+        return claimed
+
+    async def _deliver(self, delivery: dict):
+        try:
+            response = await self.client.request(
+                "POST",
+                f"/webhooks/{delivery['webhook_id']}/{delivery['webhook_token']}",
+                route="POST /webhooks/{webhook_id}/{webhook_token}",
+                major=delivery["webhook_id"],
+                content=delivery["payload"],
+                headers={"Content-Type": "application/json"},
+            )
+        except RateLimitedError as error:
+            await asyncio.to_thread(self._retry, delivery, str(error), error.retry_after)
+            return
+        except DiscordError as error:
+            await asyncio.to_thread(self._retry, delivery, str(error))
+            return
+
+        if response.is_success:
+            await asyncio.to_thread(self._delivered, delivery)
+        elif response.status_code in (401, 404):
+            await asyncio.to_thread(self._disable, delivery, f"{response.status_code}: {response.text[:200]}")
+        elif response.status_code == 429:
+            await asyncio.to_thread(
+                self._retry, delivery, f"{response.status_code}: {response.text[:200]}", _retry_after(response)
+            )
+        elif response.status_code >= 500:
+            await asyncio.to_thread(self._retry, delivery, f"{response.status_code}: {response.text[:200]}")
+        else:
+            await asyncio.to_thread(self._fail, delivery, f"{response.status_code}: {response.text[:200]}")
+
+    def _update(self, delivery_id: int, **values):
+        with Session(self.engine) as session:
+            session.exec(update(WebhookDelivery).where(WebhookDelivery.id == delivery_id).values(**values))
+            session.commit()
+
+    def _delivered(self, delivery: dict):
+        self._update(delivery["id"], delivered_at=datetime.now())
+
+    def _fail(self, delivery: dict, error: str):
+        logger.warning(f"Webhook delivery {delivery['id']} failed permanently: {error}")
+        self._update(delivery["id"], failed_at=datetime.now(), attempts=delivery["attempts"] + 1, last_error=error)
+
+    def _retry(self, delivery: dict, error: str, delay: Optional[float] = None):
+        attempts = delivery["attempts"] + 1
+        if attempts >= self.max_attempts:
+            self._fail(delivery, error)
+            return
+
+        if delay is None:
+            delay = self.backoff * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+
+        self._update(
+            delivery["id"],
+            attempts=attempts,
+            last_error=error,
+            next_attempt_at=datetime.now() + timedelta(seconds=delay),
+        )
+
+    def _disable(self, delivery: dict, error: str):
+        logger.warning(f"Disabling webhook {delivery['webhook']}: {error}")
+        now = datetime.now()
+        with Session(self.engine) as session:
+            session.exec(update(Webhook).where(Webhook.id == delivery["webhook"]).values(disabled_at=now))
+            session.exec(
+                update(WebhookDelivery)
+                .where(
+                    WebhookDelivery.webhook_id == delivery["webhook"],
+                    WebhookDelivery.delivered_at.is_(None),
+                    WebhookDelivery.failed_at.is_(None),
+                )
+                .values(failed_at=now, last_error=error)
+            )
+            session.commit()
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """
+    Seconds Discord asks to wait after a 429, from the Retry-After header or the retry_after of the body
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is None:
+        try:
+            retry_after = response.json().get("retry_after")
+        except (ValueError, AttributeError):
+            return None
+    try:
+        return float(retry_after) if retry_after is not None else None
+    except ValueError:
+        return None